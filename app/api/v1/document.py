@@ -20,7 +20,7 @@ async def download_document_from_url(request: DocumentUrlRequest):
     """
     try:
         handler = DocumentHandler()
-        file_path, filename = handler.download_document(
+        file_path, filename, _ = handler.download_document(
             url=str(request.url), 
             filename=request.filename,
             doc_type=request.doc_type.value if request.doc_type else None
@@ -1,54 +1,76 @@
 """HackRx API endpoints."""
 
-import uuid
+from typing import Optional
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Header, HTTPException, Response, status
 
+from app.core.config import settings
+from app.core.deadline import Deadline, DeadlineExceeded
+from app.core.storage import storage_manager
 from app.schemas.hackrx import HackRxRunRequest, HackRxRunResponse, HackRxRunDetailedResponse
 from app.services.document_processor import DocumentProcessor
+from app.services.index_registry import index_registry, merge_shards
+from app.services.llm_scheduler import ProviderUnavailableError
 from app.services.vector_store import VectorStoreService
 from app.services.question_answering import QuestionAnsweringService
 
 router = APIRouter(prefix="/hackrx", tags=["HackRx"])
 
+# Services are shared by all requests: creating their model clients per request is costly
+document_processor = DocumentProcessor()
+vector_store_service = VectorStoreService()
+qa_service = QuestionAnsweringService()
+
 
 @router.post("/run", response_model=HackRxRunResponse)
-async def process_document_and_answer_questions(request: HackRxRunRequest):
+async def process_document_and_answer_questions(
+    request: HackRxRunRequest,
+    response: Response,
+    x_request_deadline_ms: Optional[str] = Header(None)
+):
     """Process a document and answer questions based on its content.
     
+    The request must complete within its deadline: REQUEST_DEADLINE_SECONDS,
+    or the shorter budget of the X-Request-Deadline-Ms header. Stages degrade
+    as the deadline approaches; if any answer is partial or a document had to
+    be skipped, the X-Partial-Response header is set.
+    
     Args:
         request: HackRxRunRequest containing document URL(s) and questions
+        response: Response whose headers flag partial results
+        x_request_deadline_ms: Optional latency budget of the request in milliseconds
         
     Returns:
         HackRxRunResponse with answers to the questions
     """
+    deadline = Deadline.from_header(x_request_deadline_ms, settings.REQUEST_DEADLINE_SECONDS)
     try:
-        # Initialize services
-        document_processor = DocumentProcessor()
-        vector_store_service = VectorStoreService()
-        qa_service = QuestionAnsweringService()
-        
-        # Process document(s)
-        documents = []
-        
         # Handle both single URL and list of URLs
         urls = [request.documents] if not isinstance(request.documents, list) else request.documents
         
-        for url in urls:
-            # Process each document - convert HttpUrl to string if needed
-            url_str = str(url) if hasattr(url, '__str__') else url
-            doc_chunks = await document_processor.process_document_from_url(url_str)
-            documents.extend(doc_chunks)
+        # Get one index shard per document - convert HttpUrl to string if needed.
+        # Known documents are reused; new ones are downloaded and indexed concurrently.
+        url_strs = [str(url) if hasattr(url, '__str__') else url for url in urls]
+        with deadline.stage("ingest"):
+            shards = await index_registry.get_shards(
+                url_strs, document_processor, vector_store_service, deadline=deadline
+            )
         
-        # Create vector store
-        vector_store = await vector_store_service.create_vector_store(documents)
+        # Search the document set through a merged view of its shards
+        with deadline.stage("merge"):
+            retriever = merge_shards(shards, vector_store_service)
         
-        # Generate unique index name and save vector store
-        index_name = f"hackrx_{uuid.uuid4().hex}"
-        await vector_store_service.save_vector_store(vector_store, index_name)
+        # Answer questions while keeping the saved shards from being evicted
+        with storage_manager.pin(*(shard.path for shard in shards)), deadline.stage("answer"):
+            detailed_answers = await qa_service.batch_answer_questions(
+                retriever, request.questions, deadline=deadline
+            )
         
-        # Answer questions
-        detailed_answers = await qa_service.batch_answer_questions(vector_store, request.questions)
+        partial = "documents_skipped" in deadline.degradations or any(
+            answer.get("partial") for answer in detailed_answers
+        )
+        if partial:
+            response.headers["X-Partial-Response"] = "true"
         
         # Create detailed response (for internal use/logging)
         # We could log this or store it in a database for analytics
@@ -56,8 +78,12 @@ async def process_document_and_answer_questions(request: HackRxRunRequest):
             results=detailed_answers,
             metadata={
                 "document_count": len(urls),
-                "chunk_count": len(documents),
-                "index_name": index_name
+                "chunk_count": sum(shard.chunk_count for shard in shards),
+                "shards": [shard.key for shard in shards],
+                "partial": partial,
+                "deadline_seconds": deadline.budget,
+                "stage_ms": deadline.stages,
+                "degradations": deadline.degradations
             }
         )
         
@@ -71,6 +97,19 @@ async def process_document_and_answer_questions(request: HackRxRunRequest):
     except HTTPException as e:
         # Re-raise HTTP exceptions
         raise e
+    except DeadlineExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Request deadline exceeded: {str(e)}"
+        )
+    except ProviderUnavailableError as e:
+        # Upstream rate limiting or outage: tell the client to back off instead of failing hard
+        headers = {"Retry-After": str(max(1, round(e.retry_after or 1)))}
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Model provider unavailable, please retry: {str(e)}",
+            headers=headers
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
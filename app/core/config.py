@@ -14,6 +14,7 @@ class Settings(BaseSettings):
     
     # OpenAI Configuration
     OPENAI_API_KEY: str
+    OPENAI_BASE_URL: Optional[str] = None
     
     # Pinecone Configuration
     PINECONE_API_KEY: str
@@ -30,6 +31,95 @@ class Settings(BaseSettings):
     # Document Storage
     DOCUMENT_STORAGE_PATH: str = "storage/documents"
     
+    # Document Ingestion
+    DOCUMENT_IN_MEMORY_INGEST: bool = True
+    DOCUMENT_SPOOL_MAX_BYTES: int = 32 * 1024 * 1024
+    DOCUMENT_PERSIST_RAW: bool = False
+    DOCUMENT_STRUCTURE_ENABLED: bool = True
+    
+    # Deduplication
+    DEDUP_ENABLED: bool = True
+    DEDUP_SIMILARITY_THRESHOLD: float = 0.9
+    DEDUP_BOILERPLATE_FRACTION: float = 0.5
+    
+    # Downloads
+    DOCUMENT_MAX_BYTES: int = 256 * 1024 * 1024
+    DOWNLOAD_RANGED_MIN_BYTES: int = 16 * 1024 * 1024
+    DOWNLOAD_SEGMENT_BYTES: int = 4 * 1024 * 1024
+    DOWNLOAD_MAX_CONNECTIONS: int = 4
+    DOWNLOAD_MAX_RETRIES: int = 3
+    
+    # PDF Extraction
+    PDF_EXTRACT_WORKERS: int = min(os.cpu_count() or 1, 8)
+    PDF_MIN_PAGES_PER_WORKER: int = 16
+    PDF_PAGE_CACHE_PATH: str = "storage/page_cache.sqlite3"
+    
+    # Provider Scheduling
+    LLM_REQUEST_TIMEOUT_SECONDS: float = 120
+    LLM_REQUESTS_PER_MINUTE: int = 500
+    LLM_TOKENS_PER_MINUTE: int = 300000
+    LLM_MAX_CONCURRENCY: int = 32
+    LLM_MIN_CONCURRENCY: int = 1
+    LLM_LATENCY_TARGET_MS: float = 30000
+    LLM_MAX_RETRIES: int = 4
+    LLM_HEDGE_ENABLED: bool = False
+    EMBEDDING_REQUEST_TIMEOUT_SECONDS: float = 60
+    EMBEDDING_REQUESTS_PER_MINUTE: int = 3000
+    EMBEDDING_TOKENS_PER_MINUTE: int = 1000000
+    EMBEDDING_MAX_CONCURRENCY: int = 16
+    EMBEDDING_MIN_CONCURRENCY: int = 1
+    EMBEDDING_LATENCY_TARGET_MS: float = 10000
+    EMBEDDING_MAX_RETRIES: int = 4
+    
+    # Embedding Provider
+    EMBEDDING_PROVIDER: str = "openai"
+    EMBEDDING_LOCAL_BATCH_SIZE: int = 64
+    EMBEDDING_LOCAL_WORKERS: Optional[int] = None
+    EMBEDDING_HASHING_DIMENSION: int = 1024
+    EMBEDDING_ONNX_MODEL_PATH: Optional[str] = None
+    
+    # Embedding Batching
+    EMBEDDING_BATCH_MAX_SIZE: int = 256
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 10
+    
+    # Storage Lifecycle
+    STORAGE_MAX_BYTES: int = 5 * 1024 ** 3
+    STORAGE_TTL_SECONDS: int = 7 * 24 * 3600
+    STORAGE_SWEEP_INTERVAL_SECONDS: int = 300
+    
+    # Index Shards
+    INDEX_SHARD_CACHE_SIZE: int = 64
+    INDEX_BUILD_TIMEOUT_SECONDS: float = 300
+    INDEX_SHARD_REVALIDATE_SECONDS: float = 300
+    
+    # Serving (serve.py)
+    SERVER_BIND: str = "0.0.0.0:8000"
+    SERVER_WORKERS: int = os.cpu_count() or 1
+    SERVER_TIMEOUT_SECONDS: int = 180
+    SERVER_MAX_REQUESTS: int = 0
+    SERVER_MAX_WORKER_MEMORY_MB: int = 0
+    SERVER_PRELOAD_SHARDS: bool = True
+    VECTOR_STORE_MMAP: bool = True
+    
+    # Question Answering
+    EXTRACTIVE_ANSWERS_ENABLED: bool = True
+    EXTRACTIVE_CONFIDENCE_THRESHOLD: float = 0.95
+    QA_TOP_K: int = 4
+    
+    # Hierarchical Retrieval
+    RETRIEVAL_TOP_SECTIONS: int = 4
+    RETRIEVAL_MIN_SECTIONS: int = 8
+    
+    # Model Cascade (comma-separated, cheapest first)
+    LLM_CASCADE_MODELS: str = "gpt-3.5-turbo,gpt-4"
+    LLM_ESCALATION_THRESHOLD: float = 0.6
+    
+    # Request Deadlines
+    REQUEST_DEADLINE_SECONDS: float = 30
+    QA_DEGRADE_BELOW_SECONDS: float = 10
+    QA_DEGRADED_TOP_K: int = 2
+    QA_MIN_LLM_SECONDS: float = 2
+    
     class Config:
         """Pydantic config."""
         
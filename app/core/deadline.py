@@ -0,0 +1,150 @@
+"""Per-request deadlines shared by every stage of a request."""
+
+import asyncio
+import math
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Dict, Iterator, List, Optional, TypeVar
+
+from app.core.metrics import LATENCY_MS_BUCKETS, metrics
+
+T = TypeVar("T")
+
+BUDGET_FRACTION_BUCKETS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 0.9, 1.0, 1.5)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's deadline passes before an operation completes."""
+
+
+class Deadline:
+    """The latency budget of one request.
+    
+    Stages check the remaining budget to decide how much work they can afford,
+    bound their waits with ``wait_for`` and record how much of the budget they
+    used. A deadline without a budget never expires.
+    """
+    
+    def __init__(self, budget_seconds: Optional[float] = None):
+        """Initialize the deadline.
+        
+        Args:
+            budget_seconds: Time allowed for the request from now; None or 0 for no limit
+        """
+        self.budget = budget_seconds if budget_seconds and budget_seconds > 0 else None
+        self.started_at = time.monotonic()
+        self.stages: Dict[str, float] = {}
+        self.degradations: List[str] = []
+    
+    @classmethod
+    def from_header(cls, value: Optional[str], default_seconds: Optional[float]) -> "Deadline":
+        """Create a deadline from a request header holding the budget in milliseconds.
+        
+        Clients may only shorten the server's budget: the header's budget is
+        capped at ``default_seconds``, and missing, invalid, non-finite or
+        non-positive values fall back to it.
+        
+        Args:
+            value: Header value, or None if the header is absent
+            default_seconds: Server budget; None or 0 for no limit
+            
+        Returns:
+            The request's deadline
+        """
+        try:
+            seconds = float(value) / 1000
+        except (TypeError, ValueError):
+            return cls(default_seconds)
+        if not math.isfinite(seconds) or seconds <= 0:
+            return cls(default_seconds)
+        if default_seconds and default_seconds > 0:
+            seconds = min(seconds, default_seconds)
+        return cls(seconds)
+    
+    def remaining(self) -> float:
+        """Seconds left before the deadline, or infinity without a budget."""
+        if self.budget is None:
+            return math.inf
+        return max(0.0, self.budget - (time.monotonic() - self.started_at))
+    
+    def expired(self) -> bool:
+        """Whether the deadline has passed."""
+        return self.remaining() <= 0
+    
+    def timeout(self, cap: Optional[float] = None) -> Optional[float]:
+        """Return a timeout that ends no later than the deadline.
+        
+        Args:
+            cap: Upper bound for the timeout
+            
+        Returns:
+            The smaller of the cap and the remaining time, or None if neither is set
+        """
+        timeout = min(cap if cap is not None else math.inf, self.remaining())
+        return None if timeout == math.inf else timeout
+    
+    def check(self, operation: str) -> None:
+        """Raise if there is no time left to start an operation.
+        
+        Args:
+            operation: Description of the operation, used in the error message
+            
+        Raises:
+            DeadlineExceeded: If the deadline has passed
+        """
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline exceeded before {operation}")
+    
+    async def wait_for(self, awaitable: Awaitable[T]) -> T:
+        """Await something, giving up when the deadline passes.
+        
+        Args:
+            awaitable: Coroutine or future to wait for; cancelled on expiry
+            
+        Returns:
+            Its result
+            
+        Raises:
+            DeadlineExceeded: If the deadline passes first
+        """
+        if self.budget is None:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, self.remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"Deadline of {self.budget:.1f}s exceeded") from None
+    
+    def degrade(self, kind: str) -> None:
+        """Record that a stage reduced its work to stay within the budget.
+        
+        Args:
+            kind: Kind of degradation, such as ``reduced_k`` or ``no_escalation``
+        """
+        if kind not in self.degradations:
+            self.degradations.append(kind)
+        metrics.counter(f"deadline_degraded_{kind}_total", f"Requests degraded by {kind}").inc()
+    
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Record the time a stage takes and the fraction of the budget it uses.
+        
+        Stages running concurrently under the same name (such as answering
+        several questions) are recorded as their longest run.
+        
+        Args:
+            name: Stage name
+        """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            self.stages[name] = max(self.stages.get(name, 0.0), elapsed * 1000)
+            metrics.histogram(
+                f"stage_{name}_latency_ms", LATENCY_MS_BUCKETS, f"Time spent in the {name} stage"
+            ).observe(elapsed * 1000)
+            if self.budget is not None:
+                metrics.histogram(
+                    f"stage_{name}_budget_fraction", BUDGET_FRACTION_BUCKETS,
+                    f"Fraction of the request deadline used by the {name} stage"
+                ).observe(elapsed / self.budget)
@@ -0,0 +1,192 @@
+"""In-process metrics: counters, gauges and histograms exposed through the /metrics endpoint."""
+
+import bisect
+import threading
+from typing import Any, Dict, Sequence
+
+LATENCY_MS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class Counter:
+    """A monotonically increasing count."""
+    
+    def __init__(self, description: str = ""):
+        self.description = description
+        self._value = 0.0
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1) -> None:
+        """Increase the counter.
+        
+        Args:
+            amount: Amount to add
+        """
+        with self._lock:
+            self._value += amount
+    
+    @property
+    def value(self) -> float:
+        """Current value of the counter."""
+        return self._value
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the current state of the counter."""
+        return {"description": self.description, "value": self._value}
+
+
+class Gauge:
+    """A value that can go up and down."""
+    
+    def __init__(self, description: str = ""):
+        self.description = description
+        self._value = 0.0
+    
+    def set(self, value: float) -> None:
+        """Set the gauge.
+        
+        Args:
+            value: New value
+        """
+        self._value = value
+    
+    @property
+    def value(self) -> float:
+        """Current value of the gauge."""
+        return self._value
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the current state of the gauge."""
+        return {"description": self.description, "value": self._value}
+
+
+class Histogram:
+    """A distribution of observed values over fixed bucket upper bounds."""
+    
+    def __init__(self, buckets: Sequence[float], description: str = ""):
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float) -> None:
+        """Record an observation.
+        
+        Args:
+            value: Observed value
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+    
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket containing it.
+        
+        Quantiles beyond the last bucket are reported as the largest observed value.
+        
+        Args:
+            q: Quantile between 0 and 1
+            
+        Returns:
+            Estimated quantile, or 0 if nothing has been observed
+        """
+        with self._lock:
+            if self._count == 0:
+                return 0.0
+            rank = q * self._count
+            seen = 0
+            for index, count in enumerate(self._counts):
+                seen += count
+                if seen >= rank and count:
+                    return self.buckets[index] if index < len(self.buckets) else self._max
+            return self._max
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the current state of the histogram."""
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets, self._counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            buckets["+Inf"] = self._count
+            count, total = self._count, self._sum
+        return {
+            "description": self.description,
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else 0.0,
+            "max": self._max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": buckets,
+        }
+
+
+class MetricsRegistry:
+    """Named counters, gauges and histograms for the whole process."""
+    
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+    
+    def counter(self, name: str, description: str = "") -> Counter:
+        """Return the counter with the given name, creating it if needed.
+        
+        Args:
+            name: Metric name
+            description: Human-readable description
+            
+        Returns:
+            The counter
+        """
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(description)
+            return self._metrics[name]
+    
+    def gauge(self, name: str, description: str = "") -> Gauge:
+        """Return the gauge with the given name, creating it if needed.
+        
+        Args:
+            name: Metric name
+            description: Human-readable description
+            
+        Returns:
+            The gauge
+        """
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Gauge(description)
+            return self._metrics[name]
+    
+    def histogram(self, name: str, buckets: Sequence[float], description: str = "") -> Histogram:
+        """Return the histogram with the given name, creating it if needed.
+        
+        Args:
+            name: Metric name
+            buckets: Bucket upper bounds, used only when the histogram is created
+            description: Human-readable description
+            
+        Returns:
+            The histogram
+        """
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(buckets, description)
+            return self._metrics[name]
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the current state of every metric, keyed by name."""
+        with self._lock:
+            items = sorted(self._metrics.items())
+        return {name: metric.snapshot() for name, metric in items}
+
+
+# Create global metrics registry
+metrics = MetricsRegistry()
@@ -0,0 +1,371 @@
+"""Storage lifecycle management for downloaded documents and saved vector stores.
+
+Several worker processes share one storage directory. Only the process holding
+the sweeper lock evicts artifacts, using a view of the directory it refreshes
+before every sweep. Pins and retains are shared between processes as ``flock``
+locks on the artifacts, and accesses as their modification times.
+"""
+
+import asyncio
+import fcntl
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# File in the root directory locked by the one process that sweeps it
+SWEEPER_LOCK_FILE = ".sweeper.lock"
+
+
+@dataclass
+class StorageArtifact:
+    """A file or directory tracked by the storage manager."""
+
+    path: str
+    size: int
+    last_access: float
+    pins: int = 0
+    retained: bool = False
+
+
+class StorageManager:
+    """Track storage artifacts and evict them by byte budget and TTL.
+
+    Artifacts are evicted least-recently-used first once the total tracked size
+    exceeds ``max_bytes``, and unconditionally once they have not been accessed
+    for ``ttl_seconds``. Artifacts that are pinned by an in-flight request or
+    retained by a long-lived owner (such as the index registry) are never
+    evicted.
+    """
+
+    def __init__(
+        self,
+        root_dir: str,
+        max_bytes: int,
+        ttl_seconds: float,
+        sweep_interval_seconds: float = 300,
+    ):
+        """Initialize the storage manager.
+
+        Args:
+            root_dir: Directory whose artifacts are managed
+            max_bytes: Total byte budget for tracked artifacts (0 disables the budget)
+            ttl_seconds: Maximum idle time before eviction (0 disables the TTL)
+            sweep_interval_seconds: Interval between background sweeps
+        """
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._artifacts: Dict[str, StorageArtifact] = {}
+        self._lock = threading.Lock()
+        self._sweep_task: Optional[asyncio.Task] = None
+        # Descriptors holding shared locks on retained artifacts, and the sweeper lock
+        self._retained_fds: Dict[str, int] = {}
+        self._sweeper_fd: Optional[int] = None
+
+    @property
+    def total_bytes(self) -> int:
+        """Total size of all tracked artifacts in bytes."""
+        with self._lock:
+            return sum(artifact.size for artifact in self._artifacts.values())
+
+    def register(self, path: str) -> None:
+        """Start tracking a newly created file or directory.
+
+        Args:
+            path: Path to the artifact
+        """
+        key = os.path.abspath(path)
+        size = self._measure(key)
+        with self._lock:
+            artifact = self._artifacts.get(key)
+            if artifact is None:
+                self._artifacts[key] = StorageArtifact(key, size, time.time())
+            else:
+                artifact.size = size
+                artifact.last_access = time.time()
+
+    def touch(self, path: str) -> None:
+        """Mark an artifact as recently used, also for the sweeping process.
+
+        Args:
+            path: Path to the artifact
+        """
+        key = os.path.abspath(path)
+        with self._lock:
+            artifact = self._artifacts.get(key)
+            if artifact is not None:
+                artifact.last_access = time.time()
+        try:
+            os.utime(key)
+        except OSError:
+            pass
+
+    @contextmanager
+    def pin(self, *paths: str) -> Iterator[None]:
+        """Protect artifacts from eviction for the duration of the block.
+
+        Args:
+            paths: Paths to protect; paths that do not exist yet are ignored
+        """
+        keys = [os.path.abspath(path) for path in paths]
+        with self._lock:
+            for key in keys:
+                artifact = self._artifacts.get(key)
+                if artifact is not None:
+                    artifact.pins += 1
+                    artifact.last_access = time.time()
+        fds = [fd for fd in (_lock_artifact(key, fcntl.LOCK_SH) for key in keys) if fd is not None]
+        for fd in fds:
+            os.utime(fd)
+        try:
+            yield
+        finally:
+            for fd in fds:
+                os.close(fd)
+            with self._lock:
+                for key in keys:
+                    artifact = self._artifacts.get(key)
+                    if artifact is not None and artifact.pins > 0:
+                        artifact.pins -= 1
+
+    def retain(self, path: str) -> None:
+        """Protect an artifact from eviction until it is released.
+
+        Args:
+            path: Path to the artifact
+        """
+        key = os.path.abspath(path)
+        # Locked afresh, since the path may name a new directory replacing the one locked before
+        fd = _lock_artifact(key, fcntl.LOCK_SH)
+        with self._lock:
+            artifact = self._artifacts.get(key)
+            if artifact is not None:
+                artifact.retained = True
+            previous = self._retained_fds.pop(key, None)
+            if fd is not None:
+                self._retained_fds[key] = fd
+        if previous is not None:
+            os.close(previous)
+
+    def release(self, path: str) -> None:
+        """Allow a previously retained artifact to be evicted again.
+
+        Args:
+            path: Path to the artifact
+        """
+        key = os.path.abspath(path)
+        with self._lock:
+            artifact = self._artifacts.get(key)
+            if artifact is not None:
+                artifact.retained = False
+            fd = self._retained_fds.pop(key, None)
+        if fd is not None:
+            os.close(fd)
+
+    def adopt_existing(self) -> None:
+        """Track artifacts already present under the root directory.
+
+        Documents directly in the root directory and the directories in its
+        ``vector_stores`` and ``partial_downloads`` subdirectories are adopted,
+        using their modification time as the last access time.
+        """
+        if not os.path.isdir(self.root_dir):
+            return
+
+        candidates = []
+        for entry in os.scandir(self.root_dir):
+            if entry.is_file() and not entry.name.startswith("."):
+                candidates.append(entry.path)
+        for subdirectory in ("vector_stores", "partial_downloads"):
+            path = os.path.join(self.root_dir, subdirectory)
+            if os.path.isdir(path):
+                candidates.extend(entry.path for entry in os.scandir(path) if entry.is_dir())
+
+        for path in candidates:
+            key = os.path.abspath(path)
+            with self._lock:
+                if key in self._artifacts:
+                    continue
+            try:
+                mtime = os.path.getmtime(key)
+            except OSError:
+                continue
+            size = self._measure(key)
+            with self._lock:
+                self._artifacts.setdefault(key, StorageArtifact(key, size, mtime))
+
+    def refresh(self) -> None:
+        """Bring the tracked artifacts in line with the root directory.
+
+        Adopts artifacts created by other processes, forgets ones that were
+        removed, and takes accesses by other processes from the modification
+        times that ``touch`` sets.
+        """
+        self.adopt_existing()
+        with self._lock:
+            artifacts = list(self._artifacts.values())
+        for artifact in artifacts:
+            try:
+                mtime = os.path.getmtime(artifact.path)
+            except OSError:
+                with self._lock:
+                    if self._artifacts.get(artifact.path) is artifact and not os.path.exists(artifact.path):
+                        del self._artifacts[artifact.path]
+                continue
+            artifact.last_access = max(artifact.last_access, mtime)
+
+    def sweep(self) -> List[str]:
+        """Evict expired artifacts, then least-recently-used ones over budget.
+
+        Artifacts pinned or retained by any process are skipped: each victim is
+        locked exclusively before it is removed, which fails while another
+        process holds a shared lock on it.
+
+        Returns:
+            Paths of the evicted artifacts
+        """
+        self.refresh()
+        now = time.time()
+        with self._lock:
+            victims = []
+            evictable = sorted(
+                (a for a in self._artifacts.values() if a.pins == 0 and not a.retained),
+                key=lambda a: a.last_access,
+            )
+            total = sum(artifact.size for artifact in self._artifacts.values())
+            for artifact in evictable:
+                expired = self.ttl_seconds > 0 and now - artifact.last_access > self.ttl_seconds
+                over_budget = self.max_bytes > 0 and total > self.max_bytes
+                if not (expired or over_budget):
+                    continue
+                fd = _lock_artifact(artifact.path, fcntl.LOCK_EX)
+                if fd is None:
+                    continue
+                victims.append((artifact, fd))
+                total -= artifact.size
+            for artifact, _ in victims:
+                del self._artifacts[artifact.path]
+
+        evicted = []
+        for artifact, fd in victims:
+            try:
+                if os.path.isdir(artifact.path):
+                    shutil.rmtree(artifact.path)
+                elif os.path.exists(artifact.path):
+                    os.remove(artifact.path)
+                evicted.append(artifact.path)
+            except OSError as e:
+                logger.warning("Failed to evict %s: %s", artifact.path, e)
+            finally:
+                os.close(fd)
+        if evicted:
+            logger.info("Evicted %d storage artifacts", len(evicted))
+        return evicted
+
+    def start(self) -> None:
+        """Adopt existing artifacts and start the background sweep task."""
+        if self._sweep_task is not None and not self._sweep_task.done():
+            return
+        self.adopt_existing()
+        self._sweep_task = asyncio.get_running_loop().create_task(self._sweep_loop())
+
+    async def stop(self) -> None:
+        """Stop the background sweep task and hand the sweeper lock to another process."""
+        if self._sweep_task is None:
+            return
+        self._sweep_task.cancel()
+        try:
+            await self._sweep_task
+        except asyncio.CancelledError:
+            pass
+        self._sweep_task = None
+        if self._sweeper_fd is not None:
+            os.close(self._sweeper_fd)
+            self._sweeper_fd = None
+
+    def acquire_sweeper_lock(self) -> bool:
+        """Become the process that sweeps the root directory, if no other process is.
+
+        Returns:
+            Whether this process holds the sweeper lock
+        """
+        if self._sweeper_fd is None:
+            os.makedirs(self.root_dir, exist_ok=True)
+            fd = os.open(os.path.join(self.root_dir, SWEEPER_LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+            self._sweeper_fd = fd
+        return True
+
+    async def _sweep_loop(self) -> None:
+        """Run sweeps periodically in a worker thread, off the event loop.
+
+        Every process runs the loop, but only the one holding the sweeper lock
+        sweeps; the others take over if it exits.
+        """
+        while True:
+            try:
+                if self.acquire_sweeper_lock():
+                    await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.exception("Storage sweep failed: %s", e)
+            await asyncio.sleep(self.sweep_interval_seconds)
+
+    @staticmethod
+    def _measure(path: str) -> int:
+        """Return the size of a file, or the total size of a directory tree."""
+        if os.path.isfile(path):
+            return os.path.getsize(path)
+        total = 0
+        for dirpath, _, filenames in os.walk(path):
+            for name in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, name))
+                except OSError:
+                    continue
+        return total
+
+
+def _lock_artifact(path: str, operation: int) -> Optional[int]:
+    """Take a non-blocking ``flock`` on a file or directory.
+
+    Args:
+        path: Path to the artifact
+        operation: ``fcntl.LOCK_SH`` or ``fcntl.LOCK_EX``
+
+    Returns:
+        Descriptor holding the lock until it is closed, or None if the artifact
+        does not exist or is locked incompatibly by another descriptor
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        fcntl.flock(fd, operation | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+# Create global storage manager instance
+storage_manager = StorageManager(
+    root_dir=settings.DOCUMENT_STORAGE_PATH,
+    max_bytes=settings.STORAGE_MAX_BYTES,
+    ttl_seconds=settings.STORAGE_TTL_SECONDS,
+    sweep_interval_seconds=settings.STORAGE_SWEEP_INTERVAL_SECONDS,
+)
@@ -1,11 +1,19 @@
 """Main FastAPI application."""
 
 import os
-from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 
+try:
+    import orjson
+except ImportError:  # Installed with the optional serving dependencies
+    orjson = None
+
 from app.api.v1 import document, hackrx
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.storage import storage_manager
+from app.services.document_processor import pdf_extractor
 
 # Create FastAPI app
 app = FastAPI(
@@ -81,8 +89,24 @@ async def health_check():
         "api_version": "v1",
     }
 
+# Metrics endpoint
+@app.get("/metrics")
+async def get_metrics():
+    """Metrics endpoint."""
+    # Routes with a response model are serialized by pydantic; this large dict is not
+    if orjson is not None:
+        return Response(orjson.dumps(metrics.snapshot()), media_type="application/json")
+    return metrics.snapshot()
+
 # Create storage directory if it doesn't exist
 @app.on_event("startup")
 async def startup_event():
     """Run startup tasks."""
     os.makedirs(settings.DOCUMENT_STORAGE_PATH, exist_ok=True)
+    storage_manager.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Run shutdown tasks."""
+    await storage_manager.stop()
+    pdf_extractor.shutdown()
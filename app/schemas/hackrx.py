@@ -1,6 +1,6 @@
 """Schemas for the HackRx API endpoints."""
 
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Optional, Union
 
 from pydantic import BaseModel, Field, HttpUrl
 
@@ -27,6 +27,10 @@ class QuestionAnswer(BaseModel):
     confidence: float = Field(..., description="Confidence score for the answer")
     context: List[str] = Field(..., description="Relevant context used to generate the answer")
     sources: List[str] = Field(..., description="Sources of the information used to generate the answer")
+    clauses: List[str] = Field(default_factory=list, description="Section and clause identifiers the answer was drawn from")
+    method: str = Field("llm", description="How the answer was produced: \"extractive\", \"llm\" or \"none\"")
+    model: Optional[str] = Field(None, description="Model of the cascade that produced an LLM answer")
+    partial: bool = Field(False, description="Whether the answer was cut short by the request deadline")
 
 
 class HackRxRunDetailedResponse(BaseModel):
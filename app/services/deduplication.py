@@ -0,0 +1,288 @@
+"""Remove page boilerplate and collapse near-duplicate chunks.
+
+Near-duplicates are found with MinHash signatures of word shingles, bucketed
+with locality-sensitive hashing so that each chunk is only compared with the
+few chunks sharing a band of its signature. Clauses that differ only in their
+figures, such as waiting periods of 24 and 48 months, or in a negation, such
+as "covered" and "not covered", are near-duplicates by their shingles but not
+in meaning, so chunks only collapse if they also state the same numbers and
+negations.
+"""
+
+import re
+import zlib
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain.schema import Document
+
+NUM_PERM = 128
+BANDS = 32
+SHINGLE_SIZE = 5
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+WORD = re.compile(r"\w+")
+DIGITS = re.compile(r"\d+")
+
+# Figures a clause may state, in digits or words
+NUMBER = re.compile(
+    r"\d+(?:[.,]\d+)*|\b(?:zero|one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve|thirteen"
+    r"|fourteen|fifteen|sixteen|seventeen|eighteen|nineteen|twenty|thirty|forty|fifty|sixty|seventy|eighty"
+    r"|ninety|hundred|thousand|lakhs?|crores?|million|billion|half|double|twice)\b",
+    re.IGNORECASE
+)
+
+# Words that turn a clause into its opposite, such as "not covered" or "excluded"
+POLARITY = re.compile(
+    r"\b(?:not|no|never|none|nor|neither|without|cannot|except|unless|exclud(?:e|es|ed|ing)|exclusions?)\b"
+    r"|n't\b",
+    re.IGNORECASE
+)
+
+# Lines at each end of a page that may belong to a running header or footer
+EDGE_LINES = 3
+
+# Metadata fields identifying where a chunk came from
+LOCATION_FIELDS = ("source", "page", "section_id")
+
+
+class MinHasher:
+    """Compute MinHash signatures of texts.
+    
+    The last element of a signature is a fingerprint of the numbers and
+    negations in the text rather than a MinHash value; signatures only match if
+    their fingerprints are equal.
+    """
+    
+    def __init__(self, num_perm: int = NUM_PERM, shingle_size: int = SHINGLE_SIZE, seed: int = 1):
+        """Initialize the hasher.
+        
+        Args:
+            num_perm: Number of hash permutations, the length of a signature
+            shingle_size: Number of words per shingle
+            seed: Seed of the permutations; signatures are comparable only for equal seeds
+        """
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.shingle_size = shingle_size
+    
+    def signature(self, text: str) -> np.ndarray:
+        """Return the MinHash signature of a text.
+        
+        Args:
+            text: Text to sign
+            
+        Returns:
+            uint32 array of length ``num_perm + 1``
+        """
+        words = WORD.findall(text.lower())
+        size = self.shingle_size
+        shingles = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+        hashes = np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles), dtype=np.uint64)
+        # Universal hashing; uint64 products wrap around like the reference implementation's
+        permuted = (hashes[:, None] * self.a + self.b) % MERSENNE_PRIME & MAX_HASH
+        numbers = " ".join(number.replace(",", "") for number in NUMBER.findall(text.lower()))
+        negations = " ".join(POLARITY.findall(text.lower()))
+        fingerprint = zlib.crc32(f"{numbers}|{negations}".encode())
+        return np.append(permuted.min(axis=0), np.uint64(fingerprint)).astype(np.uint32)
+    
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """Return the MinHash signatures of several texts.
+        
+        Args:
+            texts: Texts to sign
+            
+        Returns:
+            uint32 array with one signature per row
+        """
+        if not texts:
+            return np.zeros((0, len(self.a) + 1), dtype=np.uint32)
+        return np.stack([self.signature(text) for text in texts])
+
+
+class LSHIndex:
+    """Find previously inserted signatures similar to a query signature."""
+    
+    def __init__(self, threshold: float, bands: int = BANDS):
+        """Initialize the index.
+        
+        Args:
+            threshold: Lowest estimated Jaccard similarity of a match
+            bands: Number of signature bands; more bands find less similar candidates
+        """
+        self.threshold = threshold
+        self.bands = bands
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+        self._signatures: Dict[int, np.ndarray] = {}
+    
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        """Split the MinHash values of a signature into the bucket keys of its bands."""
+        return [band.tobytes() for band in np.array_split(signature[:-1], self.bands)]
+    
+    def query(self, signature: np.ndarray) -> Optional[int]:
+        """Return the key of the most similar inserted signature above the threshold.
+        
+        Only signatures of texts stating the same numbers and negations are considered.
+        
+        Args:
+            signature: Signature to look up
+            
+        Returns:
+            Key of the match, or None if there is none
+        """
+        candidates = set()
+        for buckets, band in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(buckets.get(band, ()))
+        best, best_similarity = None, self.threshold
+        for key in sorted(candidates):
+            candidate = self._signatures[key]
+            if candidate[-1] != signature[-1]:
+                continue
+            similarity = float(np.mean(candidate[:-1] == signature[:-1]))
+            if similarity >= best_similarity:
+                best, best_similarity = key, similarity
+        return best
+    
+    def insert(self, key: int, signature: np.ndarray) -> None:
+        """Add a signature under a key.
+        
+        Args:
+            key: Key returned by matching queries
+            signature: Signature to add
+        """
+        self._signatures[key] = signature
+        for buckets, band in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(band, []).append(key)
+
+
+def find_duplicates(signatures: Sequence[np.ndarray], threshold: float) -> Dict[int, int]:
+    """Map each near-duplicate row to the earliest similar row.
+    
+    Rows are numbered consecutively across the signature arrays, as the chunks
+    of vector stores merged in the same order are.
+    
+    Args:
+        signatures: Signature arrays, one row per chunk
+        threshold: Lowest estimated Jaccard similarity of duplicates
+        
+    Returns:
+        Dictionary from duplicate row to the row representing it
+    """
+    index = LSHIndex(threshold)
+    duplicates = {}
+    row = 0
+    for array in signatures:
+        for signature in array:
+            representative = index.query(signature)
+            if representative is None:
+                index.insert(row, signature)
+            else:
+                duplicates[row] = representative
+            row += 1
+    return duplicates
+
+
+def location(metadata: Dict) -> Dict:
+    """Return the fields of chunk metadata that locate it in its document."""
+    return {field: metadata[field] for field in LOCATION_FIELDS if metadata.get(field) is not None}
+
+
+def with_duplicates(representative: Document, duplicates: Sequence[Document]) -> Document:
+    """Copy a chunk, adding back-references to the chunks it replaces.
+    
+    The references, under the ``duplicates`` metadata key, include the ones the
+    replaced chunks held themselves.
+    
+    Args:
+        representative: Chunk kept
+        duplicates: Near-duplicate chunks dropped in its favour
+        
+    Returns:
+        The chunk with the combined references
+    """
+    references = list(representative.metadata.get("duplicates", []))
+    for duplicate in duplicates:
+        references.append(location(duplicate.metadata))
+        references.extend(duplicate.metadata.get("duplicates", []))
+    return Document(
+        page_content=representative.page_content,
+        metadata={**representative.metadata, "duplicates": references}
+    )
+
+
+def deduplicate_chunks(chunks: List[Document], hasher: MinHasher, threshold: float) -> List[Document]:
+    """Keep the first of each group of near-duplicate chunks.
+    
+    Args:
+        chunks: Chunks in document order
+        hasher: Hasher computing the chunk signatures
+        threshold: Lowest estimated Jaccard similarity of duplicates
+        
+    Returns:
+        The remaining chunks, with back-references to the ones dropped
+    """
+    duplicates = find_duplicates([hasher.signatures([chunk.page_content for chunk in chunks])], threshold)
+    if not duplicates:
+        return chunks
+    
+    groups: Dict[int, List[int]] = {}
+    for row, representative in duplicates.items():
+        groups.setdefault(representative, []).append(row)
+    return [
+        with_duplicates(chunk, [chunks[row] for row in groups[i]]) if i in groups else chunk
+        for i, chunk in enumerate(chunks) if i not in duplicates
+    ]
+
+
+def _line_key(line: str) -> str:
+    """Normalize a line so that headers differing only in page numbers are equal."""
+    return " ".join(DIGITS.sub("#", line.lower()).split())
+
+
+def strip_repeated_lines(documents: List[Document], min_fraction: float) -> List[Document]:
+    """Remove running headers and footers from the pages of a document.
+    
+    A line is boilerplate when it is among the first or last lines of at least
+    ``min_fraction`` of the pages, and of at least two pages, ignoring digits so
+    that page numbers do not matter. Boilerplate is only removed at the top and
+    bottom of pages, never from the body text.
+    
+    Args:
+        documents: Pages of one document, in order
+        min_fraction: Fraction of pages a line must repeat on
+        
+    Returns:
+        Pages without their headers and footers
+    """
+    if len(documents) < 3:
+        return documents
+    
+    page_lines = [document.page_content.splitlines() for document in documents]
+    counts: Dict[str, int] = {}
+    for lines in page_lines:
+        content = [line for line in lines if line.strip()]
+        for key in {_line_key(line) for line in content[:EDGE_LINES] + content[-EDGE_LINES:]}:
+            counts[key] = counts.get(key, 0) + 1
+    boilerplate = {key for key, count in counts.items() if count >= max(2, min_fraction * len(documents))}
+    if not boilerplate:
+        return documents
+    
+    def is_edge(line: str) -> bool:
+        return not line.strip() or _line_key(line) in boilerplate
+    
+    stripped = []
+    for document, lines in zip(documents, page_lines):
+        start, end = 0, len(lines)
+        while start < end and is_edge(lines[start]):
+            start += 1
+        while end > start and is_edge(lines[end - 1]):
+            end -= 1
+        stripped.append(Document(page_content="\n".join(lines[start:end]), metadata=document.metadata))
+    return stripped
+
+
+# Shared so that signatures of all documents are comparable
+minhasher = MinHasher()
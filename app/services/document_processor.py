@@ -1,47 +1,244 @@
 """Document processing service for extracting text and creating document chunks."""
 
-from typing import List, Dict, Any, Optional
+import asyncio
+import os
+from typing import IO, Any, Callable, Dict, List, Optional, Set, Tuple, TypeVar, Union
 
-from langchain.document_loaders import PyPDFLoader, Docx2txtLoader, UnstructuredEmailLoader
+from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+from app.core.config import settings
+from app.core.deadline import Deadline, DeadlineExceeded
+from app.core.metrics import metrics
+from app.core.storage import storage_manager
+from app.services.deduplication import deduplicate_chunks, minhasher, strip_repeated_lines
+from app.services.document_structure import split_sections
 from app.utils.document_handlers.document_handler import DocumentHandler
+from app.utils.document_handlers.docx_extractor import extract_docx_text
+from app.utils.document_handlers.email_extractor import parse_email
+from app.utils.document_handlers.pdf_extractor import PageTextCache, PDFExtractor
+
+T = TypeVar("T")
+
+# Upper bound for connect and read timeouts of downloads, further limited by the request deadline
+DOWNLOAD_TIMEOUT_SECONDS = 30
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+# Shared by all processors so the worker pool and page cache are reused across requests
+pdf_extractor = PDFExtractor(
+    cache=PageTextCache(settings.PDF_PAGE_CACHE_PATH) if settings.PDF_PAGE_CACHE_PATH else None,
+    max_workers=settings.PDF_EXTRACT_WORKERS,
+    min_pages_per_worker=settings.PDF_MIN_PAGES_PER_WORKER,
+)
 
 
 class DocumentProcessor:
     """Service for processing documents and extracting text."""
     
+    # Background tasks persisting raw downloads, kept referenced until they finish
+    _persist_tasks: Set[asyncio.Task] = set()
+    
     def __init__(self):
         """Initialize the document processor."""
         self.document_handler = DocumentHandler()
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
             length_function=len,
         )
     
-    async def process_document_from_url(self, url: str, doc_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    async def process_document_from_url(
+        self,
+        url: str,
+        doc_type: Optional[str] = None,
+        deadline: Optional[Deadline] = None
+    ) -> List[Dict[str, Any]]:
         """Process a document from a URL.
         
         Args:
             url: URL of the document to process
             doc_type: Optional document type (pdf, docx, email)
+            deadline: Optional request deadline bounding the download
             
         Returns:
             List of document chunks with text and metadata
+            
+        Raises:
+            DeadlineExceeded: If the deadline passes during the download
+        """
+        chunks, _ = await self.process_versioned_document(url, doc_type, deadline)
+        return chunks
+    
+    async def process_versioned_document(
+        self,
+        url: str,
+        doc_type: Optional[str] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        """Process a document from a URL and return the version it was processed at.
+        
+        The version is taken from the download itself, as ``document_version``
+        would return it, without a request of its own.
+        
+        Args:
+            url: URL of the document to process
+            doc_type: Optional document type (pdf, docx, email)
+            deadline: Optional request deadline bounding the download
+            
+        Returns:
+            Tuple of the document chunks with text and metadata, and the document's version
+            
+        Raises:
+            DeadlineExceeded: If the deadline passes during the download
         """
+        deadline = deadline or Deadline()
+        if settings.DOCUMENT_IN_MEMORY_INGEST:
+            return await self._process_document_in_memory(url, doc_type, deadline)
+        
         # Download the document
-        file_path, filename = self.document_handler.download_document(url, doc_type=doc_type)
+        file_path, filename, version = await self._download(
+            self.document_handler.download_document, url, deadline, doc_type=doc_type
+        )
         
         # Extract text based on document type
-        extension = filename.split('.')[-1].lower() if '.' in filename else ''
+        extension = self._get_extension(filename)
+        
+        # Keep the download from being evicted while it is being parsed
+        with storage_manager.pin(file_path):
+            if extension == 'pdf':
+                return await self._process_pdf(file_path, filename), version
+            elif extension in ['docx', 'doc']:
+                return await self._process_docx(file_path, filename), version
+            elif extension in ['eml', 'msg', 'email']:
+                return await self._process_email(file_path, filename), version
+            else:
+                raise ValueError(f"Unsupported document type: {extension}")
+    
+    async def document_version(
+        self,
+        url: str,
+        known_version: Optional[str] = None,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """Return an identifier of the current version of a document.
         
+        Versions are revalidated with a conditional request; only documents
+        served without a validator are downloaded to hash their content.
+        
+        Args:
+            url: URL of the document
+            known_version: Version returned by an earlier call, to revalidate
+            deadline: Optional request deadline bounding the request
+            
+        Returns:
+            The document's version, equal to ``known_version`` if it is unchanged
+            
+        Raises:
+            DeadlineExceeded: If the deadline passes during the request
+        """
+        return await self._download(
+            self.document_handler.document_version, url, deadline or Deadline(), known_version=known_version
+        )
+    
+    async def _process_document_in_memory(
+        self,
+        url: str,
+        doc_type: Optional[str] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        """Process a document from a URL without writing it to the storage directory first.
+        
+        The document is downloaded into a spooled buffer and parsed straight from
+        it. If raw file persistence is enabled, the buffer is written to storage in
+        the background after parsing.
+        
+        Args:
+            url: URL of the document to process
+            doc_type: Optional document type (pdf, docx, email)
+            deadline: Optional request deadline bounding the download
+            
+        Returns:
+            Tuple of the document chunks with text and metadata, and the document's version
+        """
+        buffer, filename, version = await self._download(
+            self.document_handler.download_to_buffer,
+            url,
+            deadline or Deadline(),
+            doc_type=doc_type,
+            max_memory_size=settings.DOCUMENT_SPOOL_MAX_BYTES,
+        )
+        
+        file_path = None
+        if settings.DOCUMENT_PERSIST_RAW:
+            file_path = os.path.join(self.document_handler.storage_dir, filename)
+        
+        try:
+            documents = await self._load_from_buffer(buffer, self._get_extension(filename))
+        except BaseException:
+            buffer.close()
+            raise
+        
+        if file_path is None:
+            buffer.close()
+        else:
+            task = asyncio.create_task(
+                asyncio.to_thread(self.document_handler.persist_buffer, buffer, filename)
+            )
+            self._persist_tasks.add(task)
+            task.add_done_callback(self._persist_tasks.discard)
+        
+        return await asyncio.to_thread(self._split_documents, documents, filename, file_path), version
+    
+    async def _download(self, download: Callable[..., T], url: str, deadline: Deadline, **kwargs: Any) -> T:
+        """Run a blocking download in a worker thread within the request deadline.
+        
+        Running in a thread lets several documents be fetched at once.
+        
+        Args:
+            download: Document handler method performing the download
+            url: URL of the document
+            deadline: Request deadline
+            **kwargs: Further arguments for the download method
+            
+        Returns:
+            Result of the download method
+            
+        Raises:
+            DeadlineExceeded: If the deadline passes before the download completes
+        """
+        deadline.check(f"downloading {url}")
+        timeout = deadline.timeout(DOWNLOAD_TIMEOUT_SECONDS)
+        try:
+            return await deadline.wait_for(asyncio.to_thread(download, url, timeout=timeout, **kwargs))
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            # A download cut short by the deadline's timeout fails like any other
+            if deadline.expired():
+                raise DeadlineExceeded(f"Deadline exceeded while downloading {url}") from e
+            raise
+    
+    async def _load_from_buffer(self, buffer: IO[bytes], extension: str) -> List[Document]:
+        """Load documents from an in-memory buffer.
+        
+        The buffer is handed to the extractors as a file object, so a buffer that
+        spilled to disk is parsed from there rather than read back into memory.
+        
+        Args:
+            buffer: Buffer containing the raw document
+            extension: File extension of the document
+            
+        Returns:
+            List of loaded documents
+        """
         if extension == 'pdf':
-            return await self._process_pdf(file_path, filename)
+            return await self._load_pdf(buffer)
         elif extension in ['docx', 'doc']:
-            return await self._process_docx(file_path, filename)
-        elif extension in ['eml', 'msg']:
-            return await self._process_email(file_path, filename)
+            return await self._load_docx(buffer)
+        elif extension in ['eml', 'msg', 'email']:
+            return await self._load_email(buffer)
         else:
             raise ValueError(f"Unsupported document type: {extension}")
     
@@ -55,25 +252,8 @@ class DocumentProcessor:
         Returns:
             List of document chunks with text and metadata
         """
-        loader = PyPDFLoader(file_path)
-        documents = loader.load()
-        
-        # Add metadata
-        for doc in documents:
-            doc.metadata["source"] = filename
-            doc.metadata["file_path"] = file_path
-        
-        # Split documents into chunks
-        chunks = self.text_splitter.split_documents(documents)
-        
-        # Convert to dictionaries for easier serialization
-        return [
-            {
-                "page_content": chunk.page_content,
-                "metadata": chunk.metadata
-            }
-            for chunk in chunks
-        ]
+        documents = await self._load_pdf(file_path)
+        return await asyncio.to_thread(self._split_documents, documents, filename, file_path)
     
     async def _process_docx(self, file_path: str, filename: str) -> List[Dict[str, Any]]:
         """Process a DOCX document.
@@ -85,47 +265,113 @@ class DocumentProcessor:
         Returns:
             List of document chunks with text and metadata
         """
-        loader = Docx2txtLoader(file_path)
-        documents = loader.load()
+        documents = await self._load_docx(file_path)
+        return await asyncio.to_thread(self._split_documents, documents, filename, file_path)
+    
+    async def _process_email(self, file_path: str, filename: str) -> List[Dict[str, Any]]:
+        """Process an email document.
         
-        # Add metadata
-        for doc in documents:
-            doc.metadata["source"] = filename
-            doc.metadata["file_path"] = file_path
+        Args:
+            file_path: Path to the email file
+            filename: Name of the file
+            
+        Returns:
+            List of document chunks with text and metadata
+        """
+        documents = await self._load_email(file_path)
+        return await asyncio.to_thread(self._split_documents, documents, filename, file_path)
+    
+    async def _load_pdf(self, source: Union[str, IO[bytes]]) -> List[Document]:
+        """Load a PDF document with one document per page.
         
-        # Split documents into chunks
-        chunks = self.text_splitter.split_documents(documents)
+        Extraction runs in a worker thread so the event loop stays responsive
+        while pages are extracted in the shared worker pool.
         
-        # Convert to dictionaries for easier serialization
+        Args:
+            source: Path to the PDF file or a buffer containing it
+            
+        Returns:
+            List of loaded documents
+        """
+        pages = await asyncio.to_thread(pdf_extractor.extract_pages, source)
         return [
-            {
-                "page_content": chunk.page_content,
-                "metadata": chunk.metadata
-            }
-            for chunk in chunks
+            Document(page_content=text, metadata={"page": page_number})
+            for page_number, text in enumerate(pages)
         ]
     
-    async def _process_email(self, file_path: str, filename: str) -> List[Dict[str, Any]]:
-        """Process an email document.
+    async def _load_docx(self, source: Union[str, IO[bytes]]) -> List[Document]:
+        """Load a DOCX document with the native streaming extractor in a worker thread.
         
         Args:
-            file_path: Path to the email file
+            source: Path to the DOCX file or a buffer containing it
+            
+        Returns:
+            List of loaded documents
+        """
+        text = await asyncio.to_thread(extract_docx_text, source)
+        return [Document(page_content=text, metadata={})]
+    
+    async def _load_email(self, source: Union[str, IO[bytes]]) -> List[Document]:
+        """Load an email with the native EML parser in a worker thread.
+        
+        Args:
+            source: Path to the email file or a buffer containing it
+            
+        Returns:
+            List of loaded documents
+        """
+        message = await asyncio.to_thread(parse_email, source)
+        metadata = {
+            "subject": message.subject,
+            "sender": message.sender,
+            "date": message.date,
+            "attachments": [attachment.filename for attachment in message.attachments],
+        }
+        return [Document(page_content=message.to_text(), metadata=metadata)]
+    
+    def _split_documents(
+        self,
+        documents: List[Document],
+        filename: str,
+        file_path: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """Add source metadata to loaded documents and split them into chunks.
+        
+        This is CPU-bound, including the near-duplicate pass, so callers run it
+        in a worker thread.
+        
+        Args:
+            documents: Loaded documents
             filename: Name of the file
+            file_path: Local path of the file, or None if it was not persisted
             
         Returns:
             List of document chunks with text and metadata
         """
-        loader = UnstructuredEmailLoader(file_path)
-        documents = loader.load()
-        
         # Add metadata
         for doc in documents:
             doc.metadata["source"] = filename
             doc.metadata["file_path"] = file_path
         
+        # Running headers and footers would otherwise be repeated in chunks of every page
+        if settings.DEDUP_ENABLED:
+            documents = strip_repeated_lines(documents, settings.DEDUP_BOILERPLATE_FRACTION)
+        
+        # Split at section headings first so that no chunk straddles two sections
+        if settings.DOCUMENT_STRUCTURE_ENABLED:
+            documents = split_sections(documents)
+        
         # Split documents into chunks
         chunks = self.text_splitter.split_documents(documents)
         
+        # Embed repeated boilerplate, such as disclaimers and definitions, only once
+        if settings.DEDUP_ENABLED:
+            count = len(chunks)
+            chunks = deduplicate_chunks(chunks, minhasher, settings.DEDUP_SIMILARITY_THRESHOLD)
+            metrics.counter(
+                "dedup_chunks_collapsed_total", "Chunks collapsed into a near-duplicate of the same document"
+            ).inc(count - len(chunks))
+        
         # Convert to dictionaries for easier serialization
         return [
             {
@@ -134,3 +380,8 @@ class DocumentProcessor:
             }
             for chunk in chunks
         ]
+    
+    @staticmethod
+    def _get_extension(filename: str) -> str:
+        """Return the lower-cased extension of a filename."""
+        return filename.split('.')[-1].lower() if '.' in filename else ''
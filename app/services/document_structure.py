@@ -0,0 +1,188 @@
+"""Detect the section, clause and definition structure of policy documents."""
+
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+from langchain.schema import Document
+
+from app.services.extractive_answering import STOPWORDS
+
+# "Section 4", "Clause 3.2.", "Article IV:" and the like
+KEYWORD_HEADING = re.compile(
+    r"^\s*(section|clause|article|part|chapter|schedule|annexure)\s+"
+    r"(\d{1,3}(?:\.\d{1,3})*|[IVXLC]{1,6}|[A-Z])\b\s*[.:)\-–]?\s*(.*)$",
+    re.IGNORECASE
+)
+
+# "Section 2(a) of the Act", "Clause 3.1 above shall ...": references to a heading, not headings
+REFERENCE_CONTINUATION = re.compile(
+    r"^(?:\(\w{1,4}\)\s*)?(?:of|above|below|shall|to|and|or|is|are|will|may|hereof|herein|hereunder)\b",
+    re.IGNORECASE
+)
+
+# A line ending mid-sentence, whose next line continues it
+CONTINUED_LINE = re.compile(r"[a-z,(&\-–]\s*$")
+
+# "4.2 Grace period", "3. The insured ...", "7) Exclusions"; a bare "4 " is too ambiguous
+NUMBERED_HEADING = re.compile(
+    r"^\s*(\d{1,3}(?:\.\d{1,3}){1,3}\.?|\d{1,3}[.)])\s+([A-Z\"'“].*)$"
+)
+
+# The "(2)" a list item adds to the id of the heading it is nested under
+LIST_ITEM_SUFFIX = re.compile(r"\(\d{1,3}\)$")
+
+# '"Hospital" means ...', 'Accident shall mean ...'
+DEFINITION = re.compile(
+    r"^[\"'“]?([A-Z][\w\-/ ]{0,60}?)[\"'”]?\s+(?:means|shall mean|refers to|is defined as)\b"
+)
+
+CLAUSE_KEYWORDS = {"Clause", "Article"}
+
+MAX_TITLE_WORDS = 10
+
+LINE = re.compile(r"[^\n]*\n?")
+
+
+@dataclass(frozen=True)
+class SectionHeading:
+    """A heading that opens a section, clause or definition."""
+    
+    id: str
+    title: str
+    kind: str
+
+
+def _title(text: str, fallback: str) -> str:
+    """Return the first words of a heading line as its title."""
+    words = text.split()[:MAX_TITLE_WORDS]
+    return " ".join(words).rstrip(".,;:") or fallback
+
+
+def _is_title(text: str) -> bool:
+    """Return whether the text after a heading number reads as a title rather than a sentence."""
+    text = text.strip()
+    return len(text.split()) <= MAX_TITLE_WORDS and not text.endswith((".", ",", ";", ":"))
+
+
+def _is_keyword_heading(rest: str, previous: str) -> bool:
+    """Return whether a line starting with "Section 2", "Clause 3.1" and the like is a heading.
+    
+    Such a line is a cross-reference instead when it continues the previous line,
+    goes on like "of the Act" or "above shall", or is too long for a title.
+    """
+    if CONTINUED_LINE.search(previous) or REFERENCE_CONTINUATION.match(rest):
+        return False
+    return len(rest.split()) <= MAX_TITLE_WORDS
+
+
+def _is_top_level(number: str, rest: str, parent: SectionHeading) -> bool:
+    """Return whether a single-level "N." heading under another heading is a new top-level section.
+    
+    It is when it numbers the section after the one the parent belongs to and
+    has a title; otherwise it is an item of a list within the parent. A title in
+    capitals ends a list that it would otherwise continue.
+    """
+    if not number.endswith(".") or not _is_title(rest):
+        return False
+    number = int(number.rstrip("."))
+    item = LIST_ITEM_SUFFIX.search(parent.id)
+    if item and number == int(item.group().strip("()")) + 1 and not rest.isupper():
+        return False
+    parent_number = re.search(r"\d+", LIST_ITEM_SUFFIX.sub("", parent.id))
+    return parent_number is not None and number == int(parent_number.group()) + 1
+
+
+def detect_heading(
+    line: str,
+    previous: str = "",
+    parent: Optional[SectionHeading] = None
+) -> Optional[SectionHeading]:
+    """Recognize a line that starts a section, clause or definition.
+    
+    Keyword headings such as "Section 4" must look like titles: a line that
+    continues the previous one or reads "Section 2(a) of the Act ..." refers
+    to a section instead. Under a heading, "1." and "2)" usually number the
+    items of a list, which are nested into the heading's id as in "3.1.15(2)".
+    
+    Args:
+        line: A line of document text
+        previous: The line before it
+        parent: The heading the line falls under, if any
+        
+    Returns:
+        The heading, or None for ordinary text
+    """
+    keyword_match = KEYWORD_HEADING.match(line)
+    numbered_match = NUMBERED_HEADING.match(line)
+    if keyword_match and _is_keyword_heading(keyword_match.group(3), previous):
+        keyword = keyword_match.group(1).capitalize()
+        section_id = f"{keyword} {keyword_match.group(2).upper()}"
+        rest = keyword_match.group(3)
+        kind = "clause" if keyword in CLAUSE_KEYWORDS else "section"
+    elif numbered_match:
+        number = numbered_match.group(1)
+        section_id = number.rstrip(".)")
+        rest = numbered_match.group(2)
+        kind = "clause" if "." in section_id else "section"
+        if parent is not None and "." not in section_id and not _is_top_level(number, rest, parent):
+            section_id = f"{LIST_ITEM_SUFFIX.sub('', parent.id)}({section_id})"
+            kind = "item"
+    else:
+        section_id, rest, kind = None, line.strip(), None
+    
+    definition = DEFINITION.match(rest)
+    # "This means ..." is a sentence, not a definition
+    if definition and not all(word in STOPWORDS for word in definition.group(1).lower().split()):
+        term = definition.group(1).strip()
+        return SectionHeading(section_id or f"Definition: {term}", term, "definition")
+    if section_id is None:
+        return None
+    return SectionHeading(section_id, _title(rest, section_id), kind)
+
+
+def split_sections(documents: List[Document]) -> List[Document]:
+    """Split loaded documents at section, clause and definition headings.
+    
+    Every part is labelled with the ``section_id``, ``section_title`` and
+    ``section_kind`` of the heading it falls under. A section that runs over a
+    page break continues on the next page. Text before the first heading has no
+    section. Numbered list items are nested under the heading they follow.
+    
+    Args:
+        documents: Loaded documents, such as the pages of a PDF, in reading order
+        
+    Returns:
+        Documents with one part per section and page, carrying the original metadata
+    """
+    parts = []
+    current: Optional[SectionHeading] = None
+    for document in documents:
+        text = document.page_content
+        start = 0
+        offset = 0
+        previous = ""
+        for line in LINE.findall(text):
+            heading = detect_heading(line, previous, current) if line.strip() else None
+            if heading is not None:
+                _append_part(parts, document, text[start:offset], current)
+                current, start = heading, offset
+            offset += len(line)
+            previous = line
+        _append_part(parts, document, text[start:], current)
+    return parts
+
+
+def _append_part(
+    parts: List[Document],
+    document: Document,
+    text: str,
+    heading: Optional[SectionHeading]
+) -> None:
+    """Add a non-empty part of a document labelled with its section."""
+    if not text.strip():
+        return
+    metadata = dict(document.metadata)
+    if heading is not None:
+        metadata.update(section_id=heading.id, section_title=heading.title, section_kind=heading.kind)
+    parts.append(Document(page_content=text.strip(), metadata=metadata))
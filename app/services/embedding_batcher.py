@@ -0,0 +1,179 @@
+"""Cross-request micro-batching of embedding calls."""
+
+import asyncio
+import time
+from collections import deque
+from typing import Deque, List, Optional, Set, Tuple
+
+from langchain.embeddings.base import Embeddings
+
+from app.core.metrics import metrics
+from app.services.llm_scheduler import ProviderScheduler, estimate_tokens
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+WAIT_MS_BUCKETS = (0.5, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+
+class _PendingRequest:
+    """Texts submitted by one caller and the future its embeddings are delivered to."""
+    
+    def __init__(self, texts: List[str], future: asyncio.Future):
+        self.texts = texts
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.results: List[Optional[List[float]]] = [None] * len(texts)
+        self.remaining = len(texts)
+
+
+class EmbeddingBatcher:
+    """Gather embedding requests from concurrent callers into shared provider calls.
+    
+    Texts are queued until either ``max_batch_size`` texts are waiting or the
+    oldest has waited ``max_wait_ms``, then sent to the provider in one call and
+    the vectors routed back to each caller. Identical texts within a batch are
+    embedded once.
+    """
+    
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_batch_size: int = 256,
+        max_wait_ms: float = 10,
+        scheduler: Optional[ProviderScheduler] = None,
+    ):
+        """Initialize the embedding batcher.
+        
+        Args:
+            embeddings: Provider used for the batched calls
+            max_batch_size: Maximum number of texts per provider call
+            max_wait_ms: Maximum time a text waits for its batch to fill
+            scheduler: Optional scheduler applying rate limits and retries to provider calls
+        """
+        self.embeddings = embeddings
+        self.scheduler = scheduler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Deque[Tuple[_PendingRequest, int]] = deque()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._batch_size = metrics.histogram(
+            "embedding_batch_size", BATCH_SIZE_BUCKETS, "Texts per batched embedding provider call"
+        )
+        self._batch_wait = metrics.histogram(
+            "embedding_batch_wait_ms", WAIT_MS_BUCKETS, "Time embedding requests wait for their batch"
+        )
+    
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts as part of the next shared batch.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            One embedding per text, in order
+        """
+        if not texts:
+            return []
+        
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Futures are bound to a loop; start afresh if a new one is running
+            self._loop = loop
+            self._queue.clear()
+            self._timer = None
+        
+        request = _PendingRequest(list(texts), loop.create_future())
+        self._queue.extend((request, index) for index in range(len(texts)))
+        
+        if len(self._queue) >= self.max_batch_size:
+            self._flush(force=False)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush, True)
+        
+        return await request.future
+    
+    def _flush(self, force: bool) -> None:
+        """Dispatch queued texts.
+        
+        Args:
+            force: Dispatch a partial batch too, not only full ones; set when the wait timer fires
+        """
+        if force:
+            self._timer = None
+        
+        while len(self._queue) >= self.max_batch_size or (force and self._queue):
+            size = min(self.max_batch_size, len(self._queue))
+            batch = [self._queue.popleft() for _ in range(size)]
+            task = self._loop.create_task(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        
+        if not self._queue and self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        elif self._queue and self._timer is None:
+            self._timer = self._loop.call_later(self.max_wait, self._flush, True)
+    
+    async def _dispatch(self, batch: List[Tuple[_PendingRequest, int]]) -> None:
+        """Send one batch to the provider and deliver the results.
+        
+        Args:
+            batch: Queued ``(request, text index)`` entries
+        """
+        now = time.monotonic()
+        callers = {id(request): request for request, _ in batch}.values()
+        for request in callers:
+            self._batch_wait.observe((now - request.enqueued_at) * 1000)
+        
+        unique_texts = list(dict.fromkeys(request.texts[index] for request, index in batch))
+        self._batch_size.observe(len(unique_texts))
+        
+        try:
+            if self.scheduler is None:
+                vectors = await self.embeddings.aembed_documents(unique_texts)
+            else:
+                vectors = await self.scheduler.call(
+                    lambda: self.embeddings.aembed_documents(unique_texts),
+                    tokens=estimate_tokens(unique_texts),
+                )
+        except Exception as e:
+            for request in callers:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        
+        by_text = dict(zip(unique_texts, vectors))
+        for request, index in batch:
+            request.results[index] = by_text[request.texts[index]]
+            request.remaining -= 1
+            if request.remaining == 0 and not request.future.done():
+                request.future.set_result(request.results)
+
+
+class BatchedEmbeddings(Embeddings):
+    """Embeddings whose async calls go through a shared ``EmbeddingBatcher``.
+    
+    Synchronous calls bypass the batcher and go straight to the provider.
+    """
+    
+    def __init__(self, batcher: EmbeddingBatcher):
+        """Initialize the batched embeddings.
+        
+        Args:
+            batcher: Batcher shared by all callers in the process
+        """
+        self.batcher = batcher
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.batcher.embeddings.embed_documents(texts)
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.batcher.embeddings.embed_query(text)
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.batcher.embed(texts)
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        # Queries are embedded like documents, which is equivalent for OpenAI models
+        return (await self.batcher.embed([text]))[0]
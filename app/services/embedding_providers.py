@@ -0,0 +1,267 @@
+"""Embedding providers, selected through ``settings.EMBEDDING_PROVIDER``.
+
+``openai`` sends embeddings to the OpenAI API through the shared batcher and
+scheduler. ``hashing`` and ``onnx`` run on the local CPU: texts are grouped into
+length-sorted batches, embedded on a thread pool and returned as float32 arrays
+that can be added to a FAISS index without conversion.
+"""
+
+import asyncio
+import os
+from abc import ABC, abstractmethod
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+from langchain.embeddings import OpenAIEmbeddings
+from langchain.embeddings.base import Embeddings
+
+from app.core.config import settings
+from app.services.embedding_batcher import BatchedEmbeddings, EmbeddingBatcher
+from app.services.llm_scheduler import embedding_scheduler
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class LocalEmbeddings(Embeddings, ABC):
+    """Base class for embedding models that run on the local CPU.
+    
+    Subclasses implement ``_embed_batch``. Inputs are sorted by length before
+    batching so that texts of similar size are processed together, which keeps
+    padding overhead low for transformer models.
+    """
+    
+    name = "local"
+    
+    def __init__(self, dimension: int, batch_size: int = 64, max_workers: Optional[int] = None):
+        """Initialize the local embeddings.
+        
+        Args:
+            dimension: Dimension of the produced vectors
+            batch_size: Maximum number of texts per inference batch
+            max_workers: Number of inference threads, defaulting to the CPU count
+        """
+        self.dimension = dimension
+        self.batch_size = batch_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or os.cpu_count() or 1,
+            thread_name_prefix=f"{self.name}-embeddings",
+        )
+    
+    @abstractmethod
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed one batch of texts.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            Array of shape ``(len(texts), dimension)``
+        """
+    
+    def _batches(self, texts: List[str]) -> List[np.ndarray]:
+        """Split text indices into length-sorted batches."""
+        order = np.argsort([len(text) for text in texts], kind="stable")
+        return [order[start:start + self.batch_size] for start in range(0, len(order), self.batch_size)]
+    
+    def _assemble(self, count: int, batches: List[np.ndarray], results: List[np.ndarray]) -> np.ndarray:
+        """Place batch results back in input order."""
+        output = np.empty((count, self.dimension), dtype=np.float32)
+        for indices, vectors in zip(batches, results):
+            output[indices] = vectors
+        return output
+    
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into a float32 array.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            Array of shape ``(len(texts), dimension)``
+        """
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        batches = self._batches(texts)
+        results = self._executor.map(lambda indices: self._embed_batch([texts[i] for i in indices]), batches)
+        return self._assemble(len(texts), batches, list(results))
+    
+    async def aembed_array(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into a float32 array without blocking the event loop.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            Array of shape ``(len(texts), dimension)``
+        """
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        batches = self._batches(texts)
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(self._executor, self._embed_batch, [texts[i] for i in indices])
+            for indices in batches
+        ))
+        return self._assemble(len(texts), batches, results)
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_array([text])[0].tolist()
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return (await self.aembed_array(texts)).tolist()
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_array([text]))[0].tolist()
+
+
+class HashingEmbeddings(LocalEmbeddings):
+    """Signed feature-hashing vectorizer over word unigrams and bigrams.
+    
+    Needs no model files or network access. Vectors are sublinearly
+    term-frequency weighted and L2-normalized, so FAISS L2 distance ranks like
+    cosine similarity. It captures lexical rather than semantic similarity.
+    """
+    
+    name = "hashing"
+    
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        rows: List[int] = []
+        features: List[int] = []
+        for row, text in enumerate(texts):
+            tokens = TOKEN_PATTERN.findall(text.lower())
+            grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            features.extend(zlib.crc32(gram.encode()) for gram in grams)
+            rows.extend([row] * len(grams))
+        
+        counts = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        if features:
+            hashes = np.asarray(features, dtype=np.uint32)
+            columns = (hashes % self.dimension).astype(np.intp)
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(counts, (np.asarray(rows, dtype=np.intp), columns), signs)
+        
+        vectors = np.sign(counts) * np.log1p(np.abs(counts))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class ONNXEmbeddings(LocalEmbeddings):
+    """Sentence-embedding model exported to ONNX, such as a quantized MiniLM.
+    
+    The model directory must contain ``model.onnx`` and a Hugging Face
+    ``tokenizer.json``. Token embeddings are mean-pooled over the attention mask
+    and L2-normalized. Requires the optional ``onnxruntime`` and ``tokenizers``
+    packages.
+    """
+    
+    name = "onnx"
+    
+    def __init__(self, model_path: str, batch_size: int = 64, max_workers: Optional[int] = None,
+                 max_length: int = 256):
+        """Initialize the ONNX embeddings.
+        
+        Args:
+            model_path: Directory containing ``model.onnx`` and ``tokenizer.json``
+            batch_size: Maximum number of texts per inference batch
+            max_workers: Number of inference threads, defaulting to the CPU count
+            max_length: Maximum number of tokens per text
+        """
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "The onnx embedding provider needs the onnxruntime and tokenizers packages"
+            ) from e
+        
+        workers = max_workers or os.cpu_count() or 1
+        options = onnxruntime.SessionOptions()
+        # Parallelism comes from running batches on several threads at once
+        options.intra_op_num_threads = max(1, (os.cpu_count() or 1) // workers)
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_path, "model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        dimension = self.session.get_outputs()[0].shape[-1]
+        super().__init__(dimension, batch_size=batch_size, max_workers=workers)
+    
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+        
+        token_embeddings = self.session.run(None, inputs)[0]
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def create_embeddings(provider: str) -> Embeddings:
+    """Create the embeddings for a provider name.
+    
+    Args:
+        provider: ``openai``, ``hashing`` or ``onnx``
+        
+    Returns:
+        Embeddings instance
+        
+    Raises:
+        ValueError: If the provider is unknown or misconfigured
+    """
+    if provider == "openai":
+        batcher = EmbeddingBatcher(
+            # Retries are handled by the scheduler rather than the client
+            OpenAIEmbeddings(
+                openai_api_key=settings.OPENAI_API_KEY,
+                openai_api_base=settings.OPENAI_BASE_URL,
+                request_timeout=settings.EMBEDDING_REQUEST_TIMEOUT_SECONDS,
+                max_retries=0,
+            ),
+            max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS,
+            scheduler=embedding_scheduler,
+        )
+        return BatchedEmbeddings(batcher)
+    elif provider == "hashing":
+        return HashingEmbeddings(
+            settings.EMBEDDING_HASHING_DIMENSION,
+            batch_size=settings.EMBEDDING_LOCAL_BATCH_SIZE,
+            max_workers=settings.EMBEDDING_LOCAL_WORKERS,
+        )
+    elif provider == "onnx":
+        if not settings.EMBEDDING_ONNX_MODEL_PATH:
+            raise ValueError("EMBEDDING_ONNX_MODEL_PATH must be set for the onnx embedding provider")
+        return ONNXEmbeddings(
+            settings.EMBEDDING_ONNX_MODEL_PATH,
+            batch_size=settings.EMBEDDING_LOCAL_BATCH_SIZE,
+            max_workers=settings.EMBEDDING_LOCAL_WORKERS,
+        )
+    raise ValueError(f"Unknown embedding provider: {provider}")
+
+
+_embeddings: Optional[Embeddings] = None
+
+
+def get_embeddings() -> Embeddings:
+    """Return the process-wide embeddings for the configured provider.
+    
+    Returns:
+        Embeddings instance shared by all requests
+    """
+    global _embeddings
+    if _embeddings is None:
+        _embeddings = create_embeddings(settings.EMBEDDING_PROVIDER)
+    return _embeddings
@@ -0,0 +1,263 @@
+"""Extractive question answering over retrieved chunks, with confidence scores."""
+
+import math
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set
+
+import numpy as np
+
+from app.services.embedding_providers import HashingEmbeddings, TOKEN_PATTERN
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;:])\s+(?=[A-Z0-9(\"'])|\n\s*\n|\n(?=\s*(?:\d+(?:\.\d+)*[.)]?|[a-z][.)]|[-•*])\s)")
+
+MIN_SENTENCE_CHARS = 20
+MAX_SENTENCE_CHARS = 600
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be been before being below between both but by
+can could did do does doing down during each few for from further had has have having he her here hers him
+his how i if in into is it its itself just me more most my no nor not now of off on once only or other our
+out over own same she should so some such than that the their them then there these they this those through
+to too under until up very was we were what when where which while who whom why will with would you your
+policy policies please tell
+""".split())
+
+# Single capital letters naming a plan, part or option ("Plan A"), which are content
+# words even though a lower-cased "a" is not; "I" is the pronoun
+IDENTIFIER = re.compile(r"(?<=\w )(?!I\b)[A-Z]\b")
+
+# Numbers written as words, compared with numbers written in digits
+NUMBER_WORDS = {
+    "one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6", "seven": "7", "eight": "8",
+    "nine": "9", "ten": "10", "eleven": "11", "twelve": "12", "fifteen": "15", "eighteen": "18",
+    "twenty": "20", "thirty": "30", "forty": "40", "fifty": "50", "sixty": "60", "ninety": "90",
+    "hundred": "100", "thousand": "1000",
+}
+NUMBER = re.compile(r"\d+(?:[.,]\d+)*|\b(?:" + "|".join(NUMBER_WORDS) + r")\b", re.IGNORECASE)
+# Words that turn a statement into its opposite
+NEGATION = re.compile(
+    r"\b(?:not|no|never|none|nor|neither|without|cannot|except|unless|exclud(?:e|es|ed|ing)|exclusions?)\b"
+    r"|n't\b",
+    re.IGNORECASE,
+)
+
+# Questions asking for a period, limit or amount, which only a sentence stating one answers
+QUANTITY_QUESTION = re.compile(
+    r"\bhow (?:long|many|much|often|soon)\b|\b(?:period|limit|amount|percentage|percent|age|duration|sum|"
+    r"number|cap|days|months|years|time)\b",
+    re.IGNORECASE,
+)
+QUANTITY = re.compile(
+    r"\d|%|\b(?:one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve|fifteen|twenty|thirty|forty|"
+    r"fifty|sixty|ninety|hundred|thousand|lakh|crore|half|double|percent|unlimited|no limit)\b",
+    re.IGNORECASE,
+)
+# Numbered references to other parts of a document, whose numbers are not quantities
+REFERENCE = re.compile(
+    r"\b(?:section|clause|article|chapter|part|annexure|schedule|appendix|table|page|para(?:graph)?)\s+"
+    r"[\w.()-]+",
+    re.IGNORECASE,
+)
+# Sentences that point elsewhere for the answer instead of giving it
+DEFERRAL = re.compile(
+    r"\b(?:described|specified|set out|defined|detailed|mentioned|given|stated|listed|explained|shown)\s+"
+    r"(?:in|under|at|below|above)\b|\b(?:refer to|see)\s+(?:the\s+)?"
+    r"(?:section|clause|article|chapter|part|annexure|schedule|appendix|table|page|para|below|above)",
+    re.IGNORECASE,
+)
+
+# Logistic model mapping sentence features to the probability that the sentence
+# answers the question. The lexical weights are hand-set so that a sentence
+# restating most of the question's content words scores around 0.95 and a
+# partial match scores below 0.5; the answer-type features keep restatements
+# that lack the kind of answer asked for, or defer to another part of the
+# document, well below that. A sentence missing any of the question's content
+# words, such as the plan or option asked about, may be about something else:
+# the penalty keeps it below 0.75 however well it scores otherwise. Refit the
+# weights on labelled question/answer pairs.
+DEFAULT_WEIGHTS: Dict[str, float] = {
+    "bias": -6.0,
+    "similarity": 4.0,
+    "overlap": 5.0,
+    "margin": 3.0,
+    "rank": 1.0,
+    "missing_quantity": -4.0,
+    "deferral": -4.0,
+    "missing_terms": -6.0,
+}
+
+
+@dataclass
+class ExtractiveAnswer:
+    """The best-scoring sentence for a question and how it was scored."""
+    
+    text: str
+    confidence: float
+    similarity: float
+    overlap: float
+    chunk_index: int
+
+
+def content_terms(text: str) -> Set[str]:
+    """Return the lower-cased content words of a text, with simple plural folding.
+    
+    Digits and single-letter identifiers such as the "A" of "Plan A" count as
+    content words, however short, and number words are written as digits.
+    
+    Args:
+        text: Text to analyse
+        
+    Returns:
+        Set of content terms
+    """
+    terms = set()
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS or (len(token) < 2 and not token.isdigit()):
+            continue
+        if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        terms.add(NUMBER_WORDS.get(token, token))
+    terms.update(identifier.lower() for identifier in IDENTIFIER.findall(text))
+    return terms
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split a chunk into sentences and list items of a useful length.
+    
+    Args:
+        text: Chunk text
+        
+    Returns:
+        Candidate sentences
+    """
+    sentences = []
+    for part in SENTENCE_BOUNDARY.split(text):
+        sentence = " ".join(part.split())
+        if MIN_SENTENCE_CHARS <= len(sentence) <= MAX_SENTENCE_CHARS:
+            sentences.append(sentence)
+    return sentences
+
+
+def numbers(text: str) -> Set[str]:
+    """Return the numbers stated in a text, with number words as digits.
+    
+    Args:
+        text: Text to analyse
+        
+    Returns:
+        Set of numbers
+    """
+    return {
+        NUMBER_WORDS.get(number.lower(), number.replace(",", ""))
+        for number in NUMBER.findall(text)
+    }
+
+
+def grounding_score(answer: str, contexts: Sequence[str]) -> float:
+    """Return the fraction of an answer's content words found in its best supporting passage.
+    
+    Each passage is scored on its own, so that an answer cannot be assembled
+    from words of unrelated passages. A passage only supports an answer if it
+    states every number of the answer, and a negation if the answer is negated.
+    
+    Args:
+        answer: Generated answer
+        contexts: Retrieved context passages
+        
+    Returns:
+        Score between 0 and 1; 0 for an answer without content words or without
+        a passage supporting its numbers and negation
+    """
+    answer_terms = content_terms(answer)
+    if not answer_terms:
+        return 0.0
+    answer_numbers = numbers(answer)
+    negated = NEGATION.search(answer) is not None
+    
+    best = 0.0
+    for context in contexts:
+        if not answer_numbers <= numbers(context) or (negated and NEGATION.search(context) is None):
+            continue
+        best = max(best, len(answer_terms & content_terms(context)) / len(answer_terms))
+    return best
+
+
+class ExtractiveAnswerer:
+    """Pick the sentence of the retrieved chunks that best answers a question.
+    
+    Candidate sentences are scored with vectorized hashed n-gram cosine
+    similarity and the share of the question's content words they contain,
+    together with the margin over the runner-up and the retrieval rank of their
+    chunk. Answer-type features penalize sentences without a quantity when the
+    question asks for one, sentences deferring to another part of the
+    document, and sentences missing some of the question's content words. A
+    logistic model turns these features into a confidence score.
+    """
+    
+    def __init__(self, weights: Optional[Dict[str, float]] = None, dimension: int = 2048):
+        """Initialize the extractive answerer.
+        
+        Args:
+            weights: Logistic model weights, defaulting to ``DEFAULT_WEIGHTS``
+            dimension: Dimension of the hashed sentence vectors
+        """
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.vectorizer = HashingEmbeddings(dimension, batch_size=512, max_workers=1)
+    
+    def answer(self, question: str, chunks: Sequence[str]) -> Optional[ExtractiveAnswer]:
+        """Find the best answering sentence in the retrieved chunks.
+        
+        Args:
+            question: Question to answer
+            chunks: Retrieved chunk texts, most relevant first
+            
+        Returns:
+            Best answer candidate, or None if there are no candidate sentences
+        """
+        question_terms = content_terms(question)
+        candidates = [
+            (chunk_index, sentence)
+            for chunk_index, chunk in enumerate(chunks)
+            for sentence in split_sentences(chunk)
+        ]
+        if not candidates or not question_terms:
+            return None
+        
+        query = np.asarray(self.vectorizer.embed_query(question), dtype=np.float32)
+        vectors = np.asarray(
+            self.vectorizer.embed_documents([sentence for _, sentence in candidates]), dtype=np.float32
+        )
+        similarity = vectors @ query
+        overlap = np.array([
+            len(question_terms & content_terms(sentence)) / len(question_terms)
+            for _, sentence in candidates
+        ], dtype=np.float32)
+        rank = np.array([1 / (1 + chunk_index) for chunk_index, _ in candidates], dtype=np.float32)
+        wants_quantity = QUANTITY_QUESTION.search(question) is not None
+        missing_quantity = np.array([
+            wants_quantity and QUANTITY.search(REFERENCE.sub(" ", sentence)) is None
+            for _, sentence in candidates
+        ], dtype=np.float32)
+        deferral = np.array([DEFERRAL.search(sentence) is not None for _, sentence in candidates], dtype=np.float32)
+        missing_terms = (overlap < 1).astype(np.float32)
+        
+        w = self.weights
+        base = (
+            w["bias"] + w["similarity"] * similarity + w["overlap"] * overlap + w["rank"] * rank
+            + w["missing_quantity"] * missing_quantity + w["deferral"] * deferral
+            + w["missing_terms"] * missing_terms
+        )
+        best = int(np.argmax(base))
+        runner_up = float(np.partition(base, -2)[-2]) if len(base) > 1 else float(w["bias"])
+        # Margin in the model's own units, scaled so a clear winner adds up to ``margin``
+        margin = min(1.0, max(0.0, (float(base[best]) - runner_up) / 4))
+        z = float(base[best]) + w["margin"] * margin
+        
+        return ExtractiveAnswer(
+            text=candidates[best][1],
+            confidence=1 / (1 + math.exp(-z)),
+            similarity=float(similarity[best]),
+            overlap=float(overlap[best]),
+            chunk_index=candidates[best][0],
+        )
@@ -0,0 +1,194 @@
+"""Two-stage retrieval over a section-level index on top of the chunk index."""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain.schema import Document
+from langchain.vectorstores import FAISS
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+CANDIDATE_FRACTION_BUCKETS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 1.0)
+
+
+@dataclass
+class SectionIndex:
+    """Summary vectors of the sections of a vector store.
+    
+    A section's vector is the normalized mean of its chunk vectors. Chunks
+    without a detected section are grouped per source document.
+    """
+    
+    keys: List[Tuple[str, Optional[str]]]
+    titles: List[Optional[str]]
+    vectors: np.ndarray
+    members: List[np.ndarray]
+    
+    def __len__(self) -> int:
+        return len(self.keys)
+    
+    @classmethod
+    def build(cls, vector_store: FAISS) -> "SectionIndex":
+        """Group the chunks of a vector store by section and summarize each section.
+        
+        Args:
+            vector_store: Vector store whose chunks carry ``section_id`` metadata
+            
+        Returns:
+            The store's section index
+        """
+        groups: Dict[Tuple[str, Optional[str]], List[int]] = {}
+        titles: Dict[Tuple[str, Optional[str]], Optional[str]] = {}
+        for row in range(vector_store.index.ntotal):
+            metadata = vector_store.docstore.search(vector_store.index_to_docstore_id[row]).metadata
+            key = (metadata.get("source", ""), metadata.get("section_id"))
+            groups.setdefault(key, []).append(row)
+            titles.setdefault(key, metadata.get("section_title"))
+        
+        chunk_vectors = vector_store.index.reconstruct_n(0, vector_store.index.ntotal)
+        members = [np.asarray(rows, dtype=np.int64) for rows in groups.values()]
+        vectors = np.zeros((len(members), vector_store.index.d), dtype=np.float32)
+        for i, rows in enumerate(members):
+            vectors[i] = chunk_vectors[rows].mean(axis=0)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return cls(list(groups), [titles[key] for key in groups], vectors, members)
+    
+    @classmethod
+    def merge(
+        cls,
+        indexes: Sequence[Optional["SectionIndex"]],
+        sizes: Sequence[int]
+    ) -> Optional["SectionIndex"]:
+        """Combine the section indexes of vector stores merged in the same order.
+        
+        Args:
+            indexes: Section index of each store
+            sizes: Number of chunks of each store
+            
+        Returns:
+            Section index of the merged store, or None if a store has none
+        """
+        if any(index is None for index in indexes):
+            return None
+        if len(indexes) == 1:
+            return indexes[0]
+        offsets = np.cumsum([0, *sizes[:-1]])
+        return cls(
+            [key for index in indexes for key in index.keys],
+            [title for index in indexes for title in index.titles],
+            np.concatenate([index.vectors for index in indexes]),
+            [rows + offset for index, offset in zip(indexes, offsets) for rows in index.members],
+        )
+    
+    def without(self, rows: Sequence[int], size: int) -> "SectionIndex":
+        """Return the section index of the store left after removing some of its rows.
+        
+        The remaining rows move up to close the gaps, as they do in FAISS.
+        Sections left without chunks are dropped; the summary vectors of the
+        others are kept as they are.
+        
+        Args:
+            rows: Rows removed from the store
+            size: Number of rows of the store before the removal
+            
+        Returns:
+            Section index of the reduced store
+        """
+        keep = np.ones(size, dtype=bool)
+        keep[np.asarray(rows, dtype=np.int64)] = False
+        positions = np.cumsum(keep) - 1
+        sections = [
+            (i, positions[members[keep[members]]])
+            for i, members in enumerate(self.members) if keep[members].any()
+        ]
+        return SectionIndex(
+            [self.keys[i] for i, _ in sections],
+            [self.titles[i] for i, _ in sections],
+            self.vectors[[i for i, _ in sections]],
+            [members for _, members in sections],
+        )
+
+
+class HierarchicalRetriever:
+    """Search the chunks of the sections most similar to the query.
+    
+    The first stage ranks section summary vectors and the second stage scores
+    only the chunks of the best sections, so the cost of a query grows with the
+    number of sections rather than the number of chunks. Stores with few
+    sections are searched flat, as are stores without a section index.
+    """
+    
+    def __init__(
+        self,
+        vector_store: FAISS,
+        sections: Optional[SectionIndex],
+        top_sections: Optional[int] = None,
+        min_sections: Optional[int] = None
+    ):
+        """Initialize the retriever.
+        
+        Args:
+            vector_store: Chunk-level vector store
+            sections: Section index of the store, or None to always search flat
+            top_sections: Sections searched per query, defaulting to ``settings.RETRIEVAL_TOP_SECTIONS``
+            min_sections: Fewest sections worth a two-stage search, defaulting to
+                ``settings.RETRIEVAL_MIN_SECTIONS``
+        """
+        self.vector_store = vector_store
+        self.sections = sections
+        self.top_sections = top_sections or settings.RETRIEVAL_TOP_SECTIONS
+        self.min_sections = min_sections or settings.RETRIEVAL_MIN_SECTIONS
+        self._candidate_fraction = metrics.histogram(
+            "retrieval_candidate_fraction", CANDIDATE_FRACTION_BUCKETS,
+            "Fraction of chunks scored by two-stage searches"
+        )
+    
+    async def asimilarity_search(self, query: str, k: int = 4) -> List[Document]:
+        """Return the chunks most similar to a query.
+        
+        Args:
+            query: Query text
+            k: Number of chunks to return
+            
+        Returns:
+            Chunks ordered by similarity
+        """
+        if self.sections is None or len(self.sections) < self.min_sections:
+            return await self.vector_store.asimilarity_search(query, k=k)
+        embedding = await self.vector_store.embeddings.aembed_query(query)
+        return self.search_by_vector(np.asarray(embedding, dtype=np.float32), k)
+    
+    def search_by_vector(self, embedding: np.ndarray, k: int = 4) -> List[Document]:
+        """Run the two-stage search for a query embedding.
+        
+        At least ``top_sections`` sections are searched, and more if they hold
+        fewer than ``k`` chunks.
+        
+        Args:
+            embedding: Query embedding
+            k: Number of chunks to return
+            
+        Returns:
+            Chunks ordered by similarity
+        """
+        query = embedding / max(float(np.linalg.norm(embedding)), 1e-12)
+        ranked = np.argsort(-(self.sections.vectors @ query), kind="stable")
+        selected, count = [], 0
+        for section in ranked:
+            if len(selected) >= self.top_sections and count >= k:
+                break
+            selected.append(self.sections.members[section])
+            count += len(self.sections.members[section])
+        rows = np.concatenate(selected)
+        
+        # The chunk index ranks by L2 distance; rank the candidates the same way
+        index = self.vector_store.index
+        distances = ((index.reconstruct_batch(rows) - embedding) ** 2).sum(axis=1)
+        best = rows[np.argsort(distances, kind="stable")[:k]]
+        self._candidate_fraction.observe(len(rows) / index.ntotal)
+        return [
+            self.vector_store.docstore.search(self.vector_store.index_to_docstore_id[int(row)])
+            for row in best
+        ]
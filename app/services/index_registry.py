@@ -0,0 +1,431 @@
+"""Per-document index shards, cached in memory and on disk and shared across requests."""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain.vectorstores import FAISS
+
+from app.core.config import settings
+from app.core.deadline import Deadline, DeadlineExceeded
+from app.core.metrics import metrics
+from app.core.storage import storage_manager
+from app.services.deduplication import find_duplicates, minhasher
+from app.services.document_processor import CHUNK_OVERLAP, CHUNK_SIZE, DocumentProcessor
+from app.services.hierarchical_retrieval import HierarchicalRetriever, SectionIndex
+from app.services.vector_store import VectorStoreService
+
+logger = logging.getLogger(__name__)
+
+# File in a shard's directory recording the version of the document it was built from
+VERSION_FILE = "version.json"
+
+
+@dataclass
+class IndexShard:
+    """The vector store of a single document, its section index and chunk signatures.
+    
+    ``version`` identifies the version of the document the shard was built
+    from, and ``checked_at`` is the ``time.monotonic()`` of the last check that
+    the document is still at that version, or None if it was never checked.
+    """
+    
+    key: str
+    url: Optional[str]
+    vector_store: FAISS
+    path: str
+    chunk_count: int
+    sections: Optional[SectionIndex] = None
+    signatures: Optional[np.ndarray] = None
+    version: Optional[str] = None
+    checked_at: Optional[float] = None
+
+
+def _summarize(vector_store: FAISS) -> Tuple[SectionIndex, Optional[np.ndarray]]:
+    """Build the section index of a shard and, with deduplication enabled, its chunk signatures."""
+    signatures = None
+    if settings.DEDUP_ENABLED:
+        ids = vector_store.index_to_docstore_id
+        signatures = minhasher.signatures([
+            vector_store.docstore.search(ids[row]).page_content for row in range(vector_store.index.ntotal)
+        ])
+    return SectionIndex.build(vector_store), signatures
+
+
+def merge_shards(shards: Sequence[IndexShard], vector_store_service: VectorStoreService) -> HierarchicalRetriever:
+    """Merge the shards of a document set into one retriever.
+    
+    Near-duplicate chunks of different documents, such as clauses shared by
+    policy variants, are collapsed into the first document's chunk, which
+    references the others.
+    
+    Args:
+        shards: Shards of the documents, in request order
+        vector_store_service: Service used to merge the vector stores
+        
+    Returns:
+        Retriever over the chunks of all shards
+    """
+    duplicates = {}
+    if len(shards) > 1 and all(shard.signatures is not None for shard in shards):
+        duplicates = find_duplicates([shard.signatures for shard in shards], settings.DEDUP_SIMILARITY_THRESHOLD)
+        metrics.counter(
+            "dedup_cross_document_chunks_total", "Chunks collapsed into a chunk of another document"
+        ).inc(len(duplicates))
+    
+    vector_store = vector_store_service.merge_vector_stores([shard.vector_store for shard in shards], duplicates)
+    sizes = [shard.vector_store.index.ntotal for shard in shards]
+    sections = SectionIndex.merge([shard.sections for shard in shards], sizes)
+    if sections is not None and duplicates:
+        sections = sections.without(list(duplicates), sum(sizes))
+    return HierarchicalRetriever(vector_store, sections)
+
+
+def embedding_provider_id() -> str:
+    """Return an identifier of the configured embeddings, so shards of different models never mix."""
+    if settings.EMBEDDING_PROVIDER == "hashing":
+        return f"hashing:{settings.EMBEDDING_HASHING_DIMENSION}"
+    elif settings.EMBEDDING_PROVIDER == "onnx":
+        return f"onnx:{settings.EMBEDDING_ONNX_MODEL_PATH}"
+    return settings.EMBEDDING_PROVIDER
+
+
+def chunking_id() -> str:
+    """Return an identifier of the settings that decide how documents are chunked."""
+    return (
+        f"chunks:{CHUNK_SIZE}:{CHUNK_OVERLAP}:structure={settings.DOCUMENT_STRUCTURE_ENABLED}:"
+        f"dedup={settings.DEDUP_ENABLED}:{settings.DEDUP_SIMILARITY_THRESHOLD}:{settings.DEDUP_BOILERPLATE_FRACTION}"
+    )
+
+
+def shard_key(url: str, provider_id: Optional[str] = None) -> str:
+    """Return the cache key of a document's shard.
+    
+    The key covers the embedding provider and the chunking settings, so that
+    shards built differently never mix.
+    
+    Args:
+        url: URL of the document
+        provider_id: Embedding provider identifier, defaulting to the configured one
+        
+    Returns:
+        Hex digest identifying the shard
+    """
+    provider_id = provider_id or embedding_provider_id()
+    return hashlib.sha256(f"{provider_id}\n{chunking_id()}\n{url}".encode()).hexdigest()
+
+
+def _read_version(path: str) -> Optional[str]:
+    """Return the document version recorded in a shard's directory, if any."""
+    try:
+        with open(os.path.join(path, VERSION_FILE)) as f:
+            return json.load(f).get("version")
+    except (OSError, ValueError):
+        return None
+
+
+def _write_version(path: str, url: str, version: str) -> None:
+    """Record the document version a shard was built from in its directory."""
+    temporary = os.path.join(path, f"{VERSION_FILE}.tmp")
+    with open(temporary, "w") as f:
+        json.dump({"url": url, "version": version}, f)
+    os.replace(temporary, os.path.join(path, VERSION_FILE))
+
+
+class IndexRegistry:
+    """Build, cache and look up per-document index shards.
+    
+    Shards are looked up in an in-memory LRU cache first, then on disk, and only
+    built when neither has them. Concurrent requests for the same missing shard
+    share a single build. Shards held in memory are retained by the storage
+    manager so that their directories are not evicted underneath them.
+    
+    A shard is served for at most ``settings.INDEX_SHARD_REVALIDATE_SECONDS``
+    before its document is checked again with a conditional request, and
+    rebuilt if the document was re-issued at the same URL.
+    """
+    
+    def __init__(self, max_cached_shards: int = 64):
+        """Initialize the index registry.
+        
+        Args:
+            max_cached_shards: Maximum number of shards kept in memory
+        """
+        self.max_cached_shards = max_cached_shards
+        self._shards: "OrderedDict[str, IndexShard]" = OrderedDict()
+        self._building: Dict[str, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._memory_hits = metrics.counter("index_shard_memory_hits_total", "Shards served from memory")
+        self._disk_loads = metrics.counter("index_shard_disk_loads_total", "Shards loaded from disk")
+        self._builds = metrics.counter("index_shard_builds_total", "Shards built from a downloaded document")
+        self._stale = metrics.counter("index_shard_stale_total", "Shards rebuilt because their document changed")
+    
+    async def get_shards(
+        self,
+        urls: Sequence[str],
+        document_processor: DocumentProcessor,
+        vector_store_service: VectorStoreService,
+        deadline: Optional[Deadline] = None,
+    ) -> List[IndexShard]:
+        """Return the shards of several documents, building missing ones concurrently.
+        
+        Documents whose shard is not ready by the deadline are left out, and the
+        deadline records the ``documents_skipped`` degradation.
+        
+        Args:
+            urls: URLs of the documents; duplicates are returned once
+            document_processor: Processor used to download and chunk new documents
+            vector_store_service: Service used to embed, save and load shards
+            deadline: Optional request deadline
+            
+        Returns:
+            One shard per distinct URL that was ready in time, in order
+            
+        Raises:
+            DeadlineExceeded: If no shard was ready in time
+        """
+        deadline = deadline or Deadline()
+        unique_urls = list(dict.fromkeys(urls))
+        results = await asyncio.gather(*(
+            self.get_shard(url, document_processor, vector_store_service, deadline) for url in unique_urls
+        ), return_exceptions=True)
+        
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(result, DeadlineExceeded):
+                raise result
+        shards = [result for result in results if isinstance(result, IndexShard)]
+        if not shards:
+            raise DeadlineExceeded("No document could be indexed before the deadline")
+        if len(shards) < len(unique_urls):
+            deadline.degrade("documents_skipped")
+        return shards
+    
+    async def get_shard(
+        self,
+        url: str,
+        document_processor: DocumentProcessor,
+        vector_store_service: VectorStoreService,
+        deadline: Optional[Deadline] = None,
+    ) -> IndexShard:
+        """Return the shard of a document, loading or building it if needed.
+        
+        Requests stop waiting at their own deadline, but the build carries on
+        (bounded by ``settings.INDEX_BUILD_TIMEOUT_SECONDS``) and caches the shard,
+        so a document that takes longer to index than one request may wait is
+        ready for the next request. Revalidations of cached shards are shared
+        the same way.
+        
+        Args:
+            url: URL of the document
+            document_processor: Processor used to download and chunk the document
+            vector_store_service: Service used to embed, save and load the shard
+            deadline: Optional request deadline
+            
+        Returns:
+            The document's shard
+            
+        Raises:
+            DeadlineExceeded: If the shard is not ready before the deadline
+        """
+        deadline = deadline or Deadline()
+        key = shard_key(url)
+        shard = self._shards.get(key)
+        if shard is not None and not self._needs_revalidation(shard):
+            self._shards.move_to_end(key)
+            storage_manager.touch(shard.path)
+            self._memory_hits.inc()
+            return shard
+        
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Tasks are bound to a loop; start afresh if a new one is running
+            self._loop = loop
+            self._building.clear()
+        
+        task = self._building.get(key)
+        if task is None:
+            task = loop.create_task(
+                self._load_or_build(
+                    key, url, document_processor, vector_store_service,
+                    Deadline(settings.INDEX_BUILD_TIMEOUT_SECONDS), shard
+                )
+            )
+            self._building[key] = task
+            task.add_done_callback(lambda done: self._build_done(key, done))
+        # Shielded so that one cancelled request does not abort a build others wait on
+        return await deadline.wait_for(asyncio.shield(task))
+    
+    def _build_done(self, key: str, task: asyncio.Task) -> None:
+        """Forget a finished build, consuming its error in case every waiter gave up."""
+        self._building.pop(key, None)
+        if not task.cancelled():
+            task.exception()
+    
+    @staticmethod
+    def _needs_revalidation(shard: IndexShard) -> bool:
+        """Return whether a cached shard's document is due to be checked for changes."""
+        return (
+            shard.checked_at is None
+            or time.monotonic() - shard.checked_at >= settings.INDEX_SHARD_REVALIDATE_SECONDS
+        )
+    
+    async def _load_or_build(
+        self,
+        key: str,
+        url: str,
+        document_processor: DocumentProcessor,
+        vector_store_service: VectorStoreService,
+        deadline: Deadline,
+        cached: Optional[IndexShard] = None,
+    ) -> IndexShard:
+        """Revalidate a cached shard or load one from disk, or build and save it.
+        
+        Args:
+            key: Shard key
+            url: URL of the document
+            document_processor: Processor used to download and chunk the document
+            vector_store_service: Service used to embed, save and load the shard
+            deadline: Deadline of the build
+            cached: Shard held in memory whose document is due to be checked
+            
+        Returns:
+            The document's shard
+        """
+        index_name = f"shard_{key}"
+        path = vector_store_service.index_path(index_name)
+        shard = cached
+        if shard is None:
+            vector_store = await vector_store_service.load_vector_store(path)
+            if vector_store is not None:
+                sections, signatures = await asyncio.to_thread(_summarize, vector_store)
+                shard = IndexShard(
+                    key, url, vector_store, path, vector_store.index.ntotal, sections, signatures,
+                    _read_version(path)
+                )
+                self._disk_loads.inc()
+        
+        if shard is not None:
+            shard.url = url
+            if await self._is_current(shard, document_processor, deadline):
+                if cached is not None:
+                    self._memory_hits.inc()
+                self._cache(shard)
+                return shard
+            self._stale.inc()
+        
+        documents, version = await document_processor.process_versioned_document(url, deadline=deadline)
+        vector_store = await vector_store_service.create_vector_store(documents, deadline=deadline)
+        path = await vector_store_service.save_vector_store(vector_store, index_name)
+        await asyncio.to_thread(_write_version, path, url, version)
+        sections, signatures = await asyncio.to_thread(_summarize, vector_store)
+        shard = IndexShard(
+            key, url, vector_store, path, len(documents), sections, signatures, version, time.monotonic()
+        )
+        self._builds.inc()
+        
+        self._cache(shard)
+        return shard
+    
+    async def _is_current(
+        self,
+        shard: IndexShard,
+        document_processor: DocumentProcessor,
+        deadline: Deadline
+    ) -> bool:
+        """Check whether a shard was built from the current version of its document.
+        
+        A shard whose document cannot be checked is kept and checked again
+        after the revalidation interval.
+        
+        Args:
+            shard: Shard with a known URL
+            document_processor: Processor used to request the document
+            deadline: Deadline of the check
+            
+        Returns:
+            False if the document changed or the shard's version is unknown
+        """
+        if shard.version is None:
+            return False
+        try:
+            version = await document_processor.document_version(shard.url, shard.version, deadline=deadline)
+        except Exception as e:
+            logger.warning("Could not revalidate the shard of %s: %s", shard.url, e)
+            version = shard.version
+        shard.checked_at = time.monotonic()
+        return version == shard.version
+    
+    async def preload(self, vector_store_service: VectorStoreService, limit: Optional[int] = None) -> int:
+        """Load the most recently saved shards from disk into memory.
+        
+        Called before worker processes are forked, so that the workers share the
+        loaded shards instead of each loading its own copy. Preloaded shards
+        do not know their URL and are revalidated on first use.
+        
+        The shards are not retained: a retain in the forking process would be
+        inherited by every worker and outlive their caches. Each worker calls
+        ``retain_cached`` instead.
+        
+        Args:
+            vector_store_service: Service used to load the shards
+            limit: Maximum number of shards to load, defaulting to the cache size
+            
+        Returns:
+            Number of shards loaded
+        """
+        limit = min(limit or self.max_cached_shards, self.max_cached_shards)
+        loaded = 0
+        for path in vector_store_service.list_vector_stores("shard_")[:limit]:
+            key = os.path.basename(path)[len("shard_"):]
+            if key in self._shards:
+                continue
+            vector_store = await vector_store_service.load_vector_store(path)
+            if vector_store is None:
+                continue
+            sections, signatures = await asyncio.to_thread(_summarize, vector_store)
+            self._cache(IndexShard(
+                key, None, vector_store, path, vector_store.index.ntotal, sections, signatures, _read_version(path)
+            ), retain=False)
+            self._disk_loads.inc()
+            loaded += 1
+        return loaded
+    
+    def _cache(self, shard: IndexShard, retain: bool = True) -> None:
+        """Add a shard to the in-memory cache, evicting the least recently used ones.
+        
+        Args:
+            shard: Shard to cache
+            retain: Whether to protect the shard's directory from eviction
+        """
+        self._shards[shard.key] = shard
+        self._shards.move_to_end(shard.key)
+        if retain:
+            storage_manager.retain(shard.path)
+        while len(self._shards) > self.max_cached_shards:
+            _, evicted = self._shards.popitem(last=False)
+            storage_manager.release(evicted.path)
+    
+    def retain_cached(self) -> None:
+        """Protect the directories of all cached shards from eviction while this process caches them.
+        
+        Called in each worker for the shards preloaded before it was forked.
+        """
+        for shard in self._shards.values():
+            storage_manager.retain(shard.path)
+    
+    def clear(self) -> None:
+        """Drop all shards from memory, leaving them on disk."""
+        for shard in self._shards.values():
+            storage_manager.release(shard.path)
+        self._shards.clear()
+
+
+# Create global index registry
+index_registry = IndexRegistry(settings.INDEX_SHARD_CACHE_SIZE)
@@ -0,0 +1,421 @@
+"""Client-side scheduling of LLM and embedding provider calls.
+
+Each provider gets a ``ProviderScheduler`` that enforces token-bucket limits on
+requests and tokens per minute, adapts its concurrency limit with AIMD (additive
+increase, multiplicative decrease on rate limiting or slow responses), retries
+transient failures with jittered exponential backoff and can hedge slow calls
+with a duplicate request.
+"""
+
+import asyncio
+import math
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Deque, Iterable, Optional, TypeVar
+
+import httpx
+import openai
+
+from app.core.config import settings
+from app.core.deadline import Deadline, DeadlineExceeded
+from app.core.metrics import LATENCY_MS_BUCKETS, metrics
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+OVERLOAD_STATUS_CODES = {429, 503}
+
+
+class ProviderUnavailableError(Exception):
+    """Raised when a provider call still fails after all retries."""
+    
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_tokens(texts: Iterable[str]) -> int:
+    """Roughly estimate the number of tokens in some texts (about 4 characters per token).
+    
+    Args:
+        texts: Texts to estimate
+        
+    Returns:
+        Estimated token count
+    """
+    return sum(len(text) for text in texts) // 4 + 1
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    """Return the HTTP status code carried by a provider error, if any."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """Return the delay requested by a Retry-After header, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Return whether a failed provider call is worth retrying.
+    
+    Args:
+        error: Exception raised by the call
+        
+    Returns:
+        True for rate limiting, server errors, timeouts and connection failures
+    """
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    return isinstance(
+        error,
+        (openai.APIConnectionError, httpx.TransportError, asyncio.TimeoutError, ConnectionError),
+    )
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate."""
+    
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """Initialize the token bucket.
+        
+        Args:
+            per_minute: Refill rate per minute; 0 or less disables the limit
+            capacity: Maximum burst size, defaulting to one minute's worth
+        """
+        self.rate = per_minute / 60
+        self.capacity = capacity if capacity is not None else per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+        return self._lock
+    
+    async def acquire(self, amount: float = 1) -> None:
+        """Wait until ``amount`` tokens are available and take them.
+        
+        Requests larger than the capacity are clamped to it so they can still
+        proceed once the bucket is full. Waiters are served in arrival order.
+        
+        Args:
+            amount: Number of tokens to take
+        """
+        if self.rate <= 0:
+            return
+        amount = min(amount, self.capacity)
+        async with self._get_lock():
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+
+
+class AIMDLimiter:
+    """Concurrency limit adjusted by additive increase and multiplicative decrease.
+    
+    The limit grows by about one slot per limit's worth of fast successful calls
+    and is cut by ``decrease_factor`` whenever the provider signals overload or a
+    call is slower than the latency target. A burst of congestion signals from
+    calls that were in flight together only cuts the limit once per cooldown.
+    """
+    
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        latency_target_ms: float,
+        decrease_factor: float = 0.7,
+        decrease_cooldown_seconds: float = 1.0,
+    ):
+        """Initialize the limiter.
+        
+        Args:
+            initial: Initial concurrency limit
+            minimum: Lowest limit the limiter may decrease to
+            maximum: Highest limit the limiter may increase to
+            latency_target_ms: Latency above which a call counts as a congestion signal
+            decrease_factor: Factor the limit is multiplied by on congestion
+            decrease_cooldown_seconds: Minimum time between two decreases
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target_ms = latency_target_ms
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown_seconds = decrease_cooldown_seconds
+        self._last_decrease = float("-inf")
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.in_flight = 0
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def _get_condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._condition = asyncio.Condition()
+            self.in_flight = 0
+        return self._condition
+    
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one concurrency slot for the duration of the block."""
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < math.floor(self.limit))
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with condition:
+                self.in_flight -= 1
+                condition.notify_all()
+    
+    def on_success(self, latency_ms: float) -> None:
+        """Adjust the limit after a successful call.
+        
+        Args:
+            latency_ms: Latency of the call in milliseconds
+        """
+        if latency_ms > self.latency_target_ms:
+            self.on_overload()
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+    
+    def on_overload(self) -> None:
+        """Cut the limit after the provider signalled overload."""
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_cooldown_seconds:
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit * self.decrease_factor)
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies."""
+    
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+    
+    def __len__(self) -> int:
+        return len(self._samples)
+    
+    def add(self, latency_ms: float) -> None:
+        """Record a latency sample in milliseconds."""
+        self._samples.append(latency_ms)
+    
+    def percentile(self, q: float) -> float:
+        """Return the ``q`` quantile (0-1) of the window, or 0 if it is empty."""
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ProviderScheduler:
+    """Rate-limit, retry and hedge calls to one provider."""
+    
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        latency_target_ms: float = 30000,
+        max_retries: int = 3,
+        backoff_base_seconds: float = 0.5,
+        backoff_max_seconds: float = 20,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+    ):
+        """Initialize the provider scheduler.
+        
+        Args:
+            name: Provider name, used as the metric name prefix
+            requests_per_minute: Request rate limit (0 disables it)
+            tokens_per_minute: Token rate limit (0 disables it)
+            max_concurrency: Upper bound for the adaptive concurrency limit
+            min_concurrency: Lower bound for the adaptive concurrency limit
+            latency_target_ms: Latency above which the concurrency limit is decreased
+            max_retries: Retries after the first attempt for retryable failures
+            backoff_base_seconds: Base delay of the exponential backoff
+            backoff_max_seconds: Maximum backoff delay
+            hedge: Whether calls may be hedged by default
+            hedge_quantile: Latency quantile after which a hedged request is sent
+            hedge_min_samples: Latency samples needed before hedging starts
+        """
+        self.name = name
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.limiter = AIMDLimiter(max_concurrency, min_concurrency, max_concurrency, latency_target_ms)
+        self.latencies = LatencyTracker()
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        
+        self._latency = metrics.histogram(f"{name}_latency_ms", LATENCY_MS_BUCKETS, f"{name} call latency")
+        self._retries = metrics.counter(f"{name}_retries_total", f"{name} calls retried")
+        self._throttled = metrics.counter(f"{name}_throttled_total", f"{name} calls rejected as overloaded")
+        self._hedges = metrics.counter(f"{name}_hedges_total", f"{name} hedged duplicate requests sent")
+        self._failures = metrics.counter(f"{name}_failures_total", f"{name} calls failed after retries")
+        self._limit = metrics.gauge(f"{name}_concurrency_limit", f"{name} adaptive concurrency limit")
+        self._limit.set(self.limiter.limit)
+    
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        tokens: int = 0,
+        hedge: Optional[bool] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> T:
+        """Run a provider call under the scheduler's limits.
+        
+        Args:
+            fn: Function starting one attempt of the call; may be invoked several times
+            tokens: Estimated tokens consumed by one attempt
+            hedge: Whether to hedge this call, defaulting to the scheduler setting
+            deadline: Optional request deadline; waiting, attempts and retries all stop at it
+            
+        Returns:
+            Result of the first successful attempt
+            
+        Raises:
+            ProviderUnavailableError: If retryable failures persist after all retries
+            DeadlineExceeded: If the deadline passes first, or a retry would end after it
+        """
+        hedge = self.hedge if hedge is None else hedge
+        deadline = deadline or Deadline()
+        for attempt in range(self.max_retries + 1):
+            try:
+                deadline.check(f"calling {self.name}")
+                if hedge:
+                    return await deadline.wait_for(self._hedged_attempt(fn, tokens))
+                return await deadline.wait_for(self._attempt(fn, tokens))
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                retry_after = _retry_after(e)
+                if attempt == self.max_retries:
+                    self._failures.inc()
+                    raise ProviderUnavailableError(
+                        f"{self.name} unavailable after {attempt + 1} attempts: {str(e)}",
+                        retry_after=retry_after,
+                    ) from e
+                delay = self._backoff(attempt, retry_after)
+                if delay >= deadline.remaining():
+                    self._failures.inc()
+                    raise DeadlineExceeded(
+                        f"{self.name} failed and no time is left to retry: {str(e)}"
+                    ) from e
+                self._retries.inc()
+                await asyncio.sleep(delay)
+    
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Return the delay before the next retry, using full jitter."""
+        ceiling = min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt)
+        delay = random.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max_seconds))
+        return delay
+    
+    async def _attempt(self, fn: Callable[[], Awaitable[T]], tokens: int) -> T:
+        """Run one attempt once the rate limits and concurrency limit allow it."""
+        await self.request_bucket.acquire(1)
+        if tokens:
+            await self.token_bucket.acquire(tokens)
+        async with self.limiter.slot():
+            start = time.monotonic()
+            try:
+                result = await fn()
+            except Exception as e:
+                if _status_code(e) in OVERLOAD_STATUS_CODES:
+                    self._throttled.inc()
+                    self.limiter.on_overload()
+                    self._limit.set(self.limiter.limit)
+                raise
+            latency_ms = (time.monotonic() - start) * 1000
+        self.latencies.add(latency_ms)
+        self._latency.observe(latency_ms)
+        self.limiter.on_success(latency_ms)
+        self._limit.set(self.limiter.limit)
+        return result
+    
+    async def _hedged_attempt(self, fn: Callable[[], Awaitable[T]], tokens: int) -> T:
+        """Run one attempt, sending a duplicate if it is slower than the hedge quantile.
+        
+        The first attempt to succeed wins and the other is cancelled, as are both
+        if the caller is cancelled. Hedging only starts once enough latency
+        samples have been collected.
+        """
+        if len(self.latencies) < self.hedge_min_samples:
+            return await self._attempt(fn, tokens)
+        
+        delay = self.latencies.percentile(self.hedge_quantile) / 1000
+        pending = {asyncio.ensure_future(self._attempt(fn, tokens))}
+        error: Optional[BaseException] = None
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return done.pop().result()
+            
+            self._hedges.inc()
+            pending.add(asyncio.ensure_future(self._attempt(fn, tokens)))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Also reached when the caller is cancelled, which must not leave attempts running
+            for task in pending:
+                task.cancel()
+
+
+def _scheduler_from_settings(prefix: str, hedge: bool) -> ProviderScheduler:
+    """Create a provider scheduler from the ``{prefix}_*`` settings."""
+    return ProviderScheduler(
+        name=prefix.lower(),
+        requests_per_minute=getattr(settings, f"{prefix}_REQUESTS_PER_MINUTE"),
+        tokens_per_minute=getattr(settings, f"{prefix}_TOKENS_PER_MINUTE"),
+        max_concurrency=getattr(settings, f"{prefix}_MAX_CONCURRENCY"),
+        min_concurrency=getattr(settings, f"{prefix}_MIN_CONCURRENCY"),
+        latency_target_ms=getattr(settings, f"{prefix}_LATENCY_TARGET_MS"),
+        max_retries=getattr(settings, f"{prefix}_MAX_RETRIES"),
+        hedge=hedge,
+    )
+
+
+# Create global schedulers, shared by all requests in the process
+llm_scheduler = _scheduler_from_settings("LLM", hedge=settings.LLM_HEDGE_ENABLED)
+embedding_scheduler = _scheduler_from_settings("EMBEDDING", hedge=False)
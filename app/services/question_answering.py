@@ -1,79 +1,295 @@
 """Question answering service using LangChain and LLMs."""
 
-from typing import List, Dict, Any
+import asyncio
+import re
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Union
 
-from langchain.chains import RetrievalQA
+from langchain.chains.question_answering import load_qa_chain
 from langchain.chat_models import ChatOpenAI
+from langchain.schema import Document
 from langchain.vectorstores import FAISS
 
 from app.core.config import settings
+from app.core.deadline import Deadline, DeadlineExceeded
+from app.core.metrics import Counter, metrics
+from app.services.extractive_answering import ExtractiveAnswer, ExtractiveAnswerer, grounding_score
+from app.services.hierarchical_retrieval import HierarchicalRetriever
+from app.services.llm_scheduler import estimate_tokens, llm_scheduler
+
+# Rough prompt overhead of the "stuff" chain: instructions and the answer
+PROMPT_OVERHEAD_TOKENS = 500
+
+CONFIDENCE_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 1.0)
+
+PARTIAL_ANSWER_TEXT = "The answer could not be determined within the time limit."
+
+# What the model calls the retrieved passages when it says they do not answer
+CONTEXT = r"(?:the |this |these )(?:provided |given |above |policy )?(?:context|documents?|text|excerpts?|passages?)"
+
+# Answers in which the model says the context does not answer the question. Negative
+# answers such as "the policy does not provide coverage" are answers, not refusals.
+UNCERTAIN_ANSWER = re.compile(
+    r"\b(?:i (?:don't|do not|cannot|can't) (?:know|tell|say)"
+    r"|(?:cannot|can't|could not|couldn't) be (?:determined|found|answered) (?:from|in|based on)"
+    rf"|{CONTEXT} (?:does not|doesn't|do not|don't) (?:mention|specify|state|say|contain|provide|include|address)"
+    rf"|not (?:mentioned|specified|stated|provided|found|given) (?:in|by) {CONTEXT}"
+    r"|(?:there is|there's|contains?|provides?|has|have) no (?:relevant |specific )?(?:information|mention|details?))\b"
+    # A bare "... is not mentioned." closing the answer says nothing else about the question
+    r"|\b(?:is|are) not (?:mentioned|specified|stated)\s*(?:\.|$)",
+    re.IGNORECASE
+)
+
+
+def cascade_models() -> List[str]:
+    """Return the models of the answering cascade, cheapest first.
+    
+    Returns:
+        Model names from ``settings.LLM_CASCADE_MODELS``
+        
+    Raises:
+        ValueError: If no model is configured
+    """
+    models = [model.strip() for model in settings.LLM_CASCADE_MODELS.split(",") if model.strip()]
+    if not models:
+        raise ValueError("LLM_CASCADE_MODELS must name at least one model")
+    return models
+
+
+def answer_confidence(answer: str, contexts: List[str]) -> float:
+    """Score how well an LLM answer is supported by the retrieved context.
+    
+    The answer is scored against the single passage supporting it best, which
+    must state the answer's numbers and negation.
+    
+    Args:
+        answer: Generated answer
+        contexts: Retrieved context passages
+        
+    Returns:
+        The answer's grounding score, or 0 if the model said it could not answer
+    """
+    if UNCERTAIN_ANSWER.search(answer):
+        return 0.0
+    return grounding_score(answer, contexts)
+
+
+@dataclass
+class CascadeTier:
+    """One model of the answering cascade and its metrics."""
+    
+    level: int
+    model: str
+    chain: Any
+    calls: Counter
+    escalations: Counter
 
 
 class QuestionAnsweringService:
-    """Service for answering questions based on document context."""
+    """Service for answering questions based on document context.
+    
+    Each question is first answered extractively from the retrieved chunks. The
+    LLMs are only called when the extractive confidence is below
+    ``settings.EXTRACTIVE_CONFIDENCE_THRESHOLD``, starting with the cheapest
+    model of ``settings.LLM_CASCADE_MODELS``. An answer whose grounding in the
+    context is below ``settings.LLM_ESCALATION_THRESHOLD`` is escalated to the
+    next, stronger model.
+    """
     
     def __init__(self):
         """Initialize the question answering service."""
-        self.llm = ChatOpenAI(
-            model_name="gpt-4",
+        self.tiers = [self._create_tier(level, model) for level, model in enumerate(cascade_models())]
+        self.extractive_answerer = ExtractiveAnswerer()
+        self._extractive_answers = metrics.counter(
+            "qa_extractive_answers_total", "Questions answered extractively without an LLM call"
+        )
+        self._llm_answers = metrics.counter("qa_llm_answers_total", "Questions answered by the LLM")
+        self._partial_answers = metrics.counter(
+            "qa_partial_answers_total", "Questions answered partially because the deadline was near"
+        )
+        self._confidence = metrics.histogram(
+            "qa_confidence", CONFIDENCE_BUCKETS, "Confidence scores of returned answers"
+        )
+    
+    @staticmethod
+    def _create_tier(level: int, model_name: str) -> CascadeTier:
+        """Create the chat model client, chain and metrics of a cascade tier.
+        
+        Per-tier latency is recorded by the ``llm_tier<level>`` deadline stage.
+        """
+        llm = ChatOpenAI(
+            model_name=model_name,
             temperature=0,
-            openai_api_key=settings.OPENAI_API_KEY
+            openai_api_key=settings.OPENAI_API_KEY,
+            openai_api_base=settings.OPENAI_BASE_URL,
+            request_timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS,
+            # Retries are handled by the scheduler rather than the client
+            max_retries=0
+        )
+        return CascadeTier(
+            level=level,
+            model=model_name,
+            chain=load_qa_chain(llm, chain_type="stuff"),
+            calls=metrics.counter(f"qa_tier{level}_calls_total", f"Questions sent to {model_name}"),
+            escalations=metrics.counter(
+                f"qa_tier{level}_escalations_total", f"Answers of {model_name} escalated to a stronger model"
+            )
         )
     
     async def answer_question(
         self, 
-        vector_store: FAISS, 
-        question: str
+        vector_store: Union[FAISS, HierarchicalRetriever], 
+        question: str,
+        deadline: Optional[Deadline] = None
     ) -> Dict[str, Any]:
         """Answer a question based on the document context.
         
+        When the deadline is near, fewer chunks are retrieved and answers are
+        not escalated past the cheapest model. When there is no time left for
+        the LLM, the best extractive candidate (or a placeholder) is returned
+        marked as partial.
+        
         Args:
-            vector_store: FAISS vector store containing document embeddings
+            vector_store: Vector store or hierarchical retriever over the document chunks
             question: Question to answer
+            deadline: Optional request deadline
             
         Returns:
             Dictionary with answer and metadata
         """
-        # Create retrieval QA chain
-        qa_chain = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff",
-            retriever=vector_store.as_retriever(search_kwargs={"k": 4}),
-            return_source_documents=True
-        )
+        deadline = deadline or Deadline()
+        degraded = deadline.remaining() < settings.QA_DEGRADE_BELOW_SECONDS
+        
+        k = settings.QA_TOP_K
+        if degraded and settings.QA_DEGRADED_TOP_K < k:
+            k = settings.QA_DEGRADED_TOP_K
+            deadline.degrade("reduced_k")
+        
+        try:
+            with deadline.stage("retrieve"):
+                source_docs = await deadline.wait_for(vector_store.asimilarity_search(question, k=k))
+        except DeadlineExceeded:
+            return self._partial_result(question, None, [])
+        context = [doc.page_content for doc in source_docs]
+        
+        candidate = None
+        if settings.EXTRACTIVE_ANSWERS_ENABLED:
+            candidate = self.extractive_answerer.answer(question, context)
+        
+        if candidate is not None and candidate.confidence >= settings.EXTRACTIVE_CONFIDENCE_THRESHOLD:
+            self._extractive_answers.inc()
+            return self._result(question, candidate.text, candidate.confidence, source_docs, "extractive")
         
-        # Get answer
-        result = qa_chain({"query": question})
+        if deadline.remaining() < settings.QA_MIN_LLM_SECONDS:
+            return self._partial_result(question, candidate, source_docs)
         
-        # Extract source documents
-        source_docs = result.get("source_documents", [])
+        tokens = estimate_tokens([question] + context) + PROMPT_OVERHEAD_TOKENS
+        best = None
+        for tier in self.tiers:
+            if best is not None:
+                answered_by, _, confidence = best
+                if confidence >= settings.LLM_ESCALATION_THRESHOLD:
+                    break
+                if degraded or deadline.remaining() < settings.QA_MIN_LLM_SECONDS:
+                    deadline.degrade("no_escalation")
+                    break
+                answered_by.escalations.inc()
+            try:
+                answer = await self._ask(tier, question, source_docs, tokens, deadline)
+            except DeadlineExceeded:
+                break
+            best = (tier, answer, answer_confidence(answer, context))
         
-        # Format response
+        if best is None:
+            return self._partial_result(question, candidate, source_docs)
+        tier, answer, confidence = best
+        self._llm_answers.inc()
+        return self._result(question, answer, confidence, source_docs, "llm", model=tier.model)
+    
+    async def _ask(
+        self,
+        tier: CascadeTier,
+        question: str,
+        source_docs: List[Document],
+        tokens: int,
+        deadline: Deadline
+    ) -> str:
+        """Answer a question with one model of the cascade.
+        
+        Raises:
+            DeadlineExceeded: If the deadline passes before the model answers
+        """
+        tier.calls.inc()
+        with deadline.stage(f"llm_tier{tier.level}"):
+            # Rate-limited and retried by the shared LLM scheduler
+            result = await llm_scheduler.call(
+                lambda: tier.chain.ainvoke({"input_documents": source_docs, "question": question}),
+                tokens=tokens,
+                deadline=deadline
+            )
+        return result["output_text"]
+    
+    def _result(
+        self,
+        question: str,
+        answer: str,
+        confidence: float,
+        source_docs: List[Document],
+        method: str,
+        partial: bool = False,
+        model: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Format an answer and record its confidence."""
+        self._confidence.observe(confidence)
         return {
             "question": question,
-            "answer": result["result"],
-            "confidence": 0.9,  # Placeholder - could implement actual confidence scoring
+            "answer": answer,
+            "confidence": round(confidence, 4),
             "context": [doc.page_content for doc in source_docs],
-            "sources": [doc.metadata.get("source", "unknown") for doc in source_docs]
+            "sources": [doc.metadata.get("source", "unknown") for doc in source_docs],
+            # Sections and clauses the answer was drawn from, best match first
+            "clauses": list(dict.fromkeys(
+                doc.metadata["section_id"] for doc in source_docs if doc.metadata.get("section_id")
+            )),
+            "method": method,
+            "model": model,
+            "partial": partial
         }
     
+    def _partial_result(
+        self,
+        question: str,
+        candidate: Optional[ExtractiveAnswer],
+        source_docs: List[Document]
+    ) -> Dict[str, Any]:
+        """Format the best answer available when the deadline leaves no time for the LLM."""
+        self._partial_answers.inc()
+        if candidate is None:
+            return self._result(question, PARTIAL_ANSWER_TEXT, 0.0, source_docs, "none", partial=True)
+        return self._result(
+            question, candidate.text, candidate.confidence, source_docs, "extractive", partial=True
+        )
+    
     async def batch_answer_questions(
         self, 
-        vector_store: FAISS, 
-        questions: List[str]
+        vector_store: Union[FAISS, HierarchicalRetriever], 
+        questions: List[str],
+        deadline: Optional[Deadline] = None
     ) -> List[Dict[str, Any]]:
         """Answer multiple questions based on the document context.
         
+        Questions are answered concurrently so that they share the deadline
+        rather than queueing behind each other; the LLM scheduler bounds how many
+        provider calls actually run at once.
+        
         Args:
-            vector_store: FAISS vector store containing document embeddings
+            vector_store: Vector store or hierarchical retriever over the document chunks
             questions: List of questions to answer
+            deadline: Optional request deadline
             
         Returns:
-            List of dictionaries with answers and metadata
+            List of dictionaries with answers and metadata, in question order
         """
-        results = []
-        for question in questions:
-            answer = await self.answer_question(vector_store, question)
-            results.append(answer)
-        
-        return results
+        return list(await asyncio.gather(*(
+            self.answer_question(vector_store, question, deadline) for question in questions
+        )))
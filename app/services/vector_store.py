@@ -1,13 +1,32 @@
 """Vector store service for document embeddings and retrieval."""
 
+import asyncio
 import os
+import pickle
+import shutil
+import uuid
 from typing import List, Dict, Any, Optional
 
+import faiss
+import numpy as np
+from langchain.docstore.in_memory import InMemoryDocstore
 from langchain.vectorstores import FAISS
-from langchain.embeddings import OpenAIEmbeddings
 from langchain.schema import Document
 
 from app.core.config import settings
+from app.core.deadline import Deadline
+from app.core.storage import storage_manager
+from app.services.deduplication import with_duplicates
+from app.services.embedding_providers import LocalEmbeddings, get_embeddings
+
+
+def _owned_copy(index: faiss.Index) -> faiss.Index:
+    """Copy an index into memory it owns.
+    
+    ``faiss.clone_index`` keeps viewing the file of a memory-mapped index, and
+    FAISS aborts the process when a viewed index is resized by a merge.
+    """
+    return faiss.deserialize_index(faiss.serialize_index(index))
 
 
 class VectorStoreService:
@@ -15,19 +34,28 @@ class VectorStoreService:
     
     def __init__(self):
         """Initialize the vector store service."""
-        self.embeddings = OpenAIEmbeddings(
-            openai_api_key=settings.OPENAI_API_KEY
-        )
+        self.embeddings = get_embeddings()
     
-    async def create_vector_store(self, documents: List[Dict[str, Any]]) -> FAISS:
+    async def create_vector_store(
+        self,
+        documents: List[Dict[str, Any]],
+        deadline: Optional[Deadline] = None
+    ) -> FAISS:
         """Create a vector store from document chunks.
         
         Args:
             documents: List of document chunks with text and metadata
+            deadline: Optional request deadline bounding the embedding calls
             
         Returns:
             FAISS vector store
+            
+        Raises:
+            DeadlineExceeded: If the deadline passes before the chunks are embedded
         """
+        deadline = deadline or Deadline()
+        deadline.check("embedding the document")
+        
         # Convert dictionaries back to Document objects
         docs = [
             Document(
@@ -37,10 +65,35 @@ class VectorStoreService:
             for doc in documents
         ]
         
+        # Local providers return float32 arrays that go straight into the index
+        if isinstance(self.embeddings, LocalEmbeddings):
+            vectors = await deadline.wait_for(self.embeddings.aembed_array([doc.page_content for doc in docs]))
+            return self._build_faiss(docs, vectors)
+        
         # Create vector store
-        vector_store = FAISS.from_documents(docs, self.embeddings)
+        vector_store = await deadline.wait_for(FAISS.afrom_documents(docs, self.embeddings))
         return vector_store
     
+    def _build_faiss(self, docs: List[Document], vectors: np.ndarray) -> FAISS:
+        """Build a FAISS vector store from documents and their embeddings.
+        
+        Args:
+            docs: Documents to store
+            vectors: float32 array with one embedding per document
+            
+        Returns:
+            FAISS vector store
+        """
+        index = faiss.IndexFlatL2(vectors.shape[1])
+        index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+        ids = [str(uuid.uuid4()) for _ in docs]
+        return FAISS(
+            self.embeddings,
+            index,
+            InMemoryDocstore(dict(zip(ids, docs))),
+            dict(enumerate(ids)),
+        )
+    
     async def similarity_search(
         self, 
         vector_store: FAISS, 
@@ -57,11 +110,93 @@ class VectorStoreService:
         Returns:
             List of similar documents
         """
-        return vector_store.similarity_search(query, k=k)
+        return await vector_store.asimilarity_search(query, k=k)
+    
+    def merge_vector_stores(
+        self,
+        vector_stores: List[FAISS],
+        duplicates: Optional[Dict[int, int]] = None
+    ) -> FAISS:
+        """Merge vector stores into a single searchable view.
+        
+        The stores are left unchanged, since their indices are copied into a new one.
+        A single store without duplicates is returned as is.
+        
+        Args:
+            vector_stores: Vector stores to merge, all built with the same embeddings
+            duplicates: Optional map from rows of the merged store to the rows
+                representing them; duplicate rows are left out and referenced
+                from their representatives
+            
+        Returns:
+            FAISS vector store containing the documents of every store
+        """
+        if not vector_stores:
+            raise ValueError("At least one vector store is required")
+        if len(vector_stores) == 1 and not duplicates:
+            return vector_stores[0]
+        
+        first = vector_stores[0]
+        merged = FAISS(
+            self.embeddings,
+            _owned_copy(first.index),
+            InMemoryDocstore({
+                doc_id: first.docstore.search(doc_id) for doc_id in first.index_to_docstore_id.values()
+            }),
+            dict(first.index_to_docstore_id),
+        )
+        for vector_store in vector_stores[1:]:
+            # FAISS moves vectors out of the source index on merge, so merge from a copy
+            merged.merge_from(FAISS(
+                self.embeddings,
+                _owned_copy(vector_store.index),
+                vector_store.docstore,
+                vector_store.index_to_docstore_id,
+            ))
+        if duplicates:
+            self._collapse_duplicates(merged, duplicates)
+        return merged
+    
+    @staticmethod
+    def _collapse_duplicates(vector_store: FAISS, duplicates: Dict[int, int]) -> None:
+        """Remove duplicate rows from a vector store, referencing them from their representatives.
+        
+        Args:
+            vector_store: Vector store owning its index
+            duplicates: Map from duplicate row to representative row
+        """
+        ids = vector_store.index_to_docstore_id
+        groups: Dict[int, List[int]] = {}
+        for row, representative in duplicates.items():
+            groups.setdefault(representative, []).append(row)
+        
+        # Documents may be shared with the merged stores, so they are replaced rather than modified
+        for representative, rows in groups.items():
+            document = with_duplicates(
+                vector_store.docstore.search(ids[representative]),
+                [vector_store.docstore.search(ids[row]) for row in rows]
+            )
+            vector_store.docstore.delete([ids[representative]])
+            vector_store.docstore.add({ids[representative]: document})
+        vector_store.delete([ids[row] for row in duplicates])
+    
+    def index_path(self, index_name: str) -> str:
+        """Return the directory a vector store with the given name is saved in.
+        
+        Args:
+            index_name: Name of the index
+            
+        Returns:
+            Path of the index directory
+        """
+        return os.path.join(settings.DOCUMENT_STORAGE_PATH, "vector_stores", index_name)
     
     async def save_vector_store(self, vector_store: FAISS, index_name: str) -> str:
         """Save the vector store to disk.
         
+        The store is written to a temporary directory that then replaces any
+        previous version, whose files stay readable by stores that still map them.
+        
         Args:
             vector_store: FAISS vector store
             index_name: Name for the index
@@ -70,15 +205,28 @@ class VectorStoreService:
             Path where the vector store was saved
         """
         # Create directory if it doesn't exist
-        save_path = os.path.join(settings.DOCUMENT_STORAGE_PATH, "vector_stores")
-        os.makedirs(save_path, exist_ok=True)
+        index_path = self.index_path(index_name)
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
         
         # Save vector store
-        index_path = os.path.join(save_path, index_name)
-        vector_store.save_local(index_path)
+        await asyncio.to_thread(self._write_vector_store, vector_store, index_path)
+        storage_manager.register(index_path)
         
         return index_path
     
+    def _write_vector_store(self, vector_store: FAISS, index_path: str) -> None:
+        """Write a vector store with ``save_local``, replacing the directory as a whole."""
+        suffix = uuid.uuid4().hex
+        temporary = f"{index_path}.tmp-{suffix}"
+        vector_store.save_local(temporary)
+        if os.path.isdir(index_path):
+            previous = f"{index_path}.old-{suffix}"
+            os.replace(index_path, previous)
+            os.replace(temporary, index_path)
+            shutil.rmtree(previous, ignore_errors=True)
+        else:
+            os.replace(temporary, index_path)
+    
     async def load_vector_store(self, index_path: str) -> Optional[FAISS]:
         """Load a vector store from disk.
         
@@ -91,4 +239,50 @@ class VectorStoreService:
         if not os.path.exists(index_path):
             return None
         
-        return FAISS.load_local(index_path, self.embeddings)
+        storage_manager.touch(index_path)
+        return await asyncio.to_thread(self._read_vector_store, index_path)
+    
+    def _read_vector_store(self, index_path: str) -> FAISS:
+        """Read a vector store saved with ``save_local``.
+        
+        With ``settings.VECTOR_STORE_MMAP`` the index vectors are memory-mapped
+        read-only instead of copied onto the heap, so processes loading the same
+        index share its pages through the OS page cache.
+        
+        Args:
+            index_path: Path to the vector store
+            
+        Returns:
+            FAISS vector store
+        """
+        flags = 0
+        if settings.VECTOR_STORE_MMAP:
+            flags = getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY
+        index = faiss.read_index(os.path.join(index_path, "index.faiss"), flags)
+        
+        # Only indices saved by this service are loaded, so their pickled docstores are trusted
+        with open(os.path.join(index_path, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        
+        return FAISS(self.embeddings, index, docstore, index_to_docstore_id)
+    
+    def list_vector_stores(self, prefix: str = "") -> List[str]:
+        """List saved vector stores, most recently saved first.
+        
+        Args:
+            prefix: Only list indices whose name starts with this prefix
+            
+        Returns:
+            Paths of the saved vector stores
+        """
+        save_path = os.path.dirname(self.index_path(prefix or "index"))
+        if not os.path.isdir(save_path):
+            return []
+        
+        entries = [
+            entry for entry in os.scandir(save_path)
+            if entry.is_dir() and entry.name.startswith(prefix)
+            and ".tmp-" not in entry.name and ".old-" not in entry.name
+        ]
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        return [entry.path for entry in entries]
@@ -1,23 +1,46 @@
 """Utility for handling various document types (PDF, DOCX, email)."""
 
+import hashlib
 import os
+import shutil
+import tempfile
 import uuid
-from typing import Optional, Tuple
+from typing import IO, Optional, Tuple
 
 import requests
 from fastapi import HTTPException
+from pypdf import PdfReader
+
+from app.core.config import settings
+from app.core.storage import storage_manager
+from app.utils.document_handlers.docx_extractor import extract_docx_text
+from app.utils.document_handlers.email_extractor import extract_email_text
+from app.utils.document_handlers.ranged_download import (
+    CHUNK_SIZE,
+    RangedDownload,
+    RangedDownloadUnavailable,
+    RemoteDocument,
+    check_size,
+    stream_response,
+)
+
+# Subdirectory of the storage directory keeping interrupted ranged downloads for resumption
+PARTIAL_DOWNLOADS_DIR = "partial_downloads"
+
+# Prefix of document versions computed from the content rather than announced by the server
+CONTENT_HASH_PREFIX = "sha256:"
 
 
 class DocumentHandler:
     """Class for handling document downloads and processing."""
-
-    def __init__(self, storage_dir: str = "storage/documents"):
+    
+    def __init__(self, storage_dir: Optional[str] = None):
         """Initialize the document handler.
         
         Args:
-            storage_dir: Directory to store downloaded documents
+            storage_dir: Directory to store downloaded documents, defaulting to DOCUMENT_STORAGE_PATH
         """
-        self.storage_dir = storage_dir
+        self.storage_dir = storage_dir or settings.DOCUMENT_STORAGE_PATH
         self._ensure_storage_dir_exists()
     
     def _ensure_storage_dir_exists(self) -> None:
@@ -25,53 +48,120 @@ class DocumentHandler:
         os.makedirs(self.storage_dir, exist_ok=True)
     
     def download_document(self, url: str, filename: Optional[str] = None, 
-                         doc_type: Optional[str] = None) -> Tuple[str, str]:
+                         doc_type: Optional[str] = None, timeout: float = 30) -> Tuple[str, str, str]:
         """Download a document from a URL and save it locally.
         
+        The version of the document is taken from the same response, as
+        ``document_version`` would return it, so that no separate request is needed.
+        
         Args:
             url: URL of the document to download
             filename: Optional filename to use for the downloaded document
             doc_type: Optional document type (pdf, docx, email)
+            timeout: Connect and read timeout in seconds
             
         Returns:
-            Tuple containing the local file path and the filename
+            Tuple containing the local file path, the filename and the document's version
             
         Raises:
-            HTTPException: If the download fails or the content type is not supported
+            HTTPException: If the download fails, is too large or corrupted, or the
+                content type is not supported
         """
         try:
-            response = requests.get(url, stream=True, timeout=30)
-            response.raise_for_status()
-            
-            # Determine document type from content-type or URL if not specified
-            content_type = response.headers.get('Content-Type', '')
-            if not doc_type:
-                if 'application/pdf' in content_type or url.lower().endswith('.pdf'):
-                    doc_type = 'pdf'
-                elif 'application/vnd.openxmlformats-officedocument.wordprocessingml.document' in content_type or url.lower().endswith('.docx'):
-                    doc_type = 'docx'
-                elif 'message/rfc822' in content_type or url.lower().endswith('.eml'):
-                    doc_type = 'email'
+            response, remote, ranged_path = self._fetch(url, timeout)
+            
+            try:
+                doc_type = self._resolve_doc_type(url, response.headers.get('Content-Type', ''), doc_type)
+                filename = self._resolve_filename(filename, doc_type)
+                file_path = os.path.join(self.storage_dir, filename)
+                
+                # Save the document file
+                content_hash = None if remote.version else hashlib.sha256()
+                if ranged_path is not None:
+                    if content_hash is not None:
+                        with open(ranged_path, 'rb') as f:
+                            _hash_file(f, content_hash)
+                    os.replace(ranged_path, file_path)
+                    shutil.rmtree(os.path.dirname(ranged_path), ignore_errors=True)
                 else:
-                    raise HTTPException(
-                        status_code=400, 
-                        detail=f"Unsupported document type. Content-Type: {content_type}"
-                    )
+                    try:
+                        with response, open(file_path, 'wb') as f:
+                            stream_response(response, f, remote, settings.DOCUMENT_MAX_BYTES, content_hash)
+                    except BaseException:
+                        # Nothing tracks a partial file, so it would never be evicted
+                        if os.path.exists(file_path):
+                            os.remove(file_path)
+                        raise
+            except BaseException:
+                self._abandon(response, ranged_path)
+                raise
             
-            # Generate a filename if not provided
-            if not filename:
-                filename = f"{uuid.uuid4()}.{doc_type}"
-            elif not filename.lower().endswith(f'.{doc_type}'):
-                filename = f"{filename}.{doc_type}"
+            storage_manager.register(file_path)
+            return file_path, filename, _version(remote, content_hash)
             
-            file_path = os.path.join(self.storage_dir, filename)
+        except requests.RequestException as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to download document: {str(e)}"
+            )
+    
+    def download_to_buffer(self, url: str, filename: Optional[str] = None,
+                           doc_type: Optional[str] = None,
+                           max_memory_size: int = 32 * 1024 * 1024,
+                           timeout: float = 30) -> Tuple[IO[bytes], str, str]:
+        """Download a document from a URL into a spooled in-memory buffer.
+        
+        The buffer is held in memory and only spills to a temporary file on disk
+        once it grows beyond ``max_memory_size`` bytes. Nothing is written to the
+        storage directory; use ``persist_buffer`` to keep the raw file. The
+        version of the document is taken from the same response.
+        
+        Args:
+            url: URL of the document to download
+            filename: Optional filename to use for the downloaded document
+            doc_type: Optional document type (pdf, docx, email)
+            max_memory_size: Size in bytes above which the buffer spills to disk
+            timeout: Connect and read timeout in seconds
             
-            # Save the document file
-            with open(file_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+        Returns:
+            Tuple containing the buffer, positioned at the start, the filename and
+            the document's version
+            
+        Raises:
+            HTTPException: If the download fails, is too large or corrupted, or the
+                content type is not supported
+        """
+        try:
+            response, remote, ranged_path = self._fetch(url, timeout)
             
-            return file_path, filename
+            try:
+                doc_type = self._resolve_doc_type(url, response.headers.get('Content-Type', ''), doc_type)
+                filename = self._resolve_filename(filename, doc_type)
+                
+                content_hash = None if remote.version else hashlib.sha256()
+                
+                # A document downloaded in ranges is already on disk; read it from there
+                if ranged_path is not None:
+                    buffer = open(ranged_path, 'rb')
+                    shutil.rmtree(os.path.dirname(ranged_path), ignore_errors=True)
+                    if content_hash is not None:
+                        _hash_file(buffer, content_hash)
+                        buffer.seek(0)
+                    return buffer, filename, _version(remote, content_hash)
+            except BaseException:
+                self._abandon(response, ranged_path)
+                raise
+            
+            buffer = tempfile.SpooledTemporaryFile(max_size=max_memory_size)
+            try:
+                with response:
+                    stream_response(response, buffer, remote, settings.DOCUMENT_MAX_BYTES, content_hash)
+                buffer.seek(0)
+            except BaseException:
+                buffer.close()
+                raise
+            
+            return buffer, filename, _version(remote, content_hash)
             
         except requests.RequestException as e:
             raise HTTPException(
@@ -79,6 +169,206 @@ class DocumentHandler:
                 detail=f"Failed to download document: {str(e)}"
             )
     
+    def document_version(self, url: str, known_version: Optional[str] = None, timeout: float = 30) -> str:
+        """Return an identifier of the current version of a document.
+        
+        The identifier is the document's ``ETag`` or ``Last-Modified`` header,
+        which a conditional request revalidates without transferring the body.
+        Documents served without either are identified by a hash of their content.
+        
+        Args:
+            url: URL of the document
+            known_version: Version returned by an earlier call, to revalidate
+            timeout: Connect and read timeout in seconds
+            
+        Returns:
+            The document's version, equal to ``known_version`` if it is unchanged
+            
+        Raises:
+            HTTPException: If the request fails or the document is too large to hash
+        """
+        headers = {}
+        if known_version and not known_version.startswith(CONTENT_HASH_PREFIX):
+            conditional = "If-None-Match" if known_version.startswith(('"', 'W/"')) else "If-Modified-Since"
+            headers[conditional] = known_version
+        
+        try:
+            with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 304:
+                    return known_version
+                response.raise_for_status()
+                version = RemoteDocument.from_response(url, response).version
+                if version:
+                    return version
+                
+                digest = hashlib.sha256()
+                size = 0
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    size += len(chunk)
+                    check_size(size, settings.DOCUMENT_MAX_BYTES)
+                    digest.update(chunk)
+                return f"{CONTENT_HASH_PREFIX}{digest.hexdigest()}"
+        
+        except requests.RequestException as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to check document version: {str(e)}"
+            )
+    
+    def _fetch(self, url: str, timeout: float) -> Tuple[requests.Response, RemoteDocument, Optional[str]]:
+        """Start downloading a document, and complete large ones in parallel byte ranges.
+        
+        The headers of the initial GET request tell whether the server accepts
+        ranges. Small documents, servers without range support and documents
+        being downloaded by another process are read as a single stream instead.
+        
+        Args:
+            url: URL of the document
+            timeout: Connect and read timeout in seconds
+            
+        Returns:
+            Tuple of the response, its description and the path of the document if
+            it was downloaded in ranges; otherwise the body is to be read from the response
+            
+        Raises:
+            HTTPException: If the document is too large or its ranges are corrupted
+            requests.RequestException: If the download fails
+        """
+        response, remote = self._open(url, timeout)
+        if not remote.accepts_ranges or (remote.size or 0) < settings.DOWNLOAD_RANGED_MIN_BYTES:
+            return response, remote, None
+        response.close()
+        
+        directory = os.path.join(self.storage_dir, PARTIAL_DOWNLOADS_DIR, hashlib.sha256(url.encode()).hexdigest())
+        download = RangedDownload(
+            remote,
+            directory,
+            segment_bytes=settings.DOWNLOAD_SEGMENT_BYTES,
+            max_connections=settings.DOWNLOAD_MAX_CONNECTIONS,
+            max_retries=settings.DOWNLOAD_MAX_RETRIES,
+        )
+        # Created before pinning, since only existing directories can be locked against other processes
+        os.makedirs(directory, exist_ok=True)
+        with storage_manager.pin(directory):
+            try:
+                return response, remote, download.run(timeout)
+            except RangedDownloadUnavailable:
+                pass
+            except BaseException:
+                # Keep the ranges received so far for the next attempt to resume from
+                if os.path.isdir(directory):
+                    storage_manager.register(directory)
+                raise
+        
+        response, remote = self._open(url, timeout)
+        return response, remote, None
+    
+    @staticmethod
+    def _abandon(response: requests.Response, ranged_path: Optional[str]) -> None:
+        """Release a download that will not be used.
+        
+        A completed ranged download has no state left to resume from and is
+        not tracked by the storage manager, so it is deleted.
+        
+        Args:
+            response: Response returned by ``_fetch``
+            ranged_path: Path of the document if it was downloaded in ranges
+        """
+        response.close()
+        if ranged_path is not None:
+            shutil.rmtree(os.path.dirname(ranged_path), ignore_errors=True)
+    
+    def _open(self, url: str, timeout: float) -> Tuple[requests.Response, RemoteDocument]:
+        """Send a streaming GET request for a document and check its announced size.
+        
+        Args:
+            url: URL of the document
+            timeout: Connect and read timeout in seconds
+            
+        Returns:
+            Tuple of the response and its description
+            
+        Raises:
+            HTTPException: If the document is too large
+            requests.RequestException: If the request fails
+        """
+        response = requests.get(url, stream=True, timeout=timeout)
+        response.raise_for_status()
+        remote = RemoteDocument.from_response(url, response)
+        try:
+            check_size(remote.size, settings.DOCUMENT_MAX_BYTES)
+        except HTTPException:
+            response.close()
+            raise
+        return response, remote
+    
+    def persist_buffer(self, buffer: IO[bytes], filename: str) -> str:
+        """Write a downloaded buffer to the storage directory and close it.
+        
+        Args:
+            buffer: Buffer returned by ``download_to_buffer``
+            filename: Filename to store the document under
+            
+        Returns:
+            Local path of the stored document
+        """
+        file_path = os.path.join(self.storage_dir, filename)
+        try:
+            buffer.seek(0)
+            with open(file_path, 'wb') as f:
+                shutil.copyfileobj(buffer, f, length=1024 * 1024)
+        finally:
+            buffer.close()
+        
+        storage_manager.register(file_path)
+        return file_path
+    
+    def _resolve_doc_type(self, url: str, content_type: str, doc_type: Optional[str]) -> str:
+        """Determine the document type from content-type or URL if not specified.
+        
+        Args:
+            url: URL of the document
+            content_type: Content-Type header of the response
+            doc_type: Explicitly requested document type, if any
+            
+        Returns:
+            Document type (pdf, docx, email)
+            
+        Raises:
+            HTTPException: If the document type cannot be determined
+        """
+        if doc_type:
+            return doc_type
+        
+        path = url.lower().split('?')[0]
+        if 'application/pdf' in content_type or path.endswith('.pdf'):
+            return 'pdf'
+        elif 'application/vnd.openxmlformats-officedocument.wordprocessingml.document' in content_type or path.endswith('.docx'):
+            return 'docx'
+        elif 'message/rfc822' in content_type or path.endswith('.eml'):
+            return 'email'
+        
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Unsupported document type. Content-Type: {content_type}"
+        )
+    
+    def _resolve_filename(self, filename: Optional[str], doc_type: str) -> str:
+        """Generate a filename if not provided and ensure it has the right extension.
+        
+        Args:
+            filename: Optional filename requested by the caller
+            doc_type: Document type (pdf, docx, email)
+            
+        Returns:
+            Filename to store the document under
+        """
+        if not filename:
+            return f"{uuid.uuid4()}.{doc_type}"
+        elif not filename.lower().endswith(f'.{doc_type}'):
+            return f"{filename}.{doc_type}"
+        return filename
+    
     def extract_text(self, file_path: str) -> str:
         """Extract text content from a document.
         
@@ -97,7 +387,7 @@ class DocumentHandler:
                 return self._extract_text_from_pdf(file_path)
             elif file_path.lower().endswith('.docx'):
                 return self._extract_text_from_docx(file_path)
-            elif file_path.lower().endswith('.eml'):
+            elif file_path.lower().endswith(('.eml', '.email')):
                 return self._extract_text_from_email(file_path)
             else:
                 raise HTTPException(
@@ -119,9 +409,8 @@ class DocumentHandler:
         Returns:
             Extracted text content
         """
-        # This is a placeholder - we'll implement the actual extraction later
-        # using PyPDF or a similar library
-        return f"PDF text extraction not yet implemented for {file_path}"
+        reader = PdfReader(file_path)
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
     
     def _extract_text_from_docx(self, file_path: str) -> str:
         """Extract text from a DOCX file.
@@ -132,9 +421,7 @@ class DocumentHandler:
         Returns:
             Extracted text content
         """
-        # This is a placeholder - we'll implement the actual extraction later
-        # using python-docx
-        return f"DOCX text extraction not yet implemented for {file_path}"
+        return extract_docx_text(file_path)
     
     def _extract_text_from_email(self, file_path: str) -> str:
         """Extract text from an email file.
@@ -145,6 +432,17 @@ class DocumentHandler:
         Returns:
             Extracted text content
         """
-        # This is a placeholder - we'll implement the actual extraction later
-        # using email or mailparser libraries
-        return f"Email text extraction not yet implemented for {file_path}"
+        return extract_email_text(file_path)
+
+
+def _hash_file(f: IO[bytes], content_hash: "hashlib._Hash") -> None:
+    """Update a hash object with the contents of a file, read in blocks."""
+    for block in iter(lambda: f.read(1024 * 1024), b""):
+        content_hash.update(block)
+
+
+def _version(remote: RemoteDocument, content_hash: Optional["hashlib._Hash"]) -> str:
+    """Return the version of a downloaded document, from its validator or its content."""
+    if remote.version:
+        return remote.version
+    return f"{CONTENT_HASH_PREFIX}{content_hash.hexdigest()}"
@@ -0,0 +1,99 @@
+"""Streaming text extractor for DOCX files."""
+
+import zipfile
+from typing import IO, List, Union
+from xml.etree import ElementTree
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+DOCUMENT_PART = "word/document.xml"
+
+
+def extract_docx_text(source: Union[str, IO[bytes]]) -> str:
+    """Extract text from a DOCX file, keeping paragraph and table structure.
+    
+    The main document part is parsed incrementally, so memory use stays flat
+    regardless of document size. Paragraphs are separated by newlines, and each
+    table row becomes one line with its cells separated by `` | ``. Tables are
+    set apart from surrounding paragraphs by blank lines.
+    
+    Args:
+        source: Path to the DOCX file or a binary file-like object
+        
+    Returns:
+        Extracted text content
+        
+    Raises:
+        ValueError: If the source is not a valid DOCX file
+    """
+    try:
+        archive = zipfile.ZipFile(source)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Not a valid DOCX file: {str(e)}")
+    
+    with archive:
+        try:
+            part = archive.open(DOCUMENT_PART)
+        except KeyError:
+            raise ValueError(f"DOCX file has no {DOCUMENT_PART} part")
+        with part:
+            return _extract_document_part(part)
+
+
+def _extract_document_part(part: IO[bytes]) -> str:
+    """Extract text from the main document part of a DOCX file.
+    
+    Args:
+        part: Binary file-like object for ``word/document.xml``
+        
+    Returns:
+        Extracted text content
+    """
+    blocks: List[str] = []
+    runs: List[str] = []
+    # One entry per open table: its rows, and for each row its cells
+    tables: List[List[List[str]]] = []
+    # One entry per open table cell: its paragraphs
+    cells: List[List[str]] = []
+    
+    for event, elem in ElementTree.iterparse(part, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if tag == W_NS + "tbl":
+                tables.append([])
+            elif tag == W_NS + "tr":
+                tables[-1].append([])
+            elif tag == W_NS + "tc":
+                cells.append([])
+            continue
+        
+        if tag == W_NS + "t":
+            if elem.text:
+                runs.append(elem.text)
+        elif tag == W_NS + "tab" and not elem.attrib:
+            # Tab stop definitions in paragraph properties carry attributes; run tabs do not
+            runs.append("\t")
+        elif tag in (W_NS + "br", W_NS + "cr"):
+            runs.append("\n")
+        elif tag == W_NS + "p":
+            paragraph = "".join(runs)
+            runs = []
+            if cells:
+                cells[-1].append(paragraph)
+            else:
+                blocks.append(paragraph)
+            elem.clear()
+        elif tag == W_NS + "tc":
+            cell = " ".join(p for p in cells.pop() if p)
+            tables[-1][-1].append(cell)
+            elem.clear()
+        elif tag == W_NS + "tbl":
+            rows = tables.pop()
+            table = "\n".join(" | ".join(row) for row in rows if any(row))
+            if cells:
+                cells[-1].append(table)
+            elif table:
+                blocks.append(f"\n{table}\n")
+            elem.clear()
+    
+    return "\n".join(blocks).strip()
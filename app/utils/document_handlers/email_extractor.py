@@ -0,0 +1,217 @@
+"""Text extractor for EML (RFC 822) email files based on the standard library."""
+
+import io
+from dataclasses import dataclass, field
+from email import policy
+from email.message import EmailMessage
+from email.parser import BytesParser
+from html.parser import HTMLParser
+from typing import IO, Iterator, List, Union
+
+from pypdf import PdfReader
+
+from app.utils.document_handlers.docx_extractor import extract_docx_text
+
+DOCX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+@dataclass
+class EmailAttachment:
+    """An attachment found in an email."""
+    
+    filename: str
+    content_type: str
+    size: int
+    text: str = ""
+
+
+@dataclass
+class ParsedEmail:
+    """Headers, body text and attachments of a parsed email."""
+    
+    subject: str
+    sender: str
+    recipients: str
+    date: str
+    body: str
+    attachments: List[EmailAttachment] = field(default_factory=list)
+    
+    def to_text(self) -> str:
+        """Render the email as plain text, including text extracted from attachments.
+        
+        Returns:
+            Text content of the email
+        """
+        lines = [
+            f"Subject: {self.subject}",
+            f"From: {self.sender}",
+            f"To: {self.recipients}",
+            f"Date: {self.date}",
+            "",
+            self.body,
+        ]
+        for attachment in self.attachments:
+            lines.append("")
+            lines.append(f"Attachment: {attachment.filename} ({attachment.content_type})")
+            if attachment.text:
+                lines.append(attachment.text)
+        return "\n".join(lines).strip()
+
+
+class _HTMLTextParser(HTMLParser):
+    """Collect the visible text of an HTML document."""
+    
+    BLOCK_TAGS = {"p", "div", "br", "tr", "li", "h1", "h2", "h3", "h4", "h5", "h6", "table"}
+    SKIP_TAGS = {"script", "style", "head"}
+    
+    def __init__(self):
+        super().__init__()
+        self.parts: List[str] = []
+        self._skip_depth = 0
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+    
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+    
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+    
+    def text(self) -> str:
+        lines = (" ".join(line.split()) for line in "".join(self.parts).splitlines())
+        return "\n".join(line for line in lines if line)
+
+
+def html_to_text(html: str) -> str:
+    """Convert an HTML document to plain text.
+    
+    Args:
+        html: HTML content
+        
+    Returns:
+        Visible text content
+    """
+    parser = _HTMLTextParser()
+    parser.feed(html)
+    parser.close()
+    return parser.text()
+
+
+def parse_email(source: Union[str, bytes, IO[bytes]]) -> ParsedEmail:
+    """Parse an EML file into headers, body text and attachments.
+    
+    The plain text body is preferred; HTML bodies are converted to text when no
+    plain text alternative exists. Text is extracted from text, DOCX, PDF and
+    attached email parts.
+    
+    Args:
+        source: Path to the EML file, its raw bytes, or a binary file-like object
+        
+    Returns:
+        Parsed email
+    """
+    parser = BytesParser(policy=policy.default)
+    if isinstance(source, bytes):
+        message = parser.parsebytes(source)
+    elif isinstance(source, str):
+        with open(source, "rb") as f:
+            message = parser.parse(f)
+    else:
+        message = parser.parse(source)
+    return _parse_message(message)
+
+
+def extract_email_text(source: Union[str, bytes, IO[bytes]]) -> str:
+    """Extract text from an EML file.
+    
+    Args:
+        source: Path to the EML file, its raw bytes, or a binary file-like object
+        
+    Returns:
+        Extracted text content
+    """
+    return parse_email(source).to_text()
+
+
+def _parse_message(message: EmailMessage) -> ParsedEmail:
+    """Split a parsed message into body text and attachments."""
+    plain_parts: List[str] = []
+    html_parts: List[str] = []
+    attachments: List[EmailAttachment] = []
+    
+    for part in _iter_leaf_parts(message):
+        content_type = part.get_content_type()
+        filename = part.get_filename()
+        if filename or part.is_attachment() or content_type == "message/rfc822":
+            attachments.append(_parse_attachment(part, filename, content_type))
+        elif content_type == "text/plain":
+            plain_parts.append(_get_text(part))
+        elif content_type == "text/html":
+            html_parts.append(html_to_text(_get_text(part)))
+    
+    body_parts = plain_parts or html_parts
+    return ParsedEmail(
+        subject=str(message.get("Subject", "")),
+        sender=str(message.get("From", "")),
+        recipients=str(message.get("To", "")),
+        date=str(message.get("Date", "")),
+        body="\n\n".join(part.strip() for part in body_parts if part.strip()),
+        attachments=attachments,
+    )
+
+
+def _iter_leaf_parts(message: EmailMessage) -> Iterator[EmailMessage]:
+    """Yield the non-multipart parts of a message without descending into attached emails."""
+    if not message.is_multipart():
+        yield message
+        return
+    for part in message.get_payload():
+        if part.get_content_type() == "message/rfc822":
+            yield part
+        else:
+            yield from _iter_leaf_parts(part)
+
+
+def _parse_attachment(part: EmailMessage, filename: str, content_type: str) -> EmailAttachment:
+    """Extract what text is available from an attachment part."""
+    if content_type == "message/rfc822":
+        nested = part.get_content()
+        text = _parse_message(nested).to_text() if isinstance(nested, EmailMessage) else ""
+        size = len(text)
+        return EmailAttachment(filename or "message.eml", content_type, size, text)
+    
+    payload = part.get_payload(decode=True) or b""
+    filename = filename or "attachment"
+    lower_name = filename.lower()
+    text = ""
+    try:
+        if content_type == "text/html" or lower_name.endswith((".html", ".htm")):
+            text = html_to_text(_get_text(part))
+        elif content_type.startswith("text/"):
+            text = _get_text(part)
+        elif content_type == DOCX_CONTENT_TYPE or lower_name.endswith(".docx"):
+            text = extract_docx_text(io.BytesIO(payload))
+        elif content_type == "application/pdf" or lower_name.endswith(".pdf"):
+            reader = PdfReader(io.BytesIO(payload))
+            text = "\n".join(page.extract_text() or "" for page in reader.pages)
+    except Exception:
+        # An unreadable attachment should not prevent the email itself from being indexed
+        text = ""
+    return EmailAttachment(filename, content_type, len(payload), text.strip())
+
+
+def _get_text(part: EmailMessage) -> str:
+    """Decode a text part, tolerating unknown or wrong charsets."""
+    try:
+        return part.get_content()
+    except (LookupError, UnicodeDecodeError):
+        payload = part.get_payload(decode=True) or b""
+        return payload.decode("utf-8", errors="replace")
@@ -0,0 +1,347 @@
+"""Page-sharded parallel PDF text extraction with a persistent per-page text cache."""
+
+import hashlib
+import io
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from pypdf import PdfReader
+from pypdf.generic import DictionaryObject
+
+
+class PageTextCache:
+    """SQLite-backed cache of extracted PDF page text.
+    
+    Pages are stored under ``(file hash, page number)`` so a previously seen
+    file is served without opening it. Each page also records a digest of its
+    content, so a re-issued file whose hash changed can still reuse the text of
+    the pages that did not.
+    """
+    
+    def __init__(self, path: str, max_entries: int = 200000):
+        """Initialize the page text cache.
+        
+        Args:
+            path: Path to the SQLite database file
+            max_entries: Maximum number of cached pages before the oldest are pruned
+        """
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS files (file_hash TEXT PRIMARY KEY, page_count INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "file_hash TEXT NOT NULL, page_number INTEGER NOT NULL, "
+                "digest TEXT NOT NULL, text TEXT NOT NULL, "
+                "PRIMARY KEY (file_hash, page_number))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS pages_digest ON pages (digest)")
+    
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+    
+    def get_file(self, file_hash: str) -> Optional[List[str]]:
+        """Return the text of every page of a cached file.
+        
+        Args:
+            file_hash: SHA-256 hex digest of the file
+            
+        Returns:
+            Page texts in order, or None if the file is not fully cached
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT page_count FROM files WHERE file_hash = ?", (file_hash,)).fetchone()
+            if row is None:
+                return None
+            rows = conn.execute(
+                "SELECT page_number, text FROM pages WHERE file_hash = ? ORDER BY page_number",
+                (file_hash,),
+            ).fetchall()
+        if len(rows) != row[0]:
+            return None
+        return [text for _, text in rows]
+    
+    def get_by_digest(self, digests: Iterable[str]) -> Dict[str, str]:
+        """Look up cached page text by page content digest.
+        
+        Args:
+            digests: Page content digests
+            
+        Returns:
+            Mapping of found digests to page text
+        """
+        wanted = list(set(digests))
+        found: Dict[str, str] = {}
+        with self._connect() as conn:
+            # Stay well below SQLite's bound parameter limit
+            for start in range(0, len(wanted), 500):
+                batch = wanted[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for digest, text in conn.execute(
+                    f"SELECT digest, text FROM pages WHERE digest IN ({placeholders})", batch
+                ):
+                    found[digest] = text
+        return found
+    
+    def put_file(self, file_hash: str, pages: Sequence[Tuple[str, str]]) -> None:
+        """Store the text of every page of a file.
+        
+        Args:
+            file_hash: SHA-256 hex digest of the file
+            pages: ``(digest, text)`` for each page, in page order
+        """
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO pages (file_hash, page_number, digest, text) VALUES (?, ?, ?, ?)",
+                [(file_hash, number, digest, text) for number, (digest, text) in enumerate(pages)],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO files (file_hash, page_count) VALUES (?, ?)",
+                (file_hash, len(pages)),
+            )
+            count = conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            if count > self.max_entries:
+                conn.execute(
+                    "DELETE FROM pages WHERE rowid IN (SELECT rowid FROM pages ORDER BY rowid LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+                conn.execute(
+                    "DELETE FROM files WHERE file_hash NOT IN (SELECT DISTINCT file_hash FROM pages)"
+                )
+
+
+def page_digest(page: DictionaryObject) -> str:
+    """Compute a digest identifying the text-relevant content of a page.
+    
+    The digest covers the decoded content streams and the resources they draw
+    with, which is what text extraction depends on, but not object numbers, so
+    an unchanged page keeps its digest when the surrounding file is re-issued.
+    
+    Args:
+        page: A pypdf page object
+        
+    Returns:
+        SHA-256 hex digest
+    """
+    digest = hashlib.sha256()
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+    _hash_resources(digest, page.get("/Resources"), set())
+    return digest.hexdigest()
+
+
+def _hash_resources(digest: "hashlib._Hash", resources: Any, seen: Set[int]) -> None:
+    """Add the fonts and XObjects of a resource dictionary to a page digest.
+    
+    Form XObjects draw text of their own, so their streams and resources are
+    hashed recursively. ``seen`` holds the ids of the XObjects already hashed,
+    which keeps self-referencing forms from recursing forever.
+    
+    Args:
+        digest: Digest to update
+        resources: Resource dictionary, possibly indirect, or None
+        seen: Ids of the XObjects hashed so far
+    """
+    resources = resources.get_object() if resources is not None else None
+    if not isinstance(resources, DictionaryObject):
+        return
+    
+    fonts = resources.get("/Font")
+    if fonts is not None:
+        for name, font in sorted(fonts.get_object().items()):
+            font = font.get_object()
+            encoding = font.get("/Encoding")
+            encoding = encoding.get_object() if encoding is not None else None
+            digest.update(f"font {name}:{font.get('/BaseFont')}:{encoding}".encode())
+            to_unicode = font.get("/ToUnicode")
+            if to_unicode is not None:
+                digest.update(to_unicode.get_object().get_data())
+    
+    xobjects = resources.get("/XObject")
+    if xobjects is not None:
+        for name, reference in sorted(xobjects.get_object().items()):
+            xobject = reference.get_object()
+            digest.update(f"xobject {name}:{xobject.get('/Subtype')}".encode())
+            if xobject.get("/Subtype") != "/Form" or id(xobject) in seen:
+                continue
+            seen.add(id(xobject))
+            digest.update(xobject.get_data())
+            _hash_resources(digest, xobject.get("/Resources"), seen)
+
+
+def _hash_file(f: IO[bytes]) -> str:
+    """Return the SHA-256 hex digest of the rest of a file, read in blocks."""
+    digest = hashlib.sha256()
+    for block in iter(lambda: f.read(1024 * 1024), b""):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def _extract_pages(data: Union[str, bytes], page_numbers: List[int]) -> List[Tuple[int, str]]:
+    """Extract the text of the given pages; runs in a worker process.
+    
+    Args:
+        data: Path to the PDF file or its raw bytes
+        page_numbers: Zero-based page numbers to extract
+        
+    Returns:
+        ``(page number, text)`` for each requested page
+    """
+    reader = PdfReader(io.BytesIO(data) if isinstance(data, bytes) else data)
+    return [(number, reader.pages[number].extract_text() or "") for number in page_numbers]
+
+
+class PDFExtractor:
+    """Extract PDF page text in parallel across worker processes.
+    
+    Pages that are not in the cache are split into contiguous ranges, extracted
+    in worker processes and reassembled in page order. Small jobs are extracted
+    inline, where process start-up and transfer costs would outweigh the gain.
+    """
+    
+    def __init__(
+        self,
+        cache: Optional[PageTextCache] = None,
+        max_workers: int = 4,
+        min_pages_per_worker: int = 16,
+    ):
+        """Initialize the PDF extractor.
+        
+        Args:
+            cache: Page text cache, or None to disable caching
+            max_workers: Maximum number of worker processes (1 extracts inline)
+            min_pages_per_worker: Minimum number of pages to hand to one worker
+        """
+        self.cache = cache
+        self.max_workers = max_workers
+        self.min_pages_per_worker = min_pages_per_worker
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+    
+    def extract_pages(self, source: Union[str, bytes, IO[bytes]]) -> List[str]:
+        """Extract the text of every page of a PDF.
+        
+        Paths and file objects are hashed and parsed from the file, so a large
+        document is never read into memory as a whole.
+        
+        Args:
+            source: Path to the PDF file, its raw bytes or a seekable file object containing it
+            
+        Returns:
+            Text of each page, in page order
+        """
+        if isinstance(source, bytes):
+            file_hash = hashlib.sha256(source).hexdigest()
+        elif isinstance(source, str):
+            with open(source, "rb") as f:
+                file_hash = _hash_file(f)
+        else:
+            source.seek(0)
+            file_hash = _hash_file(source)
+            source.seek(0)
+        
+        if self.cache is not None:
+            cached = self.cache.get_file(file_hash)
+            if cached is not None:
+                return cached
+        
+        reader = PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+        digests = [page_digest(page) for page in reader.pages]
+        known = self.cache.get_by_digest(digests) if self.cache is not None else {}
+        
+        texts: Dict[int, str] = {}
+        missing = []
+        for number, digest in enumerate(digests):
+            if digest in known:
+                texts[number] = known[digest]
+            else:
+                missing.append(number)
+        
+        if missing:
+            texts.update(self._extract_missing(reader, source, missing))
+        
+        pages = [texts[number] for number in range(len(digests))]
+        if self.cache is not None:
+            self.cache.put_file(file_hash, list(zip(digests, pages)))
+        return pages
+    
+    def _extract_missing(
+        self,
+        reader: PdfReader,
+        source: Union[str, bytes, IO[bytes]],
+        missing: List[int]
+    ) -> Dict[int, str]:
+        """Extract pages that were not found in the cache.
+        
+        Args:
+            reader: Reader already opened on the document, used for inline extraction
+            source: Path to the PDF file, its raw bytes or a file object containing it
+            missing: Zero-based page numbers to extract
+            
+        Returns:
+            Mapping of page number to text
+        """
+        workers = min(self.max_workers, len(missing) // max(self.min_pages_per_worker, 1))
+        if workers <= 1:
+            return {number: reader.pages[number].extract_text() or "" for number in missing}
+        
+        if isinstance(source, (str, bytes)):
+            return self._extract_in_workers(source, missing, workers)
+        
+        # Workers open the document themselves, so a file object is copied to a file they can name
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as copy:
+            source.seek(0)
+            shutil.copyfileobj(source, copy, length=1024 * 1024)
+            copy.flush()
+            return self._extract_in_workers(copy.name, missing, workers)
+    
+    def _extract_in_workers(self, source: Union[str, bytes], missing: List[int], workers: int) -> Dict[int, str]:
+        """Extract pages in contiguous shards across the worker pool.
+        
+        Args:
+            source: Path to the PDF file or its raw bytes
+            missing: Zero-based page numbers to extract
+            workers: Number of shards
+            
+        Returns:
+            Mapping of page number to text
+        """
+        # Contiguous shards keep each worker's page tree lookups local
+        shard_size = -(-len(missing) // workers)
+        shards = [missing[start:start + shard_size] for start in range(0, len(missing), shard_size)]
+        executor = self._get_executor()
+        texts: Dict[int, str] = {}
+        for result in executor.map(_extract_pages, [source] * len(shards), shards):
+            texts.update(result)
+        return texts
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Return the worker pool, creating it on first use."""
+        with self._executor_lock:
+            if self._executor is None:
+                # Spawned workers avoid inheriting the server's threads and locks
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+    
+    def shutdown(self) -> None:
+        """Shut down the worker pool, if it was started."""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -0,0 +1,383 @@
+"""Parallel byte-range downloads that resume after failures."""
+
+import base64
+import binascii
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import IO, List, Optional, Tuple
+
+import requests
+from fastapi import HTTPException
+
+CHUNK_SIZE = 65536
+
+CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+# Digest header algorithm names and their hashlib equivalents
+DIGEST_ALGORITHMS = {"sha-256": "sha256", "sha-512": "sha512", "md5": "md5"}
+
+
+class RangedDownloadUnavailable(Exception):
+    """Raised when a document has to be downloaded as a single stream instead."""
+
+
+@dataclass
+class RemoteDocument:
+    """What the response headers of a document tell about its body."""
+    
+    url: str
+    size: Optional[int]
+    accepts_ranges: bool
+    validator: Optional[str]
+    digest: Optional[Tuple[str, str]]
+    version: Optional[str] = None
+    
+    @classmethod
+    def from_response(cls, url: str, response: requests.Response) -> "RemoteDocument":
+        """Describe a document from the headers of a response for it.
+        
+        Sizes and digests of encoded (for example gzipped) bodies do not match
+        the decoded bytes, so they are ignored. The version is the ``ETag``, weak
+        or not, or else ``Last-Modified``, which conditional requests revalidate.
+        
+        Args:
+            url: URL of the document
+            response: Response to a GET request for the whole document
+            
+        Returns:
+            The document description
+        """
+        headers = response.headers
+        encoded = headers.get("Content-Encoding", "identity").lower() not in ("", "identity")
+        length = headers.get("Content-Length", "")
+        etag = headers.get("ETag")
+        # Weak ETags may not be used to combine ranges
+        validator = etag if etag and not etag.startswith("W/") else headers.get("Last-Modified")
+        return cls(
+            url=url,
+            size=int(length) if length.isdigit() and not encoded else None,
+            accepts_ranges=headers.get("Accept-Ranges", "").lower() == "bytes" and not encoded,
+            validator=validator,
+            digest=None if encoded else parse_digest(headers),
+            version=etag or headers.get("Last-Modified"),
+        )
+
+
+def parse_digest(headers) -> Optional[Tuple[str, str]]:
+    """Return the hashlib algorithm and hex digest announced for a response body.
+    
+    Supports ``Repr-Digest`` (RFC 9530), ``Digest`` (RFC 3230) and ``Content-MD5``.
+    
+    Args:
+        headers: Response headers
+        
+    Returns:
+        Tuple of (algorithm, hex digest), or None if no supported digest is given
+    """
+    fields = []
+    if headers.get("Repr-Digest"):
+        fields = [(name, value.strip(":")) for name, value in _digest_items(headers["Repr-Digest"])]
+    elif headers.get("Digest"):
+        fields = list(_digest_items(headers["Digest"]))
+    elif headers.get("Content-MD5"):
+        fields = [("md5", headers["Content-MD5"])]
+    
+    for name, value in fields:
+        algorithm = DIGEST_ALGORITHMS.get(name.lower())
+        if algorithm is None:
+            continue
+        try:
+            return algorithm, base64.b64decode(value, validate=True).hex()
+        except (binascii.Error, ValueError):
+            continue
+    return None
+
+
+def _digest_items(header: str):
+    """Split a digest header into (algorithm, value) pairs."""
+    for item in header.split(","):
+        name, _, value = item.strip().partition("=")
+        if value:
+            yield name, value
+
+
+def check_size(size: Optional[int], max_bytes: int) -> None:
+    """Reject documents larger than the size limit.
+    
+    Args:
+        size: Size of the document in bytes, if known
+        max_bytes: Largest accepted size
+        
+    Raises:
+        HTTPException: If the document is too large
+    """
+    if size is not None and size > max_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Document exceeds the size limit of {max_bytes} bytes"
+        )
+
+
+def _integrity_error(url: str, reason: str) -> HTTPException:
+    """Build the error raised for a download that does not match what the server announced."""
+    return HTTPException(status_code=502, detail=f"Download of {url} failed its integrity check: {reason}")
+
+
+def stream_response(
+    response: requests.Response,
+    out: IO[bytes],
+    remote: RemoteDocument,
+    max_bytes: int,
+    content_hash: Optional["hashlib._Hash"] = None
+) -> int:
+    """Copy a response body while enforcing the size limit and checking its integrity.
+    
+    The download is abandoned as soon as it grows past ``max_bytes``. Once it
+    completes, its length is checked against ``Content-Length`` and its hash
+    against any digest header.
+    
+    Args:
+        response: Streaming response for the whole document
+        out: File to write the body to
+        remote: Description of the document from the response headers
+        max_bytes: Largest accepted size
+        content_hash: Optional hash object to update with the body
+        
+    Returns:
+        Number of bytes written
+        
+    Raises:
+        HTTPException: If the body is too large, truncated or corrupted
+    """
+    hasher = hashlib.new(remote.digest[0]) if remote.digest else None
+    written = 0
+    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+        written += len(chunk)
+        check_size(written, max_bytes)
+        if hasher is not None:
+            hasher.update(chunk)
+        if content_hash is not None:
+            content_hash.update(chunk)
+        out.write(chunk)
+    
+    if remote.size is not None and written != remote.size:
+        raise _integrity_error(remote.url, f"received {written} of {remote.size} bytes")
+    if hasher is not None and hasher.hexdigest() != remote.digest[1]:
+        raise _integrity_error(remote.url, f"{remote.digest[0]} digest mismatch")
+    return written
+
+
+def _is_transient(error: requests.RequestException) -> bool:
+    """Whether a failed request may succeed when it is retried.
+    
+    Connection failures, timeouts and server errors are transient; client
+    errors such as 404, 410 or 416 are answered the same way every time.
+    """
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError))
+
+
+class RangedDownload:
+    """Download of one document in parallel byte ranges into a preallocated file.
+    
+    Progress is recorded in a state file next to the data, so that a download
+    that failed part way resumes from the bytes it already has, provided the
+    document is unchanged. Every range response must carry the requested
+    ``Content-Range`` and length, and ``If-Range`` makes the server send the
+    whole (changed) document instead of mixing versions.
+    """
+    
+    def __init__(
+        self,
+        remote: RemoteDocument,
+        directory: str,
+        segment_bytes: int,
+        max_connections: int,
+        max_retries: int
+    ):
+        """Initialize the download.
+        
+        Args:
+            remote: Document to download; its size must be known
+            directory: Directory holding the data and state of the download
+            segment_bytes: Size of the byte ranges
+            max_connections: Number of ranges fetched at once
+            max_retries: Retries of a range after a connection failure, timeout or server error,
+                each resuming where it stopped
+        """
+        self.remote = remote
+        self.directory = directory
+        self.data_path = os.path.join(directory, "data")
+        self.state_path = os.path.join(directory, "state.json")
+        self.lock_path = os.path.join(directory, "lock")
+        self.segment_bytes = segment_bytes
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        # [start, end, position] of each range, end exclusive; position is the next byte to fetch
+        self._segments: List[List[int]] = []
+    
+    def run(self, timeout: float) -> str:
+        """Download the missing ranges of the document.
+        
+        Args:
+            timeout: Connect and read timeout of each range request in seconds
+            
+        Returns:
+            Path of the complete document
+            
+        Raises:
+            RangedDownloadUnavailable: If the server answers a range request with the
+                whole document, or another process is downloading the same document
+            HTTPException: If a range does not match what the server announced
+            requests.RequestException: If a range fails with a client error, or still fails
+                after its retries
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.lock_path, "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise RangedDownloadUnavailable(f"{self.remote.url} is being downloaded by another process")
+            
+            try:
+                self._fetch_segments(timeout)
+            except RangedDownloadUnavailable:
+                # The server ignores ranges or the document changed, so the partial data is useless
+                self.discard()
+                raise
+            self._verify()
+            os.remove(self.state_path)
+        return self.data_path
+    
+    def discard(self) -> None:
+        """Delete the data and state of the download."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def _prepare(self) -> None:
+        """Resume from the saved state, or preallocate the file for a fresh download."""
+        state = None
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            pass
+        
+        if (
+            state is not None
+            and state.get("size") == self.remote.size
+            and state.get("validator") == self.remote.validator
+            and os.path.isfile(self.data_path)
+            and os.path.getsize(self.data_path) == self.remote.size
+        ):
+            self._segments = state["segments"]
+            return
+        
+        with open(self.data_path, "wb") as f:
+            if hasattr(os, "posix_fallocate") and self.remote.size:
+                os.posix_fallocate(f.fileno(), 0, self.remote.size)
+            else:
+                f.truncate(self.remote.size)
+        self._segments = [
+            [start, min(start + self.segment_bytes, self.remote.size), start]
+            for start in range(0, self.remote.size, self.segment_bytes)
+        ]
+        self._save_state()
+    
+    def _fetch_segments(self, timeout: float) -> None:
+        """Fetch the missing ranges in parallel, saving the progress made even on failure."""
+        self._prepare()
+        pending = [segment for segment in self._segments if segment[2] < segment[1]]
+        fd = os.open(self.data_path, os.O_WRONLY)
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_connections) as pool:
+                futures = [pool.submit(self._fetch_segment, fd, segment, timeout) for segment in pending]
+                try:
+                    for future in futures:
+                        future.result()
+                except BaseException:
+                    # Stop the other ranges where they are
+                    self._stop.set()
+                    raise
+        finally:
+            os.close(fd)
+            self._save_state()
+    
+    def _save_state(self) -> None:
+        """Record the progress of every range."""
+        with self._lock:
+            state = {"url": self.remote.url, "size": self.remote.size, "validator": self.remote.validator,
+                     "segments": self._segments}
+            temporary = f"{self.state_path}.tmp"
+            with open(temporary, "w") as f:
+                json.dump(state, f)
+            os.replace(temporary, self.state_path)
+    
+    def _fetch_segment(self, fd: int, segment: List[int], timeout: float) -> None:
+        """Fetch the rest of a range, retrying transient failures from the last byte received."""
+        failures = 0
+        while segment[2] < segment[1] and not self._stop.is_set():
+            try:
+                self._fetch_range(fd, segment, timeout)
+            except requests.RequestException as e:
+                failures += 1
+                if failures > self.max_retries or not _is_transient(e):
+                    raise
+        self._save_state()
+    
+    def _fetch_range(self, fd: int, segment: List[int], timeout: float) -> None:
+        """Request the missing bytes of a range and write them at their offset."""
+        start, end, position = segment
+        headers = {"Range": f"bytes={position}-{end - 1}"}
+        if self.remote.validator:
+            headers["If-Range"] = self.remote.validator
+        
+        with requests.get(self.remote.url, headers=headers, stream=True, timeout=timeout) as response:
+            if response.status_code == 200:
+                raise RangedDownloadUnavailable(f"{self.remote.url} was sent whole in answer to a range request")
+            response.raise_for_status()
+            match = CONTENT_RANGE.fullmatch(response.headers.get("Content-Range", ""))
+            if (
+                response.status_code != 206
+                or match is None
+                or (int(match.group(1)), int(match.group(2))) != (position, end - 1)
+                or match.group(3) not in ("*", str(self.remote.size))
+            ):
+                raise _integrity_error(
+                    self.remote.url, f"unexpected answer to range {position}-{end - 1}: "
+                    f"{response.status_code} {response.headers.get('Content-Range')}"
+                )
+            
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if self._stop.is_set():
+                    return
+                if segment[2] + len(chunk) > end:
+                    raise _integrity_error(self.remote.url, f"range {start}-{end - 1} is too long")
+                os.pwrite(fd, chunk, segment[2])
+                segment[2] += len(chunk)
+        
+        if segment[2] < end and not self._stop.is_set():
+            raise requests.ConnectionError(f"Range {position}-{end - 1} of {self.remote.url} ended early")
+    
+    def _verify(self) -> None:
+        """Check the complete document against the digest announced by the server."""
+        if self.remote.digest is None:
+            return
+        algorithm, expected = self.remote.digest
+        hasher = hashlib.new(algorithm)
+        with open(self.data_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        if hasher.hexdigest() != expected:
+            # Resuming would only reproduce the corrupt data
+            self.discard()
+            raise _integrity_error(self.remote.url, f"{algorithm} digest mismatch")
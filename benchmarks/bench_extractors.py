@@ -0,0 +1,85 @@
+"""Benchmark the native DOCX and email extractors against the LangChain loaders.
+
+Usage:
+    python -m benchmarks.bench_extractors [--repeat N]
+    
+The LangChain loaders need the optional ``docx2txt`` and ``unstructured``
+packages (and ``unstructured`` downloads NLP models on first use); loaders that
+cannot run are reported as skipped.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import warnings
+from typing import Callable, Optional
+
+from app.utils.document_handlers.docx_extractor import extract_docx_text
+from app.utils.document_handlers.email_extractor import extract_email_text
+from benchmarks.samples import make_email, make_policy_docx
+
+
+def _time(fn: Callable[[], object], repeat: int) -> Optional[float]:
+    """Return the median wall time of ``fn`` in milliseconds, or None if it cannot run."""
+    try:
+        fn()
+    except Exception as e:
+        # Typically a missing optional dependency or model download of the baseline loader
+        print(f"    skipped: {type(e).__name__}: {str(e).splitlines()[0]}")
+        return None
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def _report(name: str, native_ms: Optional[float], baseline_ms: Optional[float]) -> None:
+    """Print one benchmark result line."""
+    line = f"{name:<28} native {native_ms:9.2f} ms"
+    if baseline_ms is not None:
+        line += f"   langchain {baseline_ms:9.2f} ms   speedup {baseline_ms / native_ms:6.1f}x"
+    print(line)
+
+
+def _docx_loader(path: str) -> str:
+    from langchain.document_loaders import Docx2txtLoader
+    return Docx2txtLoader(path).load()[0].page_content
+
+
+def _email_loader(path: str) -> str:
+    from langchain.document_loaders import UnstructuredEmailLoader
+    return "\n".join(doc.page_content for doc in UnstructuredEmailLoader(path).load())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per case")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = []
+        for clauses in (50, 500, 5000):
+            path = os.path.join(tmp, f"policy_{clauses}.docx")
+            with open(path, "wb") as f:
+                f.write(make_policy_docx(clauses))
+            cases.append((f"docx {clauses} clauses", path, extract_docx_text, _docx_loader))
+        for paragraphs in (5, 200):
+            path = os.path.join(tmp, f"mail_{paragraphs}.eml")
+            with open(path, "wb") as f:
+                f.write(make_email(paragraphs, attachment=make_policy_docx(50)))
+            cases.append((f"eml {paragraphs} paragraphs", path, extract_email_text, _email_loader))
+        
+        for name, path, native, baseline in cases:
+            print(f"{name} ({os.path.getsize(path) // 1024} KiB)")
+            native_ms = _time(lambda: native(path), args.repeat)
+            baseline_ms = _time(lambda: baseline(path), args.repeat)
+            _report(name, native_ms, baseline_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Benchmark request throughput of the development server against serve.py.
+
+Usage:
+    python -m benchmarks.bench_serving [--workers N] [--concurrency C] [--duration S] [--endpoint hackrx|health]
+    
+Starts each server in turn on a local port: ``run.py``'s single reloading
+uvicorn process, then ``serve.py`` with preloaded workers. Both are driven with
+the same closed-loop load. The ``hackrx`` endpoint answers questions about a
+generated policy PDF served locally, using local hashing embeddings and
+extractive answers, so no OpenAI calls are made. Run it from the repository
+root with the required settings available in ``.env`` or the environment.
+"""
+
+import argparse
+import asyncio
+import http.server
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.samples import SAMPLE_CLAUSE, make_pdf
+
+CLAUSES = [
+    SAMPLE_CLAUSE,
+    "Expenses for cataract surgery are covered after a waiting period of two years from policy inception.",
+    "Pre-existing diseases are covered after thirty-six months of continuous coverage.",
+    "Room rent is limited to one percent of the sum insured per day of hospitalisation.",
+]
+QUESTIONS = [
+    "What is the grace period for payment of the renewal premium?",
+    "What is the waiting period for cataract surgery?",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve_document(directory: str) -> Tuple[http.server.ThreadingHTTPServer, str]:
+    """Serve a generated policy PDF from a background thread and return its URL."""
+    with open(os.path.join(directory, "policy.pdf"), "wb") as f:
+        f.write(make_pdf([f"Clause {i}. {CLAUSES[i % len(CLAUSES)]}" for i in range(40)]))
+    
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=directory, **kwargs)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/policy.pdf"
+
+
+def _server_memory_mib(pid: int) -> Optional[float]:
+    """Return the proportional set size of a process tree in MiB (Linux only)."""
+    pids = [pid]
+    try:
+        for child in subprocess.run(["pgrep", "-P", str(pid)], capture_output=True, text=True).stdout.split():
+            pids.append(int(child))
+        total = 0
+        for p in pids:
+            with open(f"/proc/{p}/smaps_rollup") as f:
+                total += sum(int(line.split()[1]) for line in f if line.startswith("Pss:"))
+        return total / 1024
+    except (OSError, ValueError):
+        return None
+
+
+def _start(command: List[str], env: Dict[str, str], port: int) -> subprocess.Popen:
+    """Start a server and wait until it answers health checks."""
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"Server did not start: {' '.join(command)}")
+
+
+async def _load(url: str, payload: Optional[dict], token: str, concurrency: int, duration: float) -> dict:
+    """Send requests from ``concurrency`` clients for ``duration`` seconds."""
+    latencies: List[float] = []
+    errors = 0
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    async def client_loop(client: httpx.AsyncClient, stop_at: float) -> None:
+        nonlocal errors
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            try:
+                if payload is None:
+                    response = await client.get(url, headers=headers)
+                else:
+                    response = await client.post(url, json=payload, headers=headers)
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors += 1
+    
+    async with httpx.AsyncClient(timeout=60, limits=httpx.Limits(max_connections=concurrency)) as client:
+        # Warm up: the first request builds the document's index shard
+        if payload is not None:
+            await client.post(url, json=payload, headers=headers)
+        stop_at = time.monotonic() + duration
+        await asyncio.gather(*(client_loop(client, stop_at) for _ in range(concurrency)))
+    
+    latencies.sort()
+    return {
+        "throughput": len(latencies) / duration,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p95": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+        "errors": errors,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="serve.py worker processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of load per server")
+    parser.add_argument("--endpoint", choices=["hackrx", "health"], default="hackrx")
+    args = parser.parse_args()
+    
+    token = os.environ.get("API_BEARER_TOKEN")
+    if token is None:
+        from app.core.config import settings
+        token = settings.API_BEARER_TOKEN
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        document_server, document_url = _serve_document(tmp)
+        port = _free_port()
+        env = dict(
+            os.environ,
+            EMBEDDING_PROVIDER="hashing",
+            DOCUMENT_STORAGE_PATH=os.path.join(tmp, "storage"),
+            PDF_PAGE_CACHE_PATH="",
+            SERVER_BIND=f"127.0.0.1:{port}",
+            SERVER_WORKERS=str(args.workers),
+        )
+        servers = [
+            ("run.py (1 process, reload)", [
+                sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--reload",
+                "--log-level", "warning",
+            ]),
+            (f"serve.py ({args.workers} workers)", [sys.executable, "serve.py"]),
+        ]
+        
+        if args.endpoint == "hackrx":
+            url = f"http://127.0.0.1:{port}/api/v1/hackrx/run"
+            payload = {"documents": document_url, "questions": QUESTIONS}
+        else:
+            url, payload = f"http://127.0.0.1:{port}/health", None
+        
+        print(f"{args.endpoint} endpoint, {args.concurrency} clients, {args.duration:.0f} s per server")
+        for name, command in servers:
+            process = _start(command, env, port)
+            try:
+                result = asyncio.run(_load(url, payload, token, args.concurrency, args.duration))
+                memory = _server_memory_mib(process.pid)
+            finally:
+                process.terminate()
+                process.wait(timeout=60)
+            memory_text = f"{memory:8.1f} MiB" if memory is not None else "     n/a"
+            print(
+                f"{name:<28} {result['throughput']:8.1f} req/s   p50 {result['p50']:8.1f} ms   "
+                f"p95 {result['p95']:8.1f} ms   errors {result['errors']:5d}   memory (PSS) {memory_text}"
+            )
+        
+        document_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Synthetic sample documents for benchmarks."""
+
+import io
+import zipfile
+from email.message import EmailMessage
+from typing import List
+from xml.sax.saxutils import escape
+
+CONTENT_TYPES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+
+RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+
+SAMPLE_CLAUSE = (
+    "The insured shall be entitled to a grace period of thirty days for payment of the renewal "
+    "premium, during which the policy shall remain in force subject to the terms below."
+)
+
+
+def _paragraph(text: str) -> str:
+    return f'<w:p><w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+
+def make_docx(paragraphs: List[str], tables: List[List[List[str]]] = ()) -> bytes:
+    """Build a minimal DOCX file.
+    
+    Args:
+        paragraphs: Paragraph texts
+        tables: Tables to append, each a list of rows of cell texts
+        
+    Returns:
+        Raw DOCX bytes
+    """
+    body = [_paragraph(text) for text in paragraphs]
+    for table in tables:
+        rows = "".join(
+            "<w:tr>" + "".join(f"<w:tc>{_paragraph(cell)}</w:tc>" for cell in row) + "</w:tr>"
+            for row in table
+        )
+        body.append(f"<w:tbl>{rows}</w:tbl>")
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f'<w:body>{"".join(body)}</w:body></w:document>'
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", CONTENT_TYPES_XML)
+        archive.writestr("_rels/.rels", RELS_XML)
+        archive.writestr("word/document.xml", document)
+    return buffer.getvalue()
+
+
+def make_policy_docx(clauses: int) -> bytes:
+    """Build a policy-like DOCX with numbered clauses and a benefits table.
+    
+    Args:
+        clauses: Number of clauses
+        
+    Returns:
+        Raw DOCX bytes
+    """
+    paragraphs = [f"{i}. {SAMPLE_CLAUSE}" for i in range(1, clauses + 1)]
+    table = [["Benefit", "Limit", "Waiting period"]] + [
+        [f"Benefit {i}", f"{i * 1000} INR", f"{i % 4 * 12} months"] for i in range(1, clauses // 10 + 2)
+    ]
+    return make_docx(paragraphs, [table])
+
+
+def make_email(body_paragraphs: int, attachment: bytes = None) -> bytes:
+    """Build a multipart email with plain and HTML bodies and an optional DOCX attachment.
+    
+    Args:
+        body_paragraphs: Number of paragraphs in the body
+        attachment: Optional DOCX bytes to attach
+        
+    Returns:
+        Raw EML bytes
+    """
+    message = EmailMessage()
+    message["Subject"] = "Policy renewal"
+    message["From"] = "claims@example.com"
+    message["To"] = "customer@example.com"
+    message["Date"] = "Mon, 04 Aug 2025 10:00:00 +0000"
+    text = "\n\n".join(SAMPLE_CLAUSE for _ in range(body_paragraphs))
+    message.set_content(text)
+    message.add_alternative("".join(f"<p>{SAMPLE_CLAUSE}</p>" for _ in range(body_paragraphs)), subtype="html")
+    if attachment is not None:
+        message.add_attachment(
+            attachment,
+            maintype="application",
+            subtype="vnd.openxmlformats-officedocument.wordprocessingml.document",
+            filename="schedule.docx",
+        )
+    return message.as_bytes()
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: List[str], form_xobjects: bool = False) -> bytes:
+    """Build a minimal PDF with one line of Helvetica text per page.
+
+    Args:
+        pages: Text of each page
+        form_xobjects: Draw the text of each page through a Form XObject instead
+            of its content stream
+
+    Returns:
+        Raw PDF bytes
+    """
+    step = 3 if form_xobjects else 2
+    page_ids = [4 + step * i for i in range(len(pages))]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        ("<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{i} 0 R" for i in page_ids), len(pages))).encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for page_id, text in zip(page_ids, pages):
+        stream = f"BT /F1 12 Tf 72 720 Td ({_pdf_escape(text)}) Tj ET".encode("latin-1")
+        resources = "/Font << /F1 3 0 R >>"
+        if form_xobjects:
+            resources = f"/XObject << /X0 {page_id + 2} 0 R >>"
+        objects.append(
+            (
+                "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                f"/Resources << {resources} >> /Contents {page_id + 1} 0 R >>"
+            ).encode()
+        )
+        if form_xobjects:
+            objects.append(b"<< /Length 6 >>\nstream\n/X0 Do\nendstream")
+            objects.append(
+                b"<< /Type /XObject /Subtype /Form /BBox [0 0 612 792] "
+                b"/Resources << /Font << /F1 3 0 R >> >> /Length %d >>\nstream\n" % len(stream)
+                + stream + b"\nendstream"
+            )
+        else:
+            objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def make_policy_pdf(pages: int) -> bytes:
+    """Build a policy-like PDF with one clause per page.
+
+    Args:
+        pages: Number of pages
+
+    Returns:
+        Raw PDF bytes
+    """
+    return make_pdf([f"Clause {i}. {SAMPLE_CLAUSE[:80]}" for i in range(1, pages + 1)])
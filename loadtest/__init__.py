@@ -0,0 +1,6 @@
+"""Load testing for the API against local fake upstream services.
+
+Run ``python -m loadtest --help`` for usage. The application is started with
+``OPENAI_BASE_URL`` pointing at a fake OpenAI-compatible server and its
+documents served by a local document server, so no API money is spent.
+"""
@@ -0,0 +1,237 @@
+"""Drive the API at realistic load against local fake upstream services.
+
+Usage:
+    python -m loadtest [--rates 1,2,4] [--duration 30] [--server serve|uvicorn] [--workload FILE]
+                       [--llm median_ms=800,sigma=0.5,error_rate=0.01] [--json FILE]
+                       
+Starts a fake OpenAI-compatible server and a document server (each with its own
+latency distribution and error rates), then the application with
+``OPENAI_BASE_URL`` pointing at the fake server and a temporary storage
+directory. The workload is replayed open-loop at each arrival rate in turn, and
+throughput, latency percentiles, error rates, concurrency and the server's CPU
+and memory use are reported per level. Run it from the repository root with
+the required settings available in ``.env`` or the environment.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from loadtest.faults import FaultProfile
+from loadtest.resources import ResourceSampler
+from loadtest.runner import RequestResult, run_open_loop
+from loadtest.upstreams import serve_upstreams
+from loadtest.workload import WorkloadItem, default_workload, load_workload
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _seed(seed: Optional[int], offset: int) -> Optional[int]:
+    """Derive independent seeds for the fault profiles from the run's seed."""
+    return None if seed is None else seed + offset
+
+
+def _wait_until_up(url: str, process, timeout: float = 60) -> None:
+    """Poll a URL until it answers, failing early if its process exits."""
+    give_up_at = time.monotonic() + timeout
+    while time.monotonic() < give_up_at:
+        exited = process.poll() is not None if hasattr(process, "poll") else not process.is_alive()
+        if exited:
+            raise RuntimeError(f"Server for {url} exited during startup")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server for {url} did not start within {timeout:.0f} s")
+
+
+def _app_command(server: str, port: int) -> List[str]:
+    if server == "serve":
+        return [sys.executable, os.path.join(ROOT_DIR, "serve.py")]
+    return [
+        sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+        "--log-level", "warning", "--no-access-log",
+    ]
+
+
+async def _run_levels(args, items: List[WorkloadItem], urls: Dict[str, str], app_pid: int) -> List[dict]:
+    """Replay the workload at each arrival rate and collect one report per level."""
+    token = os.environ.get("API_BEARER_TOKEN")
+    if token is None:
+        from app.core.config import settings
+        token = settings.API_BEARER_TOKEN
+    headers = {"Authorization": f"Bearer {token}"}
+    if args.deadline_ms is not None:
+        headers["X-Request-Deadline-Ms"] = str(args.deadline_ms)
+    
+    # Expire idle connections before uvicorn's 5 s keep-alive timeout closes them under a request
+    limits = httpx.Limits(
+        max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight, keepalive_expiry=2
+    )
+    async with httpx.AsyncClient(base_url=urls["app"], headers=headers, timeout=args.timeout, limits=limits) as client:
+    
+        async def send(item: WorkloadItem) -> RequestResult:
+            path, body = item.request(f"{urls['documents']}/documents")
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+            except httpx.HTTPError as e:
+                return RequestResult(item.endpoint, 0, (time.perf_counter() - start) * 1000, error=repr(e))
+            latency_ms = (time.perf_counter() - start) * 1000
+            partial = response.headers.get("X-Partial-Response") == "true"
+            error = None if response.is_success else response.text[:300]
+            return RequestResult(item.endpoint, response.status_code, latency_ms, partial, error)
+        
+        async def upstream_stats() -> Dict[str, float]:
+            stats = {}
+            for name in ("openai", "documents"):
+                stats.update((await client.get(f"{urls[name]}/stats")).json())
+            return stats
+        
+        if args.warmup:
+            # Index every document once so that levels measure steady state rather than the first builds
+            await asyncio.gather(*(send(item) for item in items))
+        
+        reports = []
+        sampler = ResourceSampler(app_pid)
+        for rate in args.rates:
+            before = await upstream_stats()
+            sampler.start()
+            level = await run_open_loop(
+                send, items, rate, args.duration,
+                max_in_flight=args.max_in_flight, poisson=not args.uniform, seed=args.seed,
+            )
+            report = level.summary()
+            report.update(await sampler.stop())
+            after = await upstream_stats()
+            report["upstream"] = {key: value - before.get(key, 0) for key, value in after.items()}
+            reports.append(report)
+            _print_level(report)
+        return reports
+
+
+def _print_header() -> None:
+    print(
+        f"{'rate':>6} {'sent':>6} {'ok/s':>7} {'err%':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} "
+        f"{'inflight':>9} {'cpu%':>6} {'mem MiB':>8} {'llm/req':>8}"
+    )
+
+
+def _print_level(report: dict) -> None:
+    llm_per_request = report["upstream"].get("chat_requests", 0) / max(1, report["succeeded"])
+    cpu = f"{report['cpu_percent']:6.0f}" if report["cpu_percent"] is not None else f"{'n/a':>6}"
+    memory = f"{report['peak_memory_mib']:8.0f}" if report["peak_memory_mib"] is not None else f"{'n/a':>8}"
+    inflight = f"{report['mean_in_flight']:.1f}/{report['peak_in_flight']}"
+    print(
+        f"{report['offered_rate']:6.1f} {report['sent']:6d} {report['throughput']:7.1f} "
+        f"{100 * report['error_rate']:6.1f} {report['p50_ms']:8.0f} {report['p90_ms']:8.0f} "
+        f"{report['p99_ms']:8.0f} {inflight:>9} {cpu} {memory} {llm_per_request:8.2f}"
+    )
+    for status, count in report["errors"].items():
+        print(f"{'':>6} {count} x {status}: {report['error_samples'][status]}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rates", type=lambda v: [float(r) for r in v.split(",")], default=[1.0, 2.0, 4.0],
+                        help="Comma-separated arrival rates in requests per second, one level each")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of arrivals per level")
+    parser.add_argument("--workload", help="Workload JSON file (default: built-in mix)")
+    parser.add_argument("--documents-dir", help="Directory of extra documents to serve by file name")
+    parser.add_argument("--server", choices=["serve", "uvicorn"], default="serve",
+                        help="serve.py with preloaded workers, or a single uvicorn process")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="serve.py worker processes")
+    parser.add_argument("--embedding-provider", default="openai",
+                        help="Embedding provider of the app; openai uses the fake server")
+    parser.add_argument("--llm", default="median_ms=800,sigma=0.5,error_rate=0.005,rate_limit_rate=0.01",
+                        help="Fault profile of chat completions")
+    parser.add_argument("--embeddings", default="median_ms=60,sigma=0.4,error_rate=0.002",
+                        help="Fault profile of embeddings")
+    parser.add_argument("--documents", default="median_ms=50,sigma=0.8", help="Fault profile of document downloads")
+    parser.add_argument("--deadline-ms", type=int, help="X-Request-Deadline-Ms header to send")
+    parser.add_argument("--max-in-flight", type=int, default=512, help="Outstanding requests before arrivals are dropped")
+    parser.add_argument("--timeout", type=float, default=120, help="Client timeout per request in seconds")
+    parser.add_argument("--uniform", action="store_true", help="Fixed inter-arrival times instead of Poisson arrivals")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false", help="Skip indexing documents first")
+    parser.add_argument("--seed", type=int, help="Random seed for arrivals and faults")
+    parser.add_argument("--json", help="Write the reports to this JSON file")
+    parser.add_argument("--app-log", help="Write the application's output to this file")
+    args = parser.parse_args()
+    
+    items = load_workload(args.workload) if args.workload else default_workload()
+    ports = {"app": _free_port(), "openai": _free_port(), "documents": _free_port()}
+    urls = {name: f"http://127.0.0.1:{port}" for name, port in ports.items()}
+    
+    upstreams = multiprocessing.get_context("spawn").Process(
+        target=serve_upstreams,
+        args=(
+            ports["openai"], ports["documents"],
+            FaultProfile.parse(args.llm, _seed(args.seed, 1)),
+            FaultProfile.parse(args.embeddings, _seed(args.seed, 2)),
+            FaultProfile.parse(args.documents, _seed(args.seed, 3)),
+            args.documents_dir,
+        ),
+        daemon=True,
+    )
+    upstreams.start()
+    app = None
+    try:
+        _wait_until_up(f"{urls['openai']}/stats", upstreams)
+        _wait_until_up(f"{urls['documents']}/stats", upstreams)
+        with tempfile.TemporaryDirectory() as tmp:
+            try:
+                env = dict(
+                    os.environ,
+                    OPENAI_BASE_URL=f"{urls['openai']}/v1",
+                    OPENAI_API_KEY="loadtest",
+                    EMBEDDING_PROVIDER=args.embedding_provider,
+                    DOCUMENT_STORAGE_PATH=os.path.join(tmp, "storage"),
+                    PDF_PAGE_CACHE_PATH="",
+                    SERVER_BIND=f"127.0.0.1:{ports['app']}",
+                    SERVER_WORKERS=str(args.workers),
+                )
+                log = open(args.app_log, "wb") if args.app_log else subprocess.DEVNULL
+                app = subprocess.Popen(
+                    _app_command(args.server, ports["app"]), cwd=ROOT_DIR, env=env,
+                    stdout=log, stderr=subprocess.STDOUT,
+                )
+                _wait_until_up(f"{urls['app']}/health", app)
+                
+                print(
+                    f"{args.server} server, {len(items)} request templates, {args.duration:.0f} s per level, "
+                    f"{'uniform' if args.uniform else 'Poisson'} arrivals"
+                )
+                _print_header()
+                reports = asyncio.run(_run_levels(args, items, urls, app.pid))
+                if args.json:
+                    with open(args.json, "w") as f:
+                        json.dump({"args": vars(args), "levels": reports}, f, indent=2)
+            finally:
+                if app is not None:
+                    app.terminate()
+                    app.wait(timeout=60)
+    finally:
+        upstreams.terminate()
+        upstreams.join(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
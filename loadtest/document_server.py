@@ -0,0 +1,94 @@
+"""A local document server for load tests."""
+
+import hashlib
+import mimetypes
+import re
+from collections import Counter
+from typing import Dict, Optional
+
+from fastapi import FastAPI, Header
+from fastapi.responses import JSONResponse, Response
+
+from benchmarks.samples import SAMPLE_CLAUSE, make_pdf, make_policy_docx
+from loadtest.faults import FaultProfile
+
+# A single byte range; other range forms are answered with the whole document
+BYTE_RANGE = re.compile(r"bytes=(\d+)-(\d*)")
+
+POLICY_CLAUSES = [
+    SAMPLE_CLAUSE,
+    "Expenses for cataract surgery are covered after a waiting period of two years from policy inception.",
+    "Pre-existing diseases are covered after thirty-six months of continuous coverage.",
+    "Room rent is limited to one percent of the sum insured per day of hospitalisation.",
+    "Maternity expenses are covered after nine months of continuous coverage, limited to two deliveries.",
+    "A no claim discount of five percent is given on renewal for each claim-free policy year.",
+    "Organ donor expenses are covered for harvesting the organ for an insured person.",
+    "Ayush treatment is covered up to the sum insured in a recognised Ayush hospital.",
+]
+
+
+def default_documents() -> Dict[str, bytes]:
+    """Generate the sample policy documents used by the default workload.
+    
+    Returns:
+        Raw document bytes by file name
+    """
+    return {
+        "policy_small.pdf": make_pdf([
+            f"Clause {i}. {POLICY_CLAUSES[i % len(POLICY_CLAUSES)]}" for i in range(1, 17)
+        ]),
+        "policy_large.pdf": make_pdf([
+            f"Section {i}. {POLICY_CLAUSES[(i * 3) % len(POLICY_CLAUSES)]}" for i in range(1, 121)
+        ]),
+        "schedule.docx": make_policy_docx(60),
+    }
+
+
+def create_app(documents: Dict[str, bytes], faults: FaultProfile) -> FastAPI:
+    """Create the document server.
+    
+    Documents are served with single byte-range support and an ETag, as object
+    stores and CDNs serve them.
+    
+    Args:
+        documents: Raw document bytes by file name, served at ``/documents/<name>``
+        faults: Latency and errors of document downloads
+        
+    Returns:
+        The FastAPI application
+    """
+    app = FastAPI(title="Load test documents")
+    stats: Counter = Counter()
+    
+    @app.get("/documents/{name}")
+    async def get_document(name: str, range_header: Optional[str] = Header(None, alias="Range")):
+        stats["document_requests"] += 1
+        if name not in documents:
+            return JSONResponse({"detail": "Not found"}, status_code=404)
+        error = await faults.inject()
+        if error is not None:
+            stats[f"document_errors_{error.status_code}"] += 1
+            return error
+        
+        data = documents[name]
+        headers = {"Accept-Ranges": "bytes", "ETag": f'"{hashlib.sha256(data).hexdigest()[:16]}"'}
+        media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        match = BYTE_RANGE.fullmatch(range_header or "")
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2) or len(data) - 1), len(data) - 1)
+            if start > end:
+                return Response(status_code=416, headers={"Content-Range": f"bytes */{len(data)}"})
+            stats["document_range_requests"] += 1
+            stats["document_bytes"] += end + 1 - start
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            return Response(data[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+        stats["document_bytes"] += len(data)
+        return Response(data, media_type=media_type, headers=headers)
+    
+    @app.get("/stats")
+    async def get_stats():
+        """Return request, error and byte counts since startup."""
+        return dict(stats)
+    
+    return app
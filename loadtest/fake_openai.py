@@ -0,0 +1,138 @@
+"""A fake OpenAI-compatible server for load tests.
+
+Implements ``/v1/embeddings`` and ``/v1/chat/completions`` closely enough for
+the OpenAI client. Embeddings are deterministic hashed n-gram vectors, so
+retrieval behaves sensibly, and chat completions answer with the context
+sentence sharing the most words with the question. Each endpoint has its own
+``FaultProfile``.
+"""
+
+import base64
+import time
+import uuid
+from collections import Counter
+from typing import List
+
+from fastapi import FastAPI, Request
+
+from app.services.embedding_providers import HashingEmbeddings
+from app.services.extractive_answering import content_terms, split_sentences
+from loadtest.faults import FaultProfile
+
+UNKNOWN_ANSWER = "The provided context does not mention this."
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def answer_from_messages(messages: List[dict]) -> str:
+    """Answer the last user message with the best-overlapping sentence of the other messages.
+    
+    Args:
+        messages: Chat messages with ``role`` and ``content``
+        
+    Returns:
+        The answer text
+    """
+    user_messages = [m for m in messages if m.get("role") == "user"]
+    question_message = user_messages[-1] if user_messages else {}
+    question_terms = content_terms(question_message.get("content") or "")
+    best, best_overlap = UNKNOWN_ANSWER, 0
+    for message in messages:
+        if message is question_message:
+            continue
+        for sentence in split_sentences(message.get("content") or ""):
+            overlap = len(question_terms & content_terms(sentence))
+            if overlap > best_overlap:
+                best, best_overlap = sentence, overlap
+    return best
+
+
+def create_app(chat: FaultProfile, embeddings: FaultProfile, dimension: int = 1536) -> FastAPI:
+    """Create the fake OpenAI server.
+    
+    Args:
+        chat: Latency and errors of chat completions
+        embeddings: Latency and errors of embeddings
+        dimension: Embedding dimension
+        
+    Returns:
+        The FastAPI application
+    """
+    app = FastAPI(title="Fake OpenAI")
+    vectorizer = HashingEmbeddings(dimension, batch_size=512, max_workers=1)
+    stats: Counter = Counter()
+    
+    @app.post("/v1/embeddings")
+    async def create_embeddings(request: Request):
+        body = await request.json()
+        stats["embedding_requests"] += 1
+        error = await embeddings.inject()
+        if error is not None:
+            stats[f"embedding_errors_{error.status_code}"] += 1
+            return error
+        
+        inputs = body.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        # Token id inputs are hashed as their decimal representation
+        texts = [text if isinstance(text, str) else " ".join(map(str, text)) for text in inputs]
+        vectors = await vectorizer.aembed_array(texts)
+        tokens = sum(_estimate_tokens(text) for text in texts)
+        stats["embedding_inputs"] += len(texts)
+        stats["embedding_tokens"] += tokens
+        
+        base64_encoded = body.get("encoding_format") == "base64"
+        data = [
+            {
+                "object": "embedding",
+                "index": index,
+                "embedding": base64.b64encode(vector.tobytes()).decode() if base64_encoded else vector.tolist(),
+            }
+            for index, vector in enumerate(vectors)
+        ]
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "text-embedding-ada-002"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+    
+    @app.post("/v1/chat/completions")
+    async def create_chat_completion(request: Request):
+        body = await request.json()
+        model = body.get("model", "gpt-4")
+        stats["chat_requests"] += 1
+        stats[f"chat_requests_{model}"] += 1
+        error = await chat.inject()
+        if error is not None:
+            stats[f"chat_errors_{error.status_code}"] += 1
+            return error
+        
+        messages = body.get("messages", [])
+        answer = answer_from_messages(messages)
+        prompt_tokens = sum(_estimate_tokens(m.get("content") or "") for m in messages)
+        completion_tokens = _estimate_tokens(answer)
+        stats["chat_tokens"] += prompt_tokens + completion_tokens
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+    
+    @app.get("/stats")
+    async def get_stats():
+        """Return request, error and token counts since startup."""
+        return dict(stats)
+    
+    return app
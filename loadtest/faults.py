@@ -0,0 +1,86 @@
+"""Latency and error injection for the fake upstream servers."""
+
+import asyncio
+import math
+import random
+from dataclasses import dataclass, field, fields
+from typing import Optional
+
+from fastapi.responses import JSONResponse
+
+
+@dataclass
+class FaultProfile:
+    """Latency distribution and error rates of a fake upstream service.
+    
+    Latency is log-normal: ``median_ms`` is its median and ``sigma`` the
+    standard deviation of its logarithm, so 0 gives a constant latency and 1 a
+    p99 about ten times the median. A request fails with a 500 with probability
+    ``error_rate`` and is rate limited with a 429 with probability
+    ``rate_limit_rate``.
+    """
+    
+    median_ms: float = 0
+    sigma: float = 0
+    error_rate: float = 0
+    rate_limit_rate: float = 0
+    retry_after_seconds: float = 1
+    seed: Optional[int] = None
+    _random: random.Random = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self._random = random.Random(self.seed)
+    
+    @classmethod
+    def parse(cls, spec: str, seed: Optional[int] = None) -> "FaultProfile":
+        """Create a profile from a ``key=value,...`` specification.
+        
+        Args:
+            spec: Specification such as ``median_ms=800,sigma=0.5,error_rate=0.01``
+            seed: Optional random seed
+            
+        Returns:
+            The profile
+            
+        Raises:
+            ValueError: If a key is unknown or a value is not a number
+        """
+        names = {f.name for f in fields(cls) if f.init and f.name != "seed"}
+        values = {}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            key, _, value = item.partition("=")
+            if key.strip() not in names:
+                raise ValueError(f"Unknown fault profile setting {key!r}; expected one of {sorted(names)}")
+            values[key.strip()] = float(value)
+        return cls(seed=seed, **values)
+    
+    def sample_latency(self) -> float:
+        """Draw a latency in seconds."""
+        if self.median_ms <= 0:
+            return 0.0
+        return self.median_ms * math.exp(self._random.gauss(0, self.sigma)) / 1000
+    
+    def sample_error(self) -> Optional[int]:
+        """Draw the status code of an injected error, or None for success."""
+        draw = self._random.random()
+        if draw < self.error_rate:
+            return 500
+        if draw < self.error_rate + self.rate_limit_rate:
+            return 429
+        return None
+    
+    async def inject(self) -> Optional[JSONResponse]:
+        """Wait for a sampled latency and return an injected error response, if any."""
+        latency = self.sample_latency()
+        if latency:
+            await asyncio.sleep(latency)
+        status = self.sample_error()
+        if status is None:
+            return None
+        if status == 429:
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"Retry-After": f"{self.retry_after_seconds:g}"},
+            )
+        return JSONResponse({"error": {"message": "Injected failure", "type": "server_error"}}, status_code=500)
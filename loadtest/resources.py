@@ -0,0 +1,114 @@
+"""CPU and memory usage of the server's process tree (Linux only)."""
+
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def process_tree(pid: int) -> List[int]:
+    """Return a process and all of its descendants.
+    
+    Args:
+        pid: Root process id
+        
+    Returns:
+        Process ids, root first
+    """
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; fields resume after its closing parenthesis
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(children.get(current, []))
+    return tree
+
+
+def cpu_seconds(pids: List[int]) -> float:
+    """Return the user and system CPU time used by processes."""
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                values = f.read().rsplit(")", 1)[1].split()
+            total += int(values[11]) + int(values[12])
+        except (OSError, IndexError, ValueError):
+            continue
+    return total / CLOCK_TICKS
+
+
+def memory_pss_mib(pids: List[int]) -> float:
+    """Return the proportional set size of processes in MiB, counting shared pages once."""
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                total += sum(int(line.split()[1]) for line in f if line.startswith("Pss:"))
+        except (OSError, IndexError, ValueError):
+            continue
+    return total / 1024
+
+
+class ResourceSampler:
+    """Sample the CPU use and peak memory of a process tree while a load level runs."""
+    
+    def __init__(self, pid: int, interval_seconds: float = 0.5):
+        """Initialize the sampler.
+        
+        Args:
+            pid: Root process id of the server
+            interval_seconds: Time between memory samples
+        """
+        self.pid = pid
+        self.interval = interval_seconds
+        self.available = os.path.exists(f"/proc/{pid}/stat")
+        self._task: Optional[asyncio.Task] = None
+        self._start_cpu = 0.0
+        self._start_time = 0.0
+        self.peak_memory_mib = 0.0
+    
+    async def _sample(self) -> None:
+        while True:
+            self.peak_memory_mib = max(self.peak_memory_mib, memory_pss_mib(process_tree(self.pid)))
+            await asyncio.sleep(self.interval)
+    
+    def start(self) -> None:
+        """Start sampling."""
+        if not self.available:
+            return
+        self.peak_memory_mib = 0.0
+        self._start_cpu = cpu_seconds(process_tree(self.pid))
+        self._start_time = time.monotonic()
+        self._task = asyncio.create_task(self._sample())
+    
+    async def stop(self) -> Dict[str, Optional[float]]:
+        """Stop sampling.
+        
+        Returns:
+            CPU use in percent of one core and peak memory in MiB, or None where unavailable
+        """
+        if not self.available or self._task is None:
+            return {"cpu_percent": None, "peak_memory_mib": None}
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        elapsed = time.monotonic() - self._start_time
+        used = cpu_seconds(process_tree(self.pid)) - self._start_cpu
+        return {
+            "cpu_percent": 100 * used / elapsed if elapsed > 0 else 0.0,
+            "peak_memory_mib": self.peak_memory_mib,
+        }
@@ -0,0 +1,145 @@
+"""Open-loop load generation.
+
+Requests arrive at a target rate regardless of how fast earlier ones complete,
+as real users do, so a saturated server shows up as growing latency and
+concurrency instead of being hidden by clients waiting for their previous
+response (coordinated omission).
+"""
+
+import asyncio
+import math
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from loadtest.workload import WorkloadItem, choose
+
+
+@dataclass
+class RequestResult:
+    """Outcome of one request."""
+    
+    endpoint: str
+    status: int
+    latency_ms: float
+    partial: bool = False
+    error: Optional[str] = None
+    
+    @property
+    def ok(self) -> bool:
+        """Whether the request succeeded; status 0 means a transport error."""
+        return 200 <= self.status < 300
+
+
+@dataclass
+class LevelStats:
+    """Requests sent at one arrival rate."""
+    
+    rate: float
+    duration: float
+    results: List[RequestResult] = field(default_factory=list)
+    dropped: int = 0
+    peak_in_flight: int = 0
+    elapsed: float = 0.0
+    
+    def summary(self) -> Dict[str, object]:
+        """Summarize throughput, latency percentiles, errors and concurrency.
+        
+        Returns:
+            Dictionary of summary statistics; latencies are in milliseconds
+        """
+        latencies = sorted(r.latency_ms for r in self.results if r.ok)
+        failed = [r for r in self.results if not r.ok]
+        sent = len(self.results) + self.dropped
+        elapsed = self.elapsed or self.duration
+        return {
+            "offered_rate": self.rate,
+            "sent": sent,
+            "succeeded": len(latencies),
+            "dropped": self.dropped,
+            "throughput": len(latencies) / elapsed,
+            "error_rate": (len(failed) + self.dropped) / sent if sent else 0.0,
+            "errors": dict(Counter(str(r.status) for r in failed)),
+            "error_samples": {str(r.status): r.error for r in reversed(failed)},
+            "partial_rate": sum(r.partial for r in self.results if r.ok) / len(latencies) if latencies else 0.0,
+            "p50_ms": percentile(latencies, 0.5),
+            "p90_ms": percentile(latencies, 0.9),
+            "p99_ms": percentile(latencies, 0.99),
+            "max_ms": latencies[-1] if latencies else 0.0,
+            # Little's law: average number of requests in flight
+            "mean_in_flight": sum(r.latency_ms for r in self.results) / 1000 / elapsed,
+            "peak_in_flight": self.peak_in_flight,
+        }
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Return the nearest-rank percentile of sorted values, or 0 for none.
+    
+    Args:
+        sorted_values: Values in ascending order
+        q: Quantile between 0 and 1
+        
+    Returns:
+        The percentile
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def run_open_loop(
+    send: Callable[[WorkloadItem], Awaitable[RequestResult]],
+    items: List[WorkloadItem],
+    rate: float,
+    duration: float,
+    max_in_flight: int = 1024,
+    poisson: bool = True,
+    seed: Optional[int] = None,
+) -> LevelStats:
+    """Send requests at a target arrival rate for a fixed duration.
+    
+    Arrivals that would exceed ``max_in_flight`` outstanding requests are
+    dropped and counted as errors, which keeps an overloaded run from
+    exhausting the client.
+    
+    Args:
+        send: Coroutine function sending one request
+        items: Request templates to draw from
+        rate: Arrivals per second
+        duration: Seconds to generate arrivals for; outstanding requests are then awaited
+        max_in_flight: Limit of outstanding requests
+        poisson: Draw exponential inter-arrival times instead of a fixed interval
+        seed: Optional random seed
+        
+    Returns:
+        Statistics of the run
+    """
+    rng = random.Random(seed)
+    stats = LevelStats(rate=rate, duration=duration)
+    tasks = set()
+    
+    async def tracked(item: WorkloadItem) -> None:
+        stats.results.append(await send(item))
+    
+    start = time.monotonic()
+    next_arrival = start
+    while True:
+        next_arrival += rng.expovariate(rate) if poisson else 1 / rate
+        if next_arrival - start >= duration:
+            break
+        await asyncio.sleep(max(0.0, next_arrival - time.monotonic()))
+        if len(tasks) >= max_in_flight:
+            stats.dropped += 1
+            continue
+        task = asyncio.create_task(tracked(choose(items, rng)))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        stats.peak_in_flight = max(stats.peak_in_flight, len(tasks))
+    
+    if tasks:
+        await asyncio.gather(*tasks)
+    stats.elapsed = time.monotonic() - start
+    return stats
@@ -0,0 +1,41 @@
+"""Process running the fake upstream services of a load test."""
+
+import asyncio
+import os
+from typing import Optional
+
+import uvicorn
+
+from loadtest import document_server, fake_openai
+from loadtest.faults import FaultProfile
+
+
+def serve_upstreams(
+    openai_port: int,
+    document_port: int,
+    chat: FaultProfile,
+    embeddings: FaultProfile,
+    documents_faults: FaultProfile,
+    documents_dir: Optional[str],
+) -> None:
+    """Run the fake OpenAI and document servers (in a child process)."""
+    documents = document_server.default_documents()
+    if documents_dir:
+        for name in os.listdir(documents_dir):
+            with open(os.path.join(documents_dir, name), "rb") as f:
+                documents[name] = f.read()
+    
+    servers = [
+        uvicorn.Server(uvicorn.Config(
+            fake_openai.create_app(chat, embeddings), port=openai_port, log_level="warning", access_log=False
+        )),
+        uvicorn.Server(uvicorn.Config(
+            document_server.create_app(documents, documents_faults),
+            port=document_port, log_level="warning", access_log=False
+        )),
+    ]
+    
+    async def serve() -> None:
+        await asyncio.gather(*(server.serve() for server in servers))
+    
+    asyncio.run(serve())
@@ -0,0 +1,98 @@
+"""Load test workloads: the requests replayed against the API.
+
+A workload file is JSON with a list of request templates::
+
+    {"requests": [
+        {"endpoint": "hackrx", "documents": ["policy_small.pdf"], "questions": ["..."], "weight": 3},
+        {"endpoint": "download", "documents": ["schedule.docx"]}
+    ]}
+    
+Documents are names served by the local document server, or absolute URLs.
+Each arrival picks a template at random in proportion to its weight.
+"""
+
+import json
+import random
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+ENDPOINTS = {
+    "hackrx": "/api/v1/hackrx/run",
+    "download": "/api/v1/document/download",
+}
+
+
+@dataclass
+class WorkloadItem:
+    """A request template of a workload."""
+    
+    endpoint: str
+    documents: List[str]
+    questions: List[str] = field(default_factory=list)
+    weight: float = 1
+    
+    def __post_init__(self):
+        if self.endpoint not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint {self.endpoint!r}; expected one of {sorted(ENDPOINTS)}")
+        if not self.documents:
+            raise ValueError("A workload request needs at least one document")
+        if self.endpoint == "hackrx" and not self.questions:
+            raise ValueError("A hackrx workload request needs at least one question")
+    
+    def request(self, document_base_url: str) -> Tuple[str, dict]:
+        """Build the API path and JSON body of this request.
+        
+        Args:
+            document_base_url: Base URL of the document server
+            
+        Returns:
+            Tuple of (path, body)
+        """
+        urls = [doc if "://" in doc else f"{document_base_url.rstrip('/')}/{doc}" for doc in self.documents]
+        if self.endpoint == "download":
+            return ENDPOINTS["download"], {"url": urls[0]}
+        return ENDPOINTS["hackrx"], {"documents": urls if len(urls) > 1 else urls[0], "questions": self.questions}
+
+
+def load_workload(path: str) -> List[WorkloadItem]:
+    """Read a workload file.
+    
+    Args:
+        path: Path of the JSON workload
+        
+    Returns:
+        Request templates
+        
+    Raises:
+        ValueError: If the workload is empty or malformed
+    """
+    with open(path) as f:
+        data = json.load(f)
+    requests = data["requests"] if isinstance(data, dict) else data
+    items = [WorkloadItem(**request) for request in requests]
+    if not items:
+        raise ValueError(f"Workload {path} has no requests")
+    return items
+
+
+def default_workload() -> List[WorkloadItem]:
+    """Return a mix of question sets over the default documents and plain downloads."""
+    return [
+        WorkloadItem("hackrx", ["policy_small.pdf"], [
+            "What is the grace period for payment of the renewal premium?",
+            "What is the waiting period for cataract surgery?",
+        ], weight=4),
+        WorkloadItem("hackrx", ["policy_large.pdf", "schedule.docx"], [
+            "What is the waiting period for pre-existing diseases?",
+            "Are maternity expenses covered?",
+            "What is the limit on room rent?",
+            "Is there a no claim discount?",
+            "Are organ donor expenses covered?",
+        ], weight=2),
+        WorkloadItem("download", ["policy_large.pdf"]),
+    ]
+
+
+def choose(items: List[WorkloadItem], rng: random.Random) -> WorkloadItem:
+    """Pick a request template in proportion to the weights."""
+    return rng.choices(items, weights=[item.weight for item in items])[0]
@@ -0,0 +1,122 @@
+"""Script to run the FastAPI application in production.
+
+Runs gunicorn with uvicorn workers (using uvloop and httptools when installed).
+The application is imported and the most recently used index shards are loaded
+in the master process before the workers are forked, so the workers share them
+copy-on-write instead of each loading a private copy. Every worker tracks the
+storage directory, but only one at a time sweeps it, honouring the pins and
+retains of all of them. Configure it through the ``SERVER_*`` settings.
+
+Usage:
+    python serve.py
+"""
+
+import asyncio
+import gc
+import os
+import signal
+import threading
+import time
+
+from gunicorn.app.base import BaseApplication
+
+from app.core.config import settings
+
+MEMORY_CHECK_INTERVAL_SECONDS = 5
+
+
+def private_memory_bytes() -> int:
+    """Return the memory private to this process, excluding pages shared with other workers."""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return sum(int(fields[name].split()[0]) for name in ("Private_Clean", "Private_Dirty")) * 1024
+    except (OSError, KeyError, ValueError):
+        # Not on Linux: fall back to the peak resident size
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def watch_memory(worker, limit_bytes: int) -> None:
+    """Gracefully stop a worker once its private memory exceeds the limit; gunicorn replaces it.
+    
+    Args:
+        worker: The gunicorn worker
+        limit_bytes: Memory limit in bytes
+    """
+    while True:
+        time.sleep(MEMORY_CHECK_INTERVAL_SECONDS)
+        used = private_memory_bytes()
+        if used > limit_bytes:
+            worker.log.warning(
+                "Worker %s uses %d MiB of private memory (limit %d MiB), restarting",
+                worker.pid, used >> 20, limit_bytes >> 20,
+            )
+            os.kill(worker.pid, signal.SIGTERM)
+            return
+
+
+def post_worker_init(worker) -> None:
+    """Retain the preloaded shards and start the memory watchdog of a newly forked worker."""
+    from app.services.index_registry import index_registry
+    
+    # Retained per worker, so that a shard is released once no worker caches it
+    index_registry.retain_cached()
+    
+    if settings.SERVER_MAX_WORKER_MEMORY_MB > 0:
+        threading.Thread(
+            target=watch_memory,
+            args=(worker, settings.SERVER_MAX_WORKER_MEMORY_MB * 1024 * 1024),
+            name="memory-watchdog",
+            daemon=True,
+        ).start()
+
+
+def load_app():
+    """Import the application and warm shared state before the workers are forked."""
+    from app.main import app
+    from app.services.index_registry import index_registry
+    from app.services.vector_store import VectorStoreService
+    
+    if settings.SERVER_PRELOAD_SHARDS:
+        asyncio.run(index_registry.preload(VectorStoreService()))
+    
+    # Move everything loaded so far out of the garbage collector's reach, so that
+    # collections in the workers do not write to (and copy) the shared pages
+    gc.freeze()
+    return app
+
+
+class ProductionServer(BaseApplication):
+    """Gunicorn application serving the preloaded FastAPI app."""
+    
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+    
+    def load_config(self) -> None:
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+    
+    def load(self):
+        return load_app()
+
+
+def main() -> None:
+    options = {
+        "bind": settings.SERVER_BIND,
+        "workers": settings.SERVER_WORKERS,
+        "worker_class": "uvicorn_worker.UvicornWorker",
+        "preload_app": True,
+        "timeout": settings.SERVER_TIMEOUT_SECONDS,
+        "graceful_timeout": settings.SERVER_TIMEOUT_SECONDS,
+        "max_requests": settings.SERVER_MAX_REQUESTS,
+        "max_requests_jitter": settings.SERVER_MAX_REQUESTS // 10,
+        "post_worker_init": post_worker_init,
+        "accesslog": "-",
+    }
+    ProductionServer(options).run()
+
+
+if __name__ == "__main__":
+    main()
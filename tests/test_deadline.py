@@ -0,0 +1,123 @@
+"""Tests for request deadlines and graceful degradation."""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from langchain.docstore.document import Document
+
+from app.core.deadline import Deadline, DeadlineExceeded
+from app.services.llm_scheduler import ProviderScheduler
+from app.services.question_answering import PARTIAL_ANSWER_TEXT, QuestionAnsweringService
+
+CHUNKS = [
+    "A grace period of thirty days is provided for premium payment after the due date.",
+    "Expenses for cataract surgery are covered after a waiting period of two years.",
+]
+
+
+class Overloaded(Exception):
+    """Retryable provider error."""
+    
+    status_code = 503
+
+
+def test_deadline_from_header():
+    """Test that the header budget is in milliseconds and invalid values fall back to the default."""
+    assert Deadline.from_header("1500", 30).budget == 1.5
+    assert Deadline.from_header(None, 30).budget == 30
+    assert Deadline.from_header("soon", 30).budget == 30
+    assert Deadline.from_header(None, 0).remaining() == float("inf")
+    
+    # Clients can shorten the server's budget but not disable or extend it
+    for value in ("0", "-5", "nan", "inf"):
+        assert Deadline.from_header(value, 30).budget == 30
+    assert Deadline.from_header("600000", 30).budget == 30
+    assert Deadline.from_header("600000", None).budget == 600
+
+
+def test_wait_for_raises_when_the_deadline_passes():
+    """Test that waits are cut off at the deadline and stages are recorded."""
+    deadline = Deadline(0.05)
+    
+    async def run():
+        with deadline.stage("slow"):
+            await deadline.wait_for(asyncio.sleep(1))
+    
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(run())
+    assert 40 <= deadline.stages["slow"] < 500
+    assert deadline.expired()
+
+
+def test_scheduler_does_not_retry_past_the_deadline():
+    """Test that a retry whose backoff would outlast the deadline is not attempted."""
+    scheduler = ProviderScheduler("test_deadline", max_retries=4, backoff_base_seconds=5)
+    fn = AsyncMock(side_effect=Overloaded("busy"))
+    
+    with patch("app.services.llm_scheduler.random.uniform", lambda low, high: high):
+        with pytest.raises(DeadlineExceeded):
+            asyncio.run(scheduler.call(fn, deadline=Deadline(1)))
+    assert fn.await_count == 1
+
+
+def _service_with_store():
+    """Create a QA service with a mocked two-model cascade and a vector store returning the sample chunks."""
+    with patch("app.services.question_answering.settings.LLM_CASCADE_MODELS", "small,large"):
+        service = QuestionAnsweringService()
+    for tier, answer in zip(service.tiers, ["Maybe forty days of leniency.", "Thirty days of grace."]):
+        tier.chain = AsyncMock()
+        tier.chain.ainvoke.return_value = {"output_text": answer}
+    vector_store = AsyncMock()
+    vector_store.asimilarity_search.return_value = [
+        Document(page_content=chunk, metadata={"source": "policy.pdf"}) for chunk in CHUNKS
+    ]
+    return service, vector_store
+
+
+def test_near_deadline_uses_smaller_k_and_does_not_escalate():
+    """Test that a tight budget retrieves fewer chunks and keeps the cheap model's answer."""
+    service, vector_store = _service_with_store()
+    deadline = Deadline(5)
+    
+    with patch("app.services.question_answering.settings.EXTRACTIVE_CONFIDENCE_THRESHOLD", 1.0):
+        result = asyncio.run(service.answer_question(vector_store, "How long is the grace period?", deadline))
+    
+    assert result["answer"] == "Maybe forty days of leniency."
+    assert result["model"] == "small"
+    assert not result["partial"]
+    assert vector_store.asimilarity_search.await_args.kwargs["k"] == 2
+    service.tiers[1].chain.ainvoke.assert_not_called()
+    assert deadline.degradations == ["reduced_k", "no_escalation"]
+
+
+def test_no_time_for_llm_returns_partial_extractive_answer():
+    """Test that without time for the LLM the best extractive candidate is returned as partial."""
+    service, vector_store = _service_with_store()
+    
+    with patch("app.services.question_answering.settings.EXTRACTIVE_CONFIDENCE_THRESHOLD", 1.0):
+        result = asyncio.run(service.answer_question(vector_store, "How long is the grace period?", Deadline(1)))
+    
+    assert result["partial"]
+    assert result["method"] == "extractive"
+    assert result["answer"] == CHUNKS[0]
+    service.tiers[0].chain.ainvoke.assert_not_called()
+
+
+def test_llm_cut_off_by_deadline_returns_partial_answer():
+    """Test that an LLM call running past the deadline yields a partial answer."""
+    service, vector_store = _service_with_store()
+    
+    async def slow_answer(inputs):
+        await asyncio.sleep(1)
+    
+    service.tiers[0].chain.ainvoke.side_effect = slow_answer
+    
+    with patch("app.services.question_answering.settings.EXTRACTIVE_ANSWERS_ENABLED", False), \
+            patch("app.services.question_answering.settings.QA_MIN_LLM_SECONDS", 0), \
+            patch("app.services.question_answering.settings.QA_DEGRADE_BELOW_SECONDS", 0):
+        result = asyncio.run(service.answer_question(vector_store, "Is maternity covered?", Deadline(0.1)))
+    
+    assert result["partial"]
+    assert result["answer"] == PARTIAL_ANSWER_TEXT
+    assert result["confidence"] == 0
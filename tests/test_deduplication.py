@@ -0,0 +1,166 @@
+"""Tests for boilerplate removal and near-duplicate chunk elimination."""
+
+import asyncio
+from unittest.mock import patch
+
+import numpy as np
+from langchain.docstore.document import Document
+
+from app.core.config import settings
+from app.services.deduplication import MinHasher, deduplicate_chunks, find_duplicates, strip_repeated_lines
+from app.services.document_processor import DocumentProcessor
+from app.services.embedding_providers import HashingEmbeddings
+from app.services.index_registry import IndexShard, _summarize, merge_shards
+from app.services.vector_store import VectorStoreService
+
+WAR_EXCLUSION = (
+    "The Company shall not be liable to make any payment under this Policy in respect of any expenses "
+    "whatsoever incurred by any Insured Person in connection with or in respect of war, invasion, act of "
+    "foreign enemy, hostilities, civil war, rebellion, revolution or usurped power."
+)
+
+
+def test_minhash_finds_near_duplicates():
+    """Test that lightly edited copies match the earliest copy and unrelated text does not."""
+    signatures = MinHasher().signatures([
+        WAR_EXCLUSION,
+        "Cataract surgery is covered after a waiting period of two years from the first policy inception.",
+        WAR_EXCLUSION.replace("usurped power.", "usurped power of any kind."),
+        WAR_EXCLUSION.upper(),
+    ])
+    
+    assert find_duplicates([signatures[:2], signatures[2:]], threshold=0.8) == {2: 0, 3: 0}
+
+
+def test_clauses_differing_in_their_figures_are_not_duplicates():
+    """Test that clauses stating different numbers are kept apart however similar their wording."""
+    template = (
+        "Expenses related to the treatment of a pre-existing disease and its direct complications shall be "
+        "excluded until the expiry of {} months of continuous coverage after the date of inception of the "
+        "first policy with the Company. In case of enhancement of the sum insured, the exclusion shall apply "
+        "afresh to the extent of the sum insured increase. If the Insured Person is continuously covered "
+        "without any break as defined under the portability norms of the extant IRDAI regulations, the "
+        "waiting period for the same would be reduced to the extent of prior coverage."
+    )
+    chunks = [
+        Document(page_content=template.format(number), metadata={"source": "policy.pdf", "page": page})
+        for page, number in enumerate(["24", "48", "thirty six", "24"], start=1)
+    ]
+    hasher = MinHasher()
+    signatures = hasher.signatures([chunk.page_content for chunk in chunks])
+    threshold = settings.DEDUP_SIMILARITY_THRESHOLD
+    
+    # The shingles alone match above the threshold
+    assert np.mean(signatures[0, :-1] == signatures[1, :-1]) >= threshold
+    assert find_duplicates([signatures[:2], signatures[2:]], threshold) == {3: 0}
+    
+    kept = deduplicate_chunks(chunks, hasher, threshold)
+    
+    assert [chunk.page_content for chunk in kept] == [chunk.page_content for chunk in chunks[:3]]
+    assert kept[0].metadata["duplicates"] == [{"source": "policy.pdf", "page": 4}]
+
+
+def test_negated_clauses_are_not_duplicates():
+    """Test that a clause and its negation or exclusion are kept apart however similar their wording."""
+    template = (
+        "Medical expenses incurred for the treatment of the Insured Person during the period of "
+        "hospitalisation for the donation of an organ by a donor to the Insured Person are {} under this "
+        "policy, provided that the organ donated is for the use of the Insured Person and the organ donor "
+        "has been certified in accordance with the Transplantation of Human Organs Act and other applicable "
+        "laws and rules. The claim for the recipient must be admissible under the policy, and pre and post "
+        "hospitalisation expenses of the donor and the cost of acquiring the organ are payable as per the "
+        "terms of the policy schedule."
+    )
+    chunks = [
+        Document(page_content=template.format(wording), metadata={"source": "policy.pdf", "page": page})
+        for page, wording in enumerate(["covered", "not covered", "excluded", "covered"], start=1)
+    ]
+    hasher = MinHasher()
+    signatures = hasher.signatures([chunk.page_content for chunk in chunks])
+    threshold = settings.DEDUP_SIMILARITY_THRESHOLD
+    
+    # The shingles alone match above the threshold
+    assert np.mean(signatures[0, :-1] == signatures[1, :-1]) >= threshold
+    assert np.mean(signatures[0, :-1] == signatures[2, :-1]) >= threshold
+    assert find_duplicates([signatures], threshold) == {3: 0}
+    
+    kept = deduplicate_chunks(chunks, hasher, threshold)
+    
+    assert [chunk.page_content for chunk in kept] == [chunk.page_content for chunk in chunks[:3]]
+
+
+def test_strip_repeated_lines_removes_headers_and_footers():
+    """Test that running headers and numbered footers are removed but body text is kept."""
+    bodies = [
+        "Room rent is capped.\nSee Section 4.\nIntensive care is covered.",
+        "Ambulance charges are covered.\nSee Section 4.\nAir ambulance is excluded.",
+        "Maternity is covered after two years.\nSee Section 4.\nNewborns are covered.",
+        "Claims are settled within thirty days.\nSee Section 4.\nDocuments are required.",
+    ]
+    pages = [
+        Document(
+            page_content=f"ACME Health Insurance - Policy Wording\n\n{body}\n\nPage {i} of 4",
+            metadata={"page": i},
+        )
+        for i, body in enumerate(bodies, start=1)
+    ]
+    
+    stripped = strip_repeated_lines(pages, min_fraction=0.5)
+    
+    assert [page.page_content for page in stripped] == bodies
+    assert stripped[0].metadata == {"page": 1}
+    assert strip_repeated_lines(pages[:2], min_fraction=0.5) == pages[:2]
+
+
+def test_duplicate_chunks_are_embedded_once():
+    """Test that a disclaimer repeated on every page becomes one chunk referencing each page."""
+    pages = [
+        Document(page_content=text, metadata={"page": page})
+        for page, text in enumerate([
+            "Room rent is limited to one percent of the sum insured per day.", WAR_EXCLUSION,
+            "Ambulance charges are covered up to two thousand rupees per hospitalisation.", WAR_EXCLUSION,
+            WAR_EXCLUSION.replace("usurped power.", "usurped power of any kind."),
+        ])
+    ]
+    
+    with patch.object(settings, "DEDUP_ENABLED", True):
+        chunks = DocumentProcessor()._split_documents(pages, "policy.pdf", None)
+    
+    assert len(chunks) == 3
+    assert chunks[1]["metadata"]["page"] == 1
+    assert chunks[1]["metadata"]["duplicates"] == [
+        {"source": "policy.pdf", "page": 3}, {"source": "policy.pdf", "page": 4},
+    ]
+    assert "duplicates" not in chunks[0]["metadata"]
+
+
+def _shard(source, texts):
+    """Index a document with one section per chunk."""
+    service = VectorStoreService()
+    service.embeddings = HashingEmbeddings(128, max_workers=1)
+    vector_store = asyncio.run(service.create_vector_store([
+        {"page_content": text, "metadata": {"source": source, "section_id": str(i + 1)}}
+        for i, text in enumerate(texts)
+    ]))
+    with patch.object(settings, "DEDUP_ENABLED", True):
+        sections, signatures = _summarize(vector_store)
+    return service, IndexShard(source, None, vector_store, "", len(texts), sections, signatures)
+
+
+def test_merge_collapses_duplicates_across_documents():
+    """Test that a clause shared by two documents is searched once and references both."""
+    service, first = _shard("gold.pdf", ["Gold plan room rent is unlimited.", WAR_EXCLUSION])
+    _, second = _shard("silver.pdf", [WAR_EXCLUSION, "Silver plan room rent is capped at one percent."])
+    
+    retriever = merge_shards([first, second], service)
+    
+    merged = retriever.vector_store
+    documents = [merged.docstore.search(merged.index_to_docstore_id[row]) for row in range(merged.index.ntotal)]
+    assert [doc.metadata["source"] for doc in documents] == ["gold.pdf", "gold.pdf", "silver.pdf"]
+    assert documents[1].metadata["duplicates"] == [{"source": "silver.pdf", "section_id": "1"}]
+    assert [key for key in retriever.sections.keys] == [("gold.pdf", "1"), ("gold.pdf", "2"), ("silver.pdf", "2")]
+    assert [list(rows) for rows in retriever.sections.members] == [[0], [1], [2]]
+    
+    # The cached shards are shared with other requests and stay intact
+    assert second.vector_store.index.ntotal == 2
+    assert "duplicates" not in first.vector_store.docstore.search(first.vector_store.index_to_docstore_id[1]).metadata
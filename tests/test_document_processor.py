@@ -0,0 +1,65 @@
+"""Tests for the document processing service."""
+
+import asyncio
+import os
+from unittest.mock import MagicMock, patch
+
+from app.core.config import settings
+from app.services.document_processor import DocumentProcessor
+from app.utils.document_handlers.document_handler import DocumentHandler
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), "fixtures", "test_document.pdf")
+
+
+def _fake_response(path, content_type):
+    """Build a fake streaming response for the given file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    response = MagicMock()
+    response.headers = {"Content-Type": content_type}
+    response.iter_content.side_effect = lambda chunk_size: (
+        data[i:i + chunk_size] for i in range(0, len(data), chunk_size)
+    )
+    return response
+
+
+def _processor(storage_dir):
+    """Create a document processor storing documents in the given directory."""
+    processor = DocumentProcessor()
+    processor.document_handler = DocumentHandler(str(storage_dir))
+    return processor
+
+
+def test_in_memory_ingest_parses_without_writing_to_storage(tmp_path):
+    """Test that in-memory ingestion chunks a PDF without touching the storage directory."""
+    processor = _processor(tmp_path)
+    
+    with patch("requests.get", return_value=_fake_response(SAMPLE_PDF, "application/pdf")), \
+            patch.object(settings, "DOCUMENT_IN_MEMORY_INGEST", True), \
+            patch.object(settings, "DOCUMENT_PERSIST_RAW", False):
+        chunks = asyncio.run(processor.process_document_from_url("https://example.com/policy.pdf"))
+    
+    assert chunks
+    assert "National Insurance" in chunks[0]["page_content"]
+    assert chunks[0]["metadata"]["page"] == 0
+    assert chunks[0]["metadata"]["file_path"] is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_in_memory_ingest_persists_raw_file_in_background(tmp_path):
+    """Test that the raw download is written to storage when persistence is enabled."""
+    processor = _processor(tmp_path)
+    
+    async def run():
+        chunks = await processor.process_document_from_url("https://example.com/policy.pdf")
+        await asyncio.gather(*DocumentProcessor._persist_tasks)
+        return chunks
+    
+    with patch("requests.get", return_value=_fake_response(SAMPLE_PDF, "application/pdf")), \
+            patch.object(settings, "DOCUMENT_IN_MEMORY_INGEST", True), \
+            patch.object(settings, "DOCUMENT_PERSIST_RAW", True):
+        chunks = asyncio.run(run())
+    
+    file_path = chunks[0]["metadata"]["file_path"]
+    assert os.path.dirname(file_path) == str(tmp_path)
+    assert os.path.getsize(file_path) == os.path.getsize(SAMPLE_PDF)
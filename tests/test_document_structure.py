@@ -0,0 +1,182 @@
+"""Tests for structure detection and two-stage section retrieval."""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+from langchain.docstore.document import Document
+
+from app.core.config import settings
+from app.services.document_processor import DocumentProcessor
+from app.services.document_structure import detect_heading, split_sections
+from app.services.embedding_providers import HashingEmbeddings
+from app.services.hierarchical_retrieval import HierarchicalRetriever, SectionIndex
+from app.services.question_answering import QuestionAnsweringService
+from app.services.vector_store import VectorStoreService
+
+TOPICS = [
+    "grace period premium renewal", "cataract surgery waiting", "maternity newborn childbirth",
+    "organ donor transplant", "room rent intensive care", "ambulance transport emergency",
+    "ayush ayurveda homeopathy", "no claim discount bonus", "preventive health checkup",
+    "pre-existing disease declaration",
+]
+
+
+def test_detect_heading():
+    """Test recognition of numbered sections, keyword clauses and definitions."""
+    assert detect_heading("4.2 Grace Period applies to renewals") == detect_heading("4.2. Grace Period applies to renewals")
+    assert detect_heading("4.2 Grace Period").kind == "clause"
+    assert detect_heading("3. Exclusions").id == "3"
+    assert detect_heading("Article iv: Claims").id == "Article IV"
+    assert detect_heading("Article iv: Claims").title == "Claims"
+    assert detect_heading("SECTION 7 - Cancellation").kind == "section"
+    
+    definition = detect_heading('"Hospital" means any institution established for in-patient care')
+    assert (definition.id, definition.kind) == ("Definition: Hospital", "definition")
+    assert detect_heading("2.1 Accident shall mean a sudden, unforeseen event").id == "2.1"
+    
+    assert detect_heading("This means the insurer pays the claim.") is None
+    assert detect_heading("4 days of hospitalisation are required.") is None
+    assert detect_heading("The policy covers 3.5 lakh of expenses.") is None
+
+
+def test_cross_references_are_not_headings():
+    """Test that lines referring to a section, rather than opening one, are not headings."""
+    assert detect_heading("Section 2(a) of the Insurance Act, 1938 applies to this policy.") is None
+    assert detect_heading("Clause 3.1 above shall not apply to claims under this section.") is None
+    assert detect_heading("Part A of the proposal form must be signed by the proposer.") is None
+    assert detect_heading(
+        "Section 3.1.12 (Doctor's Home Visit and Nursing Care).",
+        "Home visit charges, except to the extent provided for under",
+    ) is None
+    assert detect_heading("Section 3 Exclusions", "The insurer pays the claim.").id == "Section 3"
+
+
+def test_list_items_are_nested_under_their_heading():
+    """Test that numbered list items take the id of the heading they fall under."""
+    pages = [Document(page_content="\n".join([
+        "3.1.15 Infertility",
+        "Expenses for the following are covered:",
+        "1. Diagnostic tests for infertility",
+        "2. Surgical treatment of the cause of infertility",
+        "4. General Exclusions",
+        "4.6 Obesity treatment",
+        "Treatment is covered only if:",
+        "1) Surgery is advised by a doctor",
+        "2) The insured is over 18 years of age",
+        "5. CLAIM PROCEDURE",
+        "Claims must be notified promptly.",
+    ]), metadata={"page": 0})]
+    
+    parts = split_sections(pages)
+    
+    assert [part.metadata["section_id"] for part in parts] == [
+        "3.1.15", "3.1.15(1)", "3.1.15(2)", "4", "4.6", "4.6(1)", "4.6(2)", "5",
+    ]
+    assert parts[1].metadata["section_kind"] == "item"
+    assert detect_heading("2. Surgical treatment", parent=detect_heading("3.1.15 Infertility")).id == "3.1.15(2)"
+
+
+def test_sections_continue_across_pages():
+    """Test that a section running over a page break keeps its label on the next page."""
+    pages = [
+        Document(page_content="Preamble text.\nSection 1 Cover\nWe pay for hospitalisation.", metadata={"page": 0}),
+        Document(page_content="Continued cover text.\n1.1 Day Care\nDay care is covered.", metadata={"page": 1}),
+    ]
+    
+    parts = split_sections(pages)
+    
+    assert [(part.metadata.get("section_id"), part.metadata["page"]) for part in parts] == [
+        (None, 0), ("Section 1", 0), ("Section 1", 1), ("1.1", 1),
+    ]
+    assert parts[2].page_content == "Continued cover text."
+    assert parts[3].metadata["section_title"] == "Day Care"
+
+
+def test_chunks_do_not_straddle_sections():
+    """Test that chunking splits at headings and labels every chunk with its section."""
+    text = "\n".join(f"{i + 1}. {topic.title()}\n" + f"The {topic} benefit applies. " * 5 for i, topic in enumerate(TOPICS))
+    
+    with patch.object(settings, "DOCUMENT_STRUCTURE_ENABLED", True):
+        chunks = DocumentProcessor()._split_documents([Document(page_content=text)], "policy.pdf", None)
+    
+    assert len(chunks) == len(TOPICS)
+    for i, chunk in enumerate(chunks):
+        assert chunk["metadata"]["section_id"] == str(i + 1)
+        assert chunk["page_content"].count(TOPICS[i]) == 5
+
+
+def _store(source, topics, chunks_per_section=3):
+    """Index a document with one numbered section per topic."""
+    service = VectorStoreService()
+    service.embeddings = HashingEmbeddings(256, max_workers=1)
+    documents = [
+        {
+            "page_content": f"{topic} clause part {part}",
+            "metadata": {"source": source, "section_id": str(i + 1), "section_title": topic.title()},
+        }
+        for i, topic in enumerate(topics) for part in range(chunks_per_section)
+    ]
+    return service, asyncio.run(service.create_vector_store(documents))
+
+
+def test_two_stage_search_scores_only_top_sections():
+    """Test that the search is restricted to the best sections and finds the matching chunk."""
+    _, store = _store("policy.pdf", TOPICS)
+    sections = SectionIndex.build(store)
+    retriever = HierarchicalRetriever(store, sections, top_sections=2, min_sections=4)
+    
+    with patch.object(store.index, "search", side_effect=AssertionError("flat search")):
+        results = asyncio.run(retriever.asimilarity_search("cataract surgery waiting clause part 1", k=4))
+    
+    assert len(sections) == len(TOPICS)
+    assert results[0].page_content == "cataract surgery waiting clause part 1"
+    query = np.asarray(store.embeddings.embed_query("cataract surgery waiting clause part 1"))
+    top_sections = {sections.keys[i][1] for i in np.argsort(-(sections.vectors @ query))[:2]}
+    assert len(results) == 4
+    assert {doc.metadata["section_id"] for doc in results} == top_sections
+
+
+def test_few_sections_are_searched_flat():
+    """Test that documents with fewer sections than the minimum use the flat index."""
+    _, store = _store("policy.pdf", TOPICS[:3])
+    retriever = HierarchicalRetriever(store, SectionIndex.build(store), min_sections=8)
+    
+    results = asyncio.run(retriever.asimilarity_search("maternity newborn childbirth clause part 0", k=2))
+    
+    assert results[0].page_content == "maternity newborn childbirth clause part 0"
+
+
+def test_merged_section_index_maps_to_merged_rows():
+    """Test that merged section indexes point at the rows of the merged vector store."""
+    service, first = _store("a.pdf", TOPICS[:5])
+    _, second = _store("b.pdf", TOPICS[5:], chunks_per_section=2)
+    merged = service.merge_vector_stores([first, second])
+    
+    sections = SectionIndex.merge([SectionIndex.build(first), SectionIndex.build(second)],
+                                  [first.index.ntotal, second.index.ntotal])
+    
+    assert len(sections) == 10
+    for (source, section_id), rows in zip(sections.keys, sections.members):
+        for row in rows:
+            metadata = merged.docstore.search(merged.index_to_docstore_id[int(row)]).metadata
+            assert (metadata["source"], metadata["section_id"]) == (source, section_id)
+    assert SectionIndex.merge([SectionIndex.build(first), None], [15, 10]) is None
+
+
+def test_answers_carry_clause_identifiers():
+    """Test that answers list the sections of their source chunks once each, best match first."""
+    service = QuestionAnsweringService()
+    retriever = AsyncMock()
+    retriever.asimilarity_search.return_value = [
+        Document(page_content="A grace period of thirty days is provided for premium payment.",
+                 metadata={"source": "policy.pdf", "section_id": "4.2"}),
+        Document(page_content="Premium is payable annually.", metadata={"source": "policy.pdf", "section_id": "4"}),
+        Document(page_content="Renewal requires premium payment.", metadata={"source": "policy.pdf", "section_id": "4.2"}),
+        Document(page_content="Schedule of benefits.", metadata={"source": "schedule.docx"}),
+    ]
+    
+    result = asyncio.run(service.answer_question(retriever, "What is the grace period for premium payment?"))
+    
+    assert result["method"] == "extractive"
+    assert result["clauses"] == ["4.2", "4"]
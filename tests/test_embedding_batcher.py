@@ -0,0 +1,75 @@
+"""Tests for the cross-request embedding batcher."""
+
+import asyncio
+from typing import List
+
+from langchain.embeddings.base import Embeddings
+
+from app.services.embedding_batcher import BatchedEmbeddings, EmbeddingBatcher
+
+
+class RecordingEmbeddings(Embeddings):
+    """Fake provider that records each call and embeds a text as its length."""
+    
+    def __init__(self, fail: bool = False):
+        self.calls: List[List[str]] = []
+        self.fail = fail
+    
+    def embed_documents(self, texts):
+        return [[float(len(text))] for text in texts]
+    
+    def embed_query(self, text):
+        return [float(len(text))]
+    
+    async def aembed_documents(self, texts):
+        self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError("rate limited")
+        return self.embed_documents(texts)
+
+
+def test_concurrent_callers_share_one_provider_call():
+    """Test that concurrent requests are merged and results routed back to each caller."""
+    provider = RecordingEmbeddings()
+    embeddings = BatchedEmbeddings(EmbeddingBatcher(provider, max_batch_size=100, max_wait_ms=20))
+    
+    async def run():
+        return await asyncio.gather(
+            embeddings.aembed_documents(["a", "bb"]),
+            embeddings.aembed_query("ccc"),
+            embeddings.aembed_documents(["bb", "dddd"]),
+        )
+    
+    docs1, query, docs2 = asyncio.run(run())
+    
+    assert docs1 == [[1.0], [2.0]]
+    assert query == [3.0]
+    assert docs2 == [[2.0], [4.0]]
+    assert provider.calls == [["a", "bb", "ccc", "dddd"]]
+
+
+def test_batches_are_capped_at_max_batch_size():
+    """Test that a full batch is dispatched immediately and the rest after the deadline."""
+    provider = RecordingEmbeddings()
+    batcher = EmbeddingBatcher(provider, max_batch_size=3, max_wait_ms=5)
+    
+    async def run():
+        return await asyncio.gather(batcher.embed(["a", "b"]), batcher.embed(["c", "d", "e", "f"]))
+    
+    first, second = asyncio.run(run())
+    
+    assert first == [[1.0], [1.0]]
+    assert second == [[1.0]] * 4
+    assert [len(call) for call in provider.calls] == [3, 3]
+
+
+def test_provider_errors_reach_every_caller():
+    """Test that a failed provider call fails each request in the batch."""
+    batcher = EmbeddingBatcher(RecordingEmbeddings(fail=True), max_batch_size=10, max_wait_ms=1)
+    
+    async def run():
+        return await asyncio.gather(batcher.embed(["a"]), batcher.embed(["b"]), return_exceptions=True)
+    
+    results = asyncio.run(run())
+    
+    assert all(isinstance(result, RuntimeError) for result in results)
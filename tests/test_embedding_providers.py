@@ -0,0 +1,65 @@
+"""Tests for the embedding providers."""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services.embedding_providers import HashingEmbeddings, create_embeddings
+from app.services.vector_store import VectorStoreService
+
+
+@pytest.fixture
+def embeddings():
+    """Create a small hashing embeddings instance."""
+    return HashingEmbeddings(256, batch_size=2, max_workers=2)
+
+
+def test_hashing_embeddings_are_normalized_float32_in_input_order(embeddings):
+    """Test that batched output is float32, unit-length and in input order."""
+    texts = ["grace period of thirty days", "a", "waiting period for pre-existing diseases", ""]
+    
+    vectors = embeddings.embed_array(texts)
+    
+    assert vectors.dtype == np.float32
+    assert vectors.shape == (4, 256)
+    np.testing.assert_allclose(np.linalg.norm(vectors[:3], axis=1), 1.0, rtol=1e-5)
+    np.testing.assert_array_equal(vectors[3], 0)
+    np.testing.assert_allclose(vectors[0], embeddings.embed_array([texts[0]])[0])
+    assert asyncio.run(embeddings.aembed_query(texts[2])) == pytest.approx(vectors[2].tolist())
+
+
+def test_hashing_embeddings_rank_lexically_similar_text_higher(embeddings):
+    """Test that overlapping wording gives a higher similarity."""
+    query, related, unrelated = embeddings.embed_array([
+        "What is the grace period for premium payment?",
+        "A grace period of thirty days is allowed for premium payment.",
+        "Maternity expenses are covered after twenty-four months.",
+    ])
+    
+    assert query @ related > query @ unrelated
+
+
+def test_vector_store_indexes_local_embeddings(embeddings):
+    """Test that the vector store is built from local embeddings and can be searched."""
+    service = VectorStoreService()
+    service.embeddings = embeddings
+    chunks = [
+        {"page_content": "The grace period for premium payment is thirty days.", "metadata": {"page": 1}},
+        {"page_content": "Cataract surgery has a waiting period of two years.", "metadata": {"page": 2}},
+    ]
+    
+    async def run():
+        store = await service.create_vector_store(chunks)
+        return store, await service.similarity_search(store, "grace period premium", k=1)
+    
+    store, results = asyncio.run(run())
+    
+    assert store.index.ntotal == 2
+    assert results[0].metadata == {"page": 1}
+
+
+def test_unknown_provider_is_rejected():
+    """Test that an unknown provider name raises a ValueError."""
+    with pytest.raises(ValueError):
+        create_embeddings("word2vec")
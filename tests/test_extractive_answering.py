@@ -0,0 +1,135 @@
+"""Tests for extractive answering and the question answering fast path."""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from langchain.docstore.document import Document
+
+from app.core.config import settings
+from app.services.extractive_answering import ExtractiveAnswerer, grounding_score, split_sentences
+from app.services.question_answering import QuestionAnsweringService
+
+CHUNKS = [
+    "Premium shall be paid on or before the due date. A grace period of thirty days is provided "
+    "for premium payment after the due date to renew or continue the policy without losing "
+    "continuity benefits. Coverage is not available for the period for which no premium is received.",
+    "Expenses for cataract surgery are covered after a waiting period of two years from the first "
+    "policy inception.",
+]
+
+
+def test_split_sentences_drops_fragments():
+    """Test that chunks are split on sentence and list boundaries and short fragments are dropped."""
+    sentences = split_sentences("1. Definitions apply to this policy.\n2. Ok.\nThe insurer pays claims. Done")
+    
+    assert sentences == ["Definitions apply to this policy.", "The insurer pays claims."]
+
+
+def test_extractive_answer_is_confident_for_restated_question():
+    """Test that a sentence restating the question is found with high confidence."""
+    answer = ExtractiveAnswerer().answer("What is the grace period for premium payment?", CHUNKS)
+    
+    assert answer.text.startswith("A grace period of thirty days")
+    assert answer.chunk_index == 0
+    assert answer.confidence > 0.85
+
+
+def test_extractive_answer_is_unconfident_for_unrelated_question():
+    """Test that a question the chunks do not answer gets a low confidence."""
+    answer = ExtractiveAnswerer().answer("Does the policy cover maternity expenses for newborns?", CHUNKS)
+    
+    assert answer.confidence < 0.5
+
+
+def test_restatements_without_the_asked_for_answer_are_unconfident():
+    """Test that sentences deferring elsewhere or lacking the asked-for period do not pass as answers."""
+    answerer = ExtractiveAnswerer()
+    question = "What is the grace period for premium payment?"
+    
+    deferral = "The grace period for premium payment is described in Section 7 below."
+    assert answerer.answer(question, [deferral, CHUNKS[1]]).confidence < 0.5
+    assert answerer.answer(question, [deferral] + CHUNKS).text.startswith("A grace period of thirty days")
+    
+    vague = "The grace period for premium payment applies to annual policies only."
+    assert answerer.answer(question, [vague, CHUNKS[1]]).confidence < settings.EXTRACTIVE_CONFIDENCE_THRESHOLD
+
+
+def test_sentences_about_another_plan_are_unconfident():
+    """Test that a sentence answering for a different plan or option does not pass as the answer."""
+    answerer = ExtractiveAnswerer()
+    gold = "Under the Gold plan, the waiting period for pre-existing diseases is 48 months."
+    plan_b = "Under Plan B, the waiting period for pre-existing diseases is 48 months."
+    
+    for question, sentence in (
+        ("What is the waiting period for pre-existing diseases under the Silver plan?", gold),
+        ("What is the waiting period for pre-existing diseases under Plan A?", plan_b),
+    ):
+        answer = answerer.answer(question, [sentence, CHUNKS[1]])
+        assert answer.text == sentence
+        assert answer.overlap < 1
+        assert answer.confidence < settings.EXTRACTIVE_CONFIDENCE_THRESHOLD
+    
+    answer = answerer.answer("What is the waiting period for pre-existing diseases under Plan B?", [plan_b])
+    assert answer.confidence > settings.EXTRACTIVE_CONFIDENCE_THRESHOLD
+
+
+def test_grounding_score():
+    """Test that grounding measures the share of answer terms found in the context."""
+    assert grounding_score("A grace period of thirty days is provided.", CHUNKS) == 1.0
+    assert grounding_score("Maternity is covered after nine months.", CHUNKS) < 0.5
+    assert grounding_score("", CHUNKS) == 0.0
+
+
+def test_grounding_requires_one_passage_to_support_the_answer():
+    """Test that answers mixing passages, or with numbers or negations no passage states, are not grounded."""
+    threshold = settings.LLM_ESCALATION_THRESHOLD
+    assert grounding_score("Cataract surgery is covered after two years.", CHUNKS) == 1.0
+    assert grounding_score("Cataract surgery is covered after 2 years.", CHUNKS) == 1.0
+    
+    # "Thirty days" belongs to the grace period passage
+    assert grounding_score("The waiting period for cataract surgery is thirty days.", CHUNKS) < threshold
+    assert grounding_score("The waiting period for cataract surgery is 5 years.", CHUNKS) < threshold
+    assert grounding_score("The waiting period for cataract surgery is 48 months.", CHUNKS) < threshold
+    assert grounding_score("Cataract surgery is not covered.", CHUNKS) < threshold
+    assert grounding_score("Coverage is not available without premium.", CHUNKS) == 1.0
+
+
+def _service_with_store():
+    """Create a QA service and a vector store returning the sample chunks."""
+    service = QuestionAnsweringService()
+    for tier in service.tiers:
+        tier.chain = AsyncMock()
+        tier.chain.ainvoke.return_value = {"output_text": "Maternity expenses are covered after two years."}
+    vector_store = AsyncMock()
+    vector_store.asimilarity_search.return_value = [
+        Document(page_content=chunk, metadata={"source": "policy.pdf"}) for chunk in CHUNKS
+    ]
+    return service, vector_store
+
+
+def test_answer_question_skips_llm_when_confident():
+    """Test that a confident extractive answer is returned without calling the LLM."""
+    service, vector_store = _service_with_store()
+    
+    result = asyncio.run(service.answer_question(vector_store, "What is the grace period for premium payment?"))
+    
+    assert result["method"] == "extractive"
+    assert "thirty days" in result["answer"]
+    assert result["sources"] == ["policy.pdf", "policy.pdf"]
+    for tier in service.tiers:
+        tier.chain.ainvoke.assert_not_called()
+
+
+def test_answer_question_falls_back_to_llm():
+    """Test that the LLM answers low-confidence questions and is scored by grounding."""
+    service, vector_store = _service_with_store()
+    
+    with patch("app.services.question_answering.settings.EXTRACTIVE_CONFIDENCE_THRESHOLD", 0.99), \
+            patch("app.services.question_answering.settings.LLM_ESCALATION_THRESHOLD", 0):
+        result = asyncio.run(service.answer_question(vector_store, "Is maternity covered?"))
+    
+    assert result["method"] == "llm"
+    assert result["model"] == service.tiers[0].model
+    assert result["answer"] == "Maternity expenses are covered after two years."
+    assert 0 < result["confidence"] < 1
+    service.tiers[0].chain.ainvoke.assert_awaited_once()
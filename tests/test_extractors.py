@@ -0,0 +1,59 @@
+"""Tests for the native DOCX and email extractors."""
+
+import io
+
+import pytest
+
+from app.utils.document_handlers.docx_extractor import extract_docx_text
+from app.utils.document_handlers.email_extractor import extract_email_text, parse_email
+from benchmarks.samples import make_docx, make_email
+
+
+def test_extract_docx_text_keeps_paragraphs_and_tables():
+    """Test that paragraphs and table rows are kept on separate lines."""
+    data = make_docx(
+        ["1. Definitions", "Grace period means thirty days."],
+        [[["Benefit", "Limit"], ["Ambulance", "2,000 INR"]]],
+    )
+    
+    text = extract_docx_text(io.BytesIO(data))
+    
+    assert text.splitlines() == [
+        "1. Definitions",
+        "Grace period means thirty days.",
+        "",
+        "Benefit | Limit",
+        "Ambulance | 2,000 INR",
+    ]
+
+
+def test_extract_docx_text_rejects_non_docx():
+    """Test that invalid input raises a ValueError."""
+    with pytest.raises(ValueError):
+        extract_docx_text(io.BytesIO(b"not a zip file"))
+
+
+def test_parse_email_prefers_plain_body_and_reads_docx_attachment():
+    """Test that the plain body is used and attachment text is extracted."""
+    attachment = make_docx(["Schedule of benefits"])
+    
+    message = parse_email(make_email(2, attachment=attachment))
+    
+    assert message.subject == "Policy renewal"
+    assert message.sender == "claims@example.com"
+    assert "<p>" not in message.body
+    assert message.body.count("grace period of thirty days") == 2
+    assert [a.filename for a in message.attachments] == ["schedule.docx"]
+    assert message.attachments[0].text == "Schedule of benefits"
+    assert "Attachment: schedule.docx" in extract_email_text(make_email(1, attachment=attachment))
+
+
+def test_parse_email_falls_back_to_html_body():
+    """Test that an HTML-only email is converted to text."""
+    raw = (
+        b"Subject: Claim\r\nFrom: a@example.com\r\nTo: b@example.com\r\n"
+        b"Content-Type: text/html; charset=utf-8\r\n\r\n"
+        b"<html><head><style>p {}</style></head><body><p>Claim approved.</p><p>Ref 42</p></body></html>"
+    )
+    
+    assert parse_email(raw).body == "Claim approved.\nRef 42"
@@ -19,8 +19,8 @@ def client():
 @pytest.fixture
 def mock_document_processor():
     """Mock the DocumentProcessor service."""
-    with patch.object(DocumentProcessor, "process_document_from_url") as mock:
-        # Mock return value for process_document_from_url
+    with patch.object(DocumentProcessor, "process_versioned_document") as mock:
+        # Mock return value for process_versioned_document
         mock.return_value = [
             {
                 "page_content": "This policy has a grace period of thirty days for premium payment.",
@@ -30,7 +30,7 @@ def mock_document_processor():
                 "page_content": "The waiting period for pre-existing diseases is thirty-six months.",
                 "metadata": {"source": "test_document.pdf", "page": 2}
             }
-        ]
+        ], '"v1"'
         yield mock
 
 
@@ -41,7 +41,9 @@ def mock_vector_store():
         mock_vector_store = MagicMock()
         mock_create.return_value = mock_vector_store
         
-        with patch.object(VectorStoreService, "save_vector_store") as mock_save:
+        with patch.object(VectorStoreService, "save_vector_store") as mock_save, \
+                patch("app.services.index_registry._summarize", return_value=(None, None)), \
+                patch("app.services.index_registry._write_version"):
             mock_save.return_value = "/tmp/test_index"
             yield mock_create, mock_vector_store, mock_save
 
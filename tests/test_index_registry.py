@@ -0,0 +1,238 @@
+"""Tests for per-document index shards."""
+
+import asyncio
+import fcntl
+import os
+from unittest.mock import patch
+
+import pytest
+
+from app.core.deadline import Deadline, DeadlineExceeded
+from app.services.embedding_providers import HashingEmbeddings
+from app.services.index_registry import IndexRegistry, shard_key
+from app.services.vector_store import VectorStoreService
+
+DOCUMENTS = {
+    "https://example.com/a.pdf": "The grace period for premium payment is thirty days.",
+    "https://example.com/b.pdf": "Cataract surgery has a waiting period of two years.",
+}
+
+
+class FakeProcessor:
+    """Document processor returning one chunk per URL and counting downloads and version checks."""
+    
+    def __init__(self, delays=None, versions=None):
+        self.calls = []
+        self.checks = []
+        self.delays = delays or {}
+        self.versions = versions or {}
+    
+    async def document_version(self, url, known_version=None, deadline=None):
+        self.checks.append(url)
+        return self.versions.get(url, '"v1"')
+    
+    async def process_versioned_document(self, url, deadline=None):
+        self.calls.append(url)
+        await asyncio.sleep(self.delays.get(url, 0.01))
+        return [{"page_content": DOCUMENTS[url], "metadata": {"source": url}}], self.versions.get(url, '"v1"')
+
+
+@pytest.fixture
+def vector_store_service(tmp_path):
+    """Create a vector store service with local embeddings and a temporary storage directory."""
+    service = VectorStoreService()
+    service.embeddings = HashingEmbeddings(128, max_workers=1)
+    with patch("app.services.vector_store.settings.DOCUMENT_STORAGE_PATH", str(tmp_path)):
+        yield service
+
+
+def test_shard_key_depends_on_url_and_provider():
+    """Test that shards are keyed by both document and embedding provider."""
+    assert shard_key("https://example.com/a.pdf", "openai") == shard_key("https://example.com/a.pdf", "openai")
+    assert shard_key("https://example.com/a.pdf", "openai") != shard_key("https://example.com/b.pdf", "openai")
+    assert shard_key("https://example.com/a.pdf", "openai") != shard_key("https://example.com/a.pdf", "hashing:128")
+
+
+def test_shard_key_depends_on_chunking_settings():
+    """Test that shards chunked with different settings are kept apart."""
+    key = shard_key("https://example.com/a.pdf", "openai")
+    
+    with patch("app.services.index_registry.settings.DEDUP_ENABLED", False):
+        assert shard_key("https://example.com/a.pdf", "openai") != key
+    with patch("app.services.index_registry.settings.DOCUMENT_STRUCTURE_ENABLED", False):
+        assert shard_key("https://example.com/a.pdf", "openai") != key
+
+
+def test_reissued_documents_are_rebuilt(vector_store_service):
+    """Test that cached shards are revalidated and rebuilt once their document changes."""
+    a, _ = DOCUMENTS
+    registry = IndexRegistry()
+    processor = FakeProcessor()
+    
+    async def run():
+        first = await registry.get_shard(a, processor, vector_store_service)
+        cached = await registry.get_shard(a, processor, vector_store_service)
+        with patch("app.services.index_registry.settings.INDEX_SHARD_REVALIDATE_SECONDS", 0):
+            unchanged = await registry.get_shard(a, processor, vector_store_service)
+            processor.versions[a] = '"v2"'
+            reissued = await registry.get_shard(a, processor, vector_store_service)
+        return first, cached, unchanged, reissued
+    
+    first, cached, unchanged, reissued = asyncio.run(run())
+    
+    assert cached is first and unchanged is first
+    # Builds take the version from their download; only revalidations check it
+    assert processor.checks == [a, a]
+    assert processor.calls == [a, a]
+    assert reissued is not first and reissued.version == '"v2"'
+    
+    # A new registry loads the rebuilt shard from disk and knows its version
+    processor = FakeProcessor(versions={a: '"v2"'})
+    assert asyncio.run(IndexRegistry().get_shard(a, processor, vector_store_service)).version == '"v2"'
+    assert processor.calls == []
+
+
+def test_concurrent_requests_build_each_shard_once(vector_store_service):
+    """Test that overlapping requests share builds and reuse cached shards."""
+    registry = IndexRegistry()
+    processor = FakeProcessor()
+    urls = list(DOCUMENTS)
+    
+    async def run():
+        first, second = await asyncio.gather(
+            registry.get_shards(urls + urls[:1], processor, vector_store_service),
+            registry.get_shards(urls[1:], processor, vector_store_service),
+        )
+        third = await registry.get_shards(urls, processor, vector_store_service)
+        return first, second, third
+    
+    first, second, third = asyncio.run(run())
+    
+    assert sorted(processor.calls) == urls
+    assert [shard.url for shard in first] == urls
+    assert second[0] is first[1]
+    assert [shard.vector_store for shard in third] == [shard.vector_store for shard in first]
+
+
+def test_shards_are_loaded_from_disk_by_a_new_registry(vector_store_service):
+    """Test that saved shards are reused without downloading the document again."""
+    asyncio.run(IndexRegistry().get_shards(list(DOCUMENTS), FakeProcessor(), vector_store_service))
+    processor = FakeProcessor()
+    
+    shards = asyncio.run(IndexRegistry().get_shards(list(DOCUMENTS), processor, vector_store_service))
+    
+    assert processor.calls == []
+    assert [shard.chunk_count for shard in shards] == [1, 1]
+
+
+def test_merged_view_searches_all_shards_without_modifying_them(vector_store_service):
+    """Test that the merged store covers every document and leaves the shards intact."""
+    shards = asyncio.run(IndexRegistry().get_shards(list(DOCUMENTS), FakeProcessor(), vector_store_service))
+    
+    merged = vector_store_service.merge_vector_stores([shard.vector_store for shard in shards])
+    
+    assert merged.index.ntotal == 2
+    assert [shard.vector_store.index.ntotal for shard in shards] == [1, 1]
+    result = asyncio.run(merged.asimilarity_search("waiting period for cataract surgery", k=1))
+    assert result[0].metadata["source"] == "https://example.com/b.pdf"
+
+
+def test_least_recently_used_shards_are_dropped_from_memory(vector_store_service):
+    """Test that the in-memory cache is bounded and evicted shards are reloaded from disk."""
+    registry = IndexRegistry(max_cached_shards=1)
+    processor = FakeProcessor()
+    a, b = DOCUMENTS
+    
+    async def run():
+        await registry.get_shard(a, processor, vector_store_service)
+        await registry.get_shard(b, processor, vector_store_service)
+        return await registry.get_shard(a, processor, vector_store_service)
+    
+    shard = asyncio.run(run())
+    
+    assert processor.calls == [a, b]
+    assert shard.url == a
+    assert list(registry._shards) == [shard.key]
+
+
+def test_preload_loads_saved_shards_memory_mapped(vector_store_service):
+    """Test that preloading serves saved shards from memory-mapped indices without rebuilding."""
+    asyncio.run(IndexRegistry().get_shards(list(DOCUMENTS), FakeProcessor(), vector_store_service))
+    registry = IndexRegistry()
+    processor = FakeProcessor()
+    
+    with patch("app.services.vector_store.settings.VECTOR_STORE_MMAP", True):
+        assert asyncio.run(registry.preload(vector_store_service)) == 2
+    shard = asyncio.run(registry.get_shard("https://example.com/b.pdf", processor, vector_store_service))
+    
+    assert processor.calls == []
+    result = asyncio.run(shard.vector_store.asimilarity_search("cataract surgery", k=1))
+    assert result[0].page_content == DOCUMENTS["https://example.com/b.pdf"]
+
+
+def test_preloaded_shards_are_retained_by_workers_only(vector_store_service):
+    """Test that preloading leaves shards evictable until a worker retains them."""
+    builder = IndexRegistry()
+    asyncio.run(builder.get_shards(list(DOCUMENTS), FakeProcessor(), vector_store_service))
+    builder.clear()
+    registry = IndexRegistry()
+    asyncio.run(registry.preload(vector_store_service))
+    paths = [shard.path for shard in registry._shards.values()]
+    
+    def evictable(path):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+        finally:
+            os.close(fd)
+    
+    assert len(paths) == 2 and all(evictable(path) for path in paths)
+    registry.retain_cached()
+    assert not any(evictable(path) for path in paths)
+    registry.clear()
+    assert all(evictable(path) for path in paths)
+
+
+def test_memory_mapped_shards_can_be_merged(vector_store_service):
+    """Test that merging shards loaded from memory-mapped files copies them instead of aborting."""
+    asyncio.run(IndexRegistry().get_shards(list(DOCUMENTS), FakeProcessor(), vector_store_service))
+    
+    with patch("app.services.vector_store.settings.VECTOR_STORE_MMAP", True):
+        shards = asyncio.run(IndexRegistry().get_shards(list(DOCUMENTS), FakeProcessor(), vector_store_service))
+    merged = vector_store_service.merge_vector_stores([shard.vector_store for shard in shards])
+    
+    assert merged.index.ntotal == 2
+    assert [shard.vector_store.index.ntotal for shard in shards] == [1, 1]
+
+
+def test_documents_not_ready_by_the_deadline_are_skipped(vector_store_service):
+    """Test that a slow document is left out while its build carries on for later requests."""
+    registry = IndexRegistry()
+    a, b = DOCUMENTS
+    processor = FakeProcessor(delays={b: 0.5})
+    
+    async def run():
+        deadline = Deadline(0.2)
+        shards = await registry.get_shards([a, b], processor, vector_store_service, deadline=deadline)
+        await asyncio.sleep(0.5)
+        return deadline, shards, await registry.get_shard(b, processor, vector_store_service)
+    
+    deadline, shards, later = asyncio.run(run())
+    
+    assert [shard.url for shard in shards] == [a]
+    assert deadline.degradations == ["documents_skipped"]
+    assert later.url == b
+    assert processor.calls == [a, b]
+
+
+def test_no_document_ready_by_the_deadline_raises(vector_store_service):
+    """Test that a request fails when none of its documents can be indexed in time."""
+    processor = FakeProcessor(delays={url: 0.5 for url in DOCUMENTS})
+    
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(IndexRegistry().get_shards(
+            list(DOCUMENTS), processor, vector_store_service, deadline=Deadline(0.05)
+        ))
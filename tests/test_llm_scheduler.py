@@ -0,0 +1,151 @@
+"""Tests for the provider scheduler against a local stand-in server."""
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from app.services.llm_scheduler import ProviderScheduler, ProviderUnavailableError, TokenBucket
+
+
+class StandInServer:
+    """Local HTTP server that fails the first requests and delays selected ones."""
+    
+    def __init__(self, failures=0, status=429, delays=None):
+        self.failures = failures
+        self.status = status
+        self.delays = delays or {}
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                with server._lock:
+                    server.requests += 1
+                    number = server.requests
+                time.sleep(server.delays.get(number, 0))
+                code = server.status if number <= server.failures else 200
+                body = b'{"ok": true}'
+                self.send_response(code)
+                self.send_header("Content-Length", str(len(body)))
+                if code == 429:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, *args):
+                pass
+        
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1/chat/completions"
+    
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+    
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _call(url):
+    """Return a function making one request to the stand-in server."""
+    async def request():
+        async with httpx.AsyncClient() as client:
+            response = await client.post(url, json={})
+            response.raise_for_status()
+            return response.json()
+    return request
+
+
+def test_retries_rate_limited_calls_and_backs_off_concurrency():
+    """Test that 429s are retried and cut the concurrency limit."""
+    scheduler = ProviderScheduler("test_retry", max_concurrency=8, max_retries=3,
+                                  backoff_base_seconds=0.01)
+    
+    with StandInServer(failures=2) as server:
+        result = asyncio.run(scheduler.call(_call(server.url)))
+    
+    assert result == {"ok": True}
+    assert server.requests == 3
+    assert scheduler.limiter.limit < 8
+
+
+def test_gives_up_with_provider_unavailable_error():
+    """Test that persistent server errors surface as ProviderUnavailableError."""
+    scheduler = ProviderScheduler("test_give_up", max_retries=1, backoff_base_seconds=0.01)
+    
+    with StandInServer(failures=10, status=503) as server:
+        with pytest.raises(ProviderUnavailableError):
+            asyncio.run(scheduler.call(_call(server.url)))
+    
+    assert server.requests == 2
+
+
+def test_non_retryable_errors_are_raised_immediately():
+    """Test that client errors are not retried."""
+    scheduler = ProviderScheduler("test_client_error", max_retries=3)
+    
+    with StandInServer(failures=10, status=400) as server:
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(scheduler.call(_call(server.url)))
+    
+    assert server.requests == 1
+
+
+def test_hedged_request_beats_slow_primary():
+    """Test that a duplicate request is sent after the p95 delay and the faster one wins."""
+    scheduler = ProviderScheduler("test_hedge", hedge=True, hedge_min_samples=5)
+    for _ in range(5):
+        scheduler.latencies.add(20)
+    
+    with StandInServer(delays={1: 2.0}) as server:
+        start = time.monotonic()
+        result = asyncio.run(scheduler.call(_call(server.url)))
+        elapsed = time.monotonic() - start
+    
+    assert result == {"ok": True}
+    assert server.requests == 2
+    assert elapsed < 1.5
+
+
+def test_cancelled_caller_cancels_hedged_attempts():
+    """Test that cancelling the caller before the hedge delay also cancels the attempt in flight."""
+    scheduler = ProviderScheduler("test_hedge_cancel", hedge=True, hedge_min_samples=5)
+    for _ in range(5):
+        scheduler.latencies.add(1000)
+    attempts = []
+    
+    async def call():
+        attempts.append(asyncio.current_task())
+        await asyncio.sleep(10)
+    
+    async def run():
+        caller = asyncio.ensure_future(scheduler.call(call))
+        await asyncio.sleep(0.05)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+        # Checked before asyncio.run cancels whatever is left over
+        assert len(attempts) == 1 and attempts[0].cancelled()
+    
+    asyncio.run(run())
+
+
+def test_token_bucket_limits_rate():
+    """Test that the bucket spaces out requests beyond its burst capacity."""
+    bucket = TokenBucket(per_minute=1200, capacity=1)
+    
+    async def run():
+        for _ in range(4):
+            await bucket.acquire()
+    
+    start = time.monotonic()
+    asyncio.run(run())
+    
+    assert time.monotonic() - start >= 0.14
@@ -0,0 +1,125 @@
+"""Tests for the load test tooling."""
+
+import asyncio
+
+import httpx
+import numpy as np
+import openai
+import pytest
+
+from loadtest import document_server, fake_openai
+from loadtest.faults import FaultProfile
+from loadtest.runner import RequestResult, percentile, run_open_loop
+from loadtest.workload import WorkloadItem
+
+
+def _client(app) -> openai.AsyncOpenAI:
+    """Create an OpenAI client talking to an ASGI app in-process."""
+    return openai.AsyncOpenAI(
+        api_key="test",
+        base_url="http://fake/v1",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app)),
+    )
+
+
+def test_fake_openai_serves_embeddings_and_answers():
+    """Test that the OpenAI client accepts the fake server's embeddings and chat completions."""
+    client = _client(fake_openai.create_app(FaultProfile(), FaultProfile(), dimension=64))
+    
+    async def run():
+        embeddings = await client.embeddings.create(model="text-embedding-ada-002", input=["grace period", "claims"])
+        completion = await client.chat.completions.create(model="gpt-3.5-turbo", messages=[
+            {"role": "system", "content": "Use the context. Claims are settled within thirty days of the "
+                                          "last document. Cataract surgery is covered after two years."},
+            {"role": "user", "content": "When is cataract surgery covered?"},
+        ])
+        return embeddings, completion
+    
+    embeddings, completion = asyncio.run(run())
+    
+    vectors = np.array([item.embedding for item in embeddings.data])
+    assert vectors.shape == (2, 64)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1, atol=1e-5)
+    assert completion.choices[0].message.content == "Cataract surgery is covered after two years."
+
+
+def test_fault_profile_injects_errors():
+    """Test that injected failures and rate limits reach the client with the OpenAI error format."""
+    failing = _client(fake_openai.create_app(FaultProfile(error_rate=1), FaultProfile(rate_limit_rate=1)))
+    
+    with pytest.raises(openai.InternalServerError):
+        asyncio.run(failing.chat.completions.create(model="gpt-4", messages=[{"role": "user", "content": "hi"}]))
+    with pytest.raises(openai.RateLimitError) as error:
+        asyncio.run(failing.embeddings.create(model="text-embedding-ada-002", input=["hi"]))
+    assert error.value.response.headers["Retry-After"] == "1"
+
+
+def test_document_server_serves_byte_ranges():
+    """Test that the document server answers range requests like an object store."""
+    app = document_server.create_app({"a.pdf": bytes(range(100))}, FaultProfile())
+    
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://docs") as client:
+            return (
+                await client.get("/documents/a.pdf"),
+                await client.get("/documents/a.pdf", headers={"Range": "bytes=10-19"}),
+                await client.get("/documents/a.pdf", headers={"Range": "bytes=200-"}),
+            )
+    
+    whole, part, unsatisfiable = asyncio.run(run())
+    assert whole.headers["Accept-Ranges"] == "bytes"
+    assert (part.status_code, part.content) == (206, bytes(range(10, 20)))
+    assert part.headers["Content-Range"] == "bytes 10-19/100"
+    assert unsatisfiable.status_code == 416
+
+
+def test_fault_profile_parse_and_latency():
+    """Test parsing of fault specifications and the log-normal latency median."""
+    profile = FaultProfile.parse("median_ms=100, sigma=0.5,error_rate=0.1", seed=3)
+    
+    latencies = sorted(profile.sample_latency() for _ in range(2001))
+    assert latencies[1000] == pytest.approx(0.1, rel=0.1)
+    assert profile.error_rate == 0.1
+    with pytest.raises(ValueError):
+        FaultProfile.parse("median=100")
+
+
+def test_workload_item_builds_requests():
+    """Test that document names resolve against the document server and requests are validated."""
+    item = WorkloadItem("hackrx", ["a.pdf", "https://example.com/b.pdf"], ["Q?"])
+    
+    assert item.request("http://docs/documents/") == ("/api/v1/hackrx/run", {
+        "documents": ["http://docs/documents/a.pdf", "https://example.com/b.pdf"], "questions": ["Q?"],
+    })
+    assert WorkloadItem("download", ["a.pdf"]).request("http://docs")[1] == {"url": "http://docs/a.pdf"}
+    with pytest.raises(ValueError):
+        WorkloadItem("hackrx", ["a.pdf"])
+
+
+def test_open_loop_keeps_arriving_while_requests_are_slow():
+    """Test that arrivals follow the target rate regardless of latency, and excess ones are dropped."""
+    items = [WorkloadItem("download", ["a.pdf"])]
+    
+    async def slow_send(item):
+        await asyncio.sleep(0.2)
+        return RequestResult(item.endpoint, 200, 200.0)
+    
+    stats = asyncio.run(run_open_loop(slow_send, items, rate=100, duration=0.3, poisson=False))
+    summary = stats.summary()
+    assert summary["sent"] in (29, 30)
+    assert summary["peak_in_flight"] > 10
+    assert summary["error_rate"] == 0
+    
+    capped = asyncio.run(run_open_loop(slow_send, items, rate=100, duration=0.3, max_in_flight=5, poisson=False))
+    assert capped.dropped > 0
+    assert capped.summary()["succeeded"] + capped.dropped == capped.summary()["sent"]
+
+
+def test_percentile_uses_nearest_rank():
+    """Test percentiles of small samples."""
+    values = [10.0, 20.0, 30.0, 40.0]
+    
+    assert percentile(values, 0.5) == 20.0
+    assert percentile(values, 0.99) == 40.0
+    assert percentile([], 0.5) == 0.0
@@ -0,0 +1,100 @@
+"""Tests for the model cascade of the question answering service."""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from langchain.docstore.document import Document
+
+from app.core.metrics import metrics
+from app.services.question_answering import QuestionAnsweringService, answer_confidence, cascade_models
+
+CHUNKS = [
+    "A grace period of thirty days is provided for premium payment after the due date.",
+    "Expenses for cataract surgery are covered after a waiting period of two years.",
+]
+QUESTION = "What is the waiting period for cataract surgery?"
+
+
+def _service(answers):
+    """Create a QA service whose cascade models give the given answers, cheapest first."""
+    with patch("app.services.question_answering.settings.LLM_CASCADE_MODELS", "small, medium ,large"):
+        service = QuestionAnsweringService()
+    for tier in service.tiers:
+        tier.chain = AsyncMock()
+        tier.chain.ainvoke.return_value = {"output_text": answers[min(tier.level, len(answers) - 1)]}
+    vector_store = AsyncMock()
+    vector_store.asimilarity_search.return_value = [
+        Document(page_content=chunk, metadata={"source": "policy.pdf"}) for chunk in CHUNKS
+    ]
+    return service, vector_store
+
+
+def _ask(service, vector_store):
+    with patch("app.services.question_answering.settings.EXTRACTIVE_ANSWERS_ENABLED", False):
+        return asyncio.run(service.answer_question(vector_store, QUESTION))
+
+
+def test_cascade_models_are_parsed_cheapest_first():
+    """Test that the configured model list is split and stripped, and must not be empty."""
+    with patch("app.services.question_answering.settings.LLM_CASCADE_MODELS", " small, large ,"):
+        assert cascade_models() == ["small", "large"]
+    with patch("app.services.question_answering.settings.LLM_CASCADE_MODELS", " , "):
+        with pytest.raises(ValueError):
+            cascade_models()
+
+
+def test_answer_confidence_is_zero_when_the_model_cannot_answer():
+    """Test that answers saying the context is silent are not trusted even if they echo it."""
+    assert answer_confidence("Cataract surgery is covered after two years.", CHUNKS) == 1.0
+    assert answer_confidence("The waiting period for cataract surgery is not mentioned.", CHUNKS) == 0.0
+    for refusal in (
+        "I don't know.",
+        "The provided context does not mention the waiting period for cataract surgery.",
+        "The waiting period for cataract surgery cannot be determined from the documents.",
+        "The waiting period for cataract surgery is not specified in the given text.",
+        "There is no information about the waiting period for cataract surgery.",
+    ):
+        assert answer_confidence(refusal, CHUNKS) == 0.0, refusal
+
+
+def test_negative_answers_are_not_mistaken_for_refusals():
+    """Test that answers stating what the policy does not cover are scored on their grounding."""
+    chunks = ["The policy does not provide coverage for cosmetic surgery unless it follows an accident."]
+    
+    assert answer_confidence("The policy does not provide coverage for cosmetic surgery.", chunks) == 1.0
+    assert answer_confidence("Cosmetic surgery is not covered unless it follows an accident.", chunks) > 0
+
+
+def test_grounded_answer_from_cheap_model_is_not_escalated():
+    """Test that the cheapest model's answer is kept when it is grounded in the context."""
+    service, vector_store = _service(["Cataract surgery is covered after two years."])
+    escalations = metrics.counter("qa_tier0_escalations_total").value
+    
+    result = _ask(service, vector_store)
+    
+    assert result["model"] == "small"
+    assert result["confidence"] == 1.0
+    service.tiers[1].chain.ainvoke.assert_not_called()
+    assert metrics.counter("qa_tier0_escalations_total").value == escalations
+
+
+def test_low_confidence_answers_escalate_until_grounded():
+    """Test that ungrounded answers move up the cascade and stop at the first grounded one."""
+    service, vector_store = _service([
+        "I don't know.",
+        "Probably six months for eye procedures.",
+        "Cataract surgery is covered after a waiting period of two years.",
+    ])
+    escalations = [metrics.counter(f"qa_tier{level}_escalations_total").value for level in range(2)]
+    
+    result = _ask(service, vector_store)
+    
+    assert result["model"] == "large"
+    assert result["answer"] == "Cataract surgery is covered after a waiting period of two years."
+    for tier in service.tiers:
+        tier.chain.ainvoke.assert_awaited_once()
+    assert [
+        metrics.counter(f"qa_tier{level}_escalations_total").value - before
+        for level, before in enumerate(escalations)
+    ] == [1, 1]
@@ -0,0 +1,74 @@
+"""Tests for the parallel PDF extractor and its page text cache."""
+
+import io
+import tempfile
+from unittest.mock import patch
+
+from app.utils.document_handlers.pdf_extractor import PageTextCache, PDFExtractor
+from benchmarks.samples import make_pdf
+
+
+def test_parallel_extraction_keeps_page_order(tmp_path):
+    """Test that pages extracted across worker processes come back in order."""
+    pages = [f"Clause {i} text" for i in range(12)]
+    path = tmp_path / "policy.pdf"
+    path.write_bytes(make_pdf(pages))
+    extractor = PDFExtractor(max_workers=3, min_pages_per_worker=2)
+    
+    try:
+        assert extractor.extract_pages(str(path)) == pages
+    finally:
+        extractor.shutdown()
+
+
+def test_cache_reextracts_only_changed_pages(tmp_path):
+    """Test that a re-issued PDF only re-extracts the pages that changed."""
+    cache = PageTextCache(str(tmp_path / "pages.sqlite3"))
+    extractor = PDFExtractor(cache=cache, max_workers=1)
+    pages = [f"Clause {i} text" for i in range(6)]
+    original = make_pdf(pages)
+    
+    with patch.object(PDFExtractor, "_extract_missing", autospec=True,
+                      side_effect=PDFExtractor._extract_missing) as extract:
+        assert extractor.extract_pages(original) == pages
+        assert extract.call_args.args[3] == list(range(6))
+        
+        # Identical file is served from the cache without extracting anything
+        assert extractor.extract_pages(original) == pages
+        assert extract.call_count == 1
+        
+        reissued = pages[:2] + ["Clause 2 amended text"] + pages[3:]
+        assert extractor.extract_pages(make_pdf(reissued)) == reissued
+        assert extract.call_count == 2
+        assert extract.call_args.args[3] == [2]
+
+
+def test_file_objects_are_extracted_without_reading_them_whole(tmp_path):
+    """Test that a spilled buffer is parsed from its file, inline and across worker processes."""
+    pages = [f"Clause {i} text" for i in range(12)]
+    buffer = tempfile.SpooledTemporaryFile(max_size=16)
+    buffer.write(make_pdf(pages))
+    buffer.seek(0)
+    extractor = PDFExtractor(cache=PageTextCache(str(tmp_path / "pages.sqlite3")), max_workers=3,
+                             min_pages_per_worker=2)
+    
+    try:
+        with buffer, patch.object(buffer._file, "read", wraps=buffer._file.read) as read:
+            assert extractor.extract_pages(buffer) == pages
+            assert all(call.args and 0 < call.args[0] <= 1024 * 1024 for call in read.call_args_list)
+        
+        assert PDFExtractor(max_workers=1).extract_pages(io.BytesIO(make_pdf(pages))) == pages
+    finally:
+        extractor.shutdown()
+
+
+def test_pages_drawn_through_form_xobjects_are_not_confused(tmp_path):
+    """Test that pages differing only in the text of a Form XObject are not reused across files."""
+    extractor = PDFExtractor(cache=PageTextCache(str(tmp_path / "pages.sqlite3")), max_workers=1)
+    
+    assert extractor.extract_pages(make_pdf(["Grace period is thirty days"], form_xobjects=True)) == [
+        "Grace period is thirty days"
+    ]
+    assert extractor.extract_pages(make_pdf(["Grace period is fifteen days"], form_xobjects=True)) == [
+        "Grace period is fifteen days"
+    ]
@@ -0,0 +1,233 @@
+"""Tests for ranged, resumable document downloads."""
+
+import base64
+import hashlib
+import os
+import re
+from unittest.mock import patch
+
+import pytest
+import requests
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.utils.document_handlers.document_handler import PARTIAL_DOWNLOADS_DIR, DocumentHandler
+
+DATA = bytes(range(256)) * 4096  # 1 MiB
+URL = "https://example.com/policy.pdf"
+
+
+class FakeResponse:
+    """Streaming response of the fake server."""
+    
+    def __init__(self, status_code, headers, body, fail_after=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.fail_after = fail_after
+    
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error", response=self)
+    
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            if self.fail_after is not None and i >= self.fail_after:
+                raise requests.ConnectionError("connection reset")
+            yield self.body[i:i + chunk_size]
+    
+    def close(self):
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeServer:
+    """Serve a document, optionally ignoring ranges or dropping range responses part way."""
+    
+    def __init__(self, data=DATA, ranges=True, honour_ranges=True, digest=None, drop_from=None,
+                 content_type="application/pdf"):
+        self.data = data
+        self.ranges = ranges
+        self.honour_ranges = honour_ranges
+        self.digest = digest
+        self.drop_from = drop_from
+        self.content_type = content_type
+        self.range_bytes = 0
+        self.requests = []
+    
+    def __call__(self, url, headers=None, stream=False, timeout=None):
+        headers = headers or {}
+        self.requests.append(headers.get("Range"))
+        response_headers = {"Content-Type": self.content_type, "Content-Length": str(len(self.data)), "ETag": '"v1"'}
+        if self.ranges:
+            response_headers["Accept-Ranges"] = "bytes"
+        if self.digest:
+            response_headers["Repr-Digest"] = f"sha-256=:{self.digest}:"
+        match = re.fullmatch(r"bytes=(\d+)-(\d+)", headers.get("Range", ""))
+        if not self.honour_ranges or match is None or headers.get("If-Range") != '"v1"':
+            return FakeResponse(200, response_headers, self.data)
+        
+        start, end = int(match.group(1)), int(match.group(2))
+        body = self.data[start:end + 1]
+        fail_after = None
+        if self.drop_from is not None and end >= self.drop_from:
+            fail_after = max(0, self.drop_from - start)
+            body = body[:fail_after + 16384]
+        self.range_bytes += len(body)
+        response_headers.update({"Content-Range": f"bytes {start}-{end}/{len(self.data)}",
+                                 "Content-Length": str(end + 1 - start)})
+        return FakeResponse(206, response_headers, body, fail_after)
+
+
+@pytest.fixture(autouse=True)
+def small_ranges():
+    """Download anything from 256 KiB in 64 KiB ranges."""
+    with patch.object(settings, "DOWNLOAD_RANGED_MIN_BYTES", 256 * 1024), \
+            patch.object(settings, "DOWNLOAD_SEGMENT_BYTES", 64 * 1024), \
+            patch.object(settings, "DOWNLOAD_MAX_RETRIES", 0):
+        yield
+
+
+def test_large_document_is_downloaded_in_ranges(tmp_path):
+    """Test that a large document is assembled from parallel ranges into the storage directory."""
+    server = FakeServer(digest=base64.b64encode(hashlib.sha256(DATA).digest()).decode())
+    
+    with patch("requests.get", server):
+        file_path, filename, version = DocumentHandler(str(tmp_path)).download_document(URL)
+    
+    with open(file_path, "rb") as f:
+        assert f.read() == DATA
+    assert version == '"v1"'
+    assert server.requests[0] is None
+    assert sorted(server.requests[1:]) == sorted(f"bytes={i}-{i + 65535}" for i in range(0, len(DATA), 65536))
+    assert os.listdir(tmp_path / PARTIAL_DOWNLOADS_DIR) == []
+
+
+def test_interrupted_download_resumes(tmp_path):
+    """Test that a failed download keeps its ranges and the next attempt only fetches the rest."""
+    handler = DocumentHandler(str(tmp_path))
+    failing = FakeServer(drop_from=600 * 1024)
+    
+    with patch("requests.get", failing), pytest.raises(HTTPException) as error:
+        handler.download_document(URL)
+    assert error.value.status_code == 500
+    assert len(os.listdir(tmp_path / PARTIAL_DOWNLOADS_DIR)) == 1
+    
+    server = FakeServer()
+    with patch("requests.get", server):
+        buffer, _, _ = handler.download_to_buffer(URL)
+    
+    with buffer:
+        assert buffer.read() == DATA
+    assert server.range_bytes <= len(DATA) - 600 * 1024
+    assert os.listdir(tmp_path / PARTIAL_DOWNLOADS_DIR) == []
+
+
+def test_only_transient_range_failures_are_retried(tmp_path):
+    """Test that a range failing with a server error is retried and one failing with a client error is not."""
+    for status, attempts in ((503, 2), (404, 1)):
+        server = FakeServer()
+        
+        def failing_once(url, headers=None, stream=False, timeout=None):
+            if (headers or {}).get("Range") == "bytes=0-65535" and "bytes=0-65535" not in server.requests:
+                server.requests.append(headers["Range"])
+                return FakeResponse(status, {}, b"")
+            return server(url, headers, stream, timeout)
+        
+        with patch.object(settings, "DOWNLOAD_MAX_RETRIES", 2), patch("requests.get", failing_once):
+            if status == 404:
+                with pytest.raises(HTTPException):
+                    DocumentHandler(str(tmp_path)).download_document(URL)
+            else:
+                DocumentHandler(str(tmp_path)).download_document(URL)
+        assert server.requests.count("bytes=0-65535") == attempts
+
+
+def test_servers_without_ranges_are_read_as_one_stream(tmp_path):
+    """Test the single-stream fallback for servers that do not advertise or do not honour ranges."""
+    for server in (FakeServer(ranges=False), FakeServer(honour_ranges=False)):
+        with patch("requests.get", server):
+            buffer, _, _ = DocumentHandler(str(tmp_path)).download_to_buffer(URL)
+        
+        with buffer:
+            assert buffer.read() == DATA
+    # The probe, range requests answered with the whole document, then one stream
+    assert server.requests[0] is None and server.requests[1] is not None and server.requests[-1] is None
+    assert os.listdir(tmp_path / PARTIAL_DOWNLOADS_DIR) == []
+
+
+def test_size_limit_and_integrity_are_enforced(tmp_path):
+    """Test that oversized, truncated and corrupted downloads are rejected."""
+    handler = DocumentHandler(str(tmp_path))
+    
+    def respond(headers, body):
+        return lambda *args, **kwargs: FakeResponse(200, {"Content-Type": "application/pdf", **headers}, body)
+    
+    with patch.object(settings, "DOCUMENT_MAX_BYTES", 1000):
+        for server in (FakeServer(), respond({}, DATA)):
+            with patch("requests.get", server), pytest.raises(HTTPException) as error:
+                handler.download_to_buffer(URL)
+            assert error.value.status_code == 413
+    
+    with patch("requests.get", respond({"Content-Length": "2000"}, DATA[:1000])), \
+            pytest.raises(HTTPException) as error:
+        handler.download_to_buffer(URL)
+    assert error.value.status_code == 502
+    
+    corrupted = FakeServer(digest=base64.b64encode(hashlib.sha256(b"other").digest()).decode())
+    with patch("requests.get", corrupted), pytest.raises(HTTPException) as error:
+        handler.download_document(URL)
+    assert error.value.status_code == 502
+    assert os.listdir(tmp_path / PARTIAL_DOWNLOADS_DIR) == []
+
+
+def test_failed_downloads_leave_no_files_behind(tmp_path):
+    """Test that documents rejected after they were written are deleted, whichever way they were fetched."""
+    handler = DocumentHandler(str(tmp_path))
+    url = "https://example.com/download?id=1"
+    
+    with patch("requests.get", lambda *args, **kwargs: FakeResponse(200, {"Content-Length": "2000"}, DATA[:1000])), \
+            pytest.raises(HTTPException) as error:
+        handler.download_document(url, doc_type="pdf")
+    assert error.value.status_code == 502
+    
+    for download in (handler.download_document, handler.download_to_buffer):
+        with patch("requests.get", FakeServer(content_type="application/zip")), \
+                pytest.raises(HTTPException) as error:
+            download(url)
+        assert error.value.status_code == 400
+    
+    assert os.listdir(tmp_path / PARTIAL_DOWNLOADS_DIR) == []
+    assert [name for name in os.listdir(tmp_path) if name != PARTIAL_DOWNLOADS_DIR] == []
+
+
+def test_document_version_is_revalidated_conditionally(tmp_path):
+    """Test that versions come from validators checked with conditional requests, or from the content."""
+    handler = DocumentHandler(str(tmp_path))
+    sent = []
+    
+    def server(url, headers=None, stream=False, timeout=None):
+        sent.append(headers)
+        if headers.get("If-None-Match") == '"v1"':
+            return FakeResponse(304, {}, b"")
+        return FakeResponse(200, {"ETag": '"v1"'}, DATA)
+    
+    with patch("requests.get", server):
+        assert handler.document_version(URL) == '"v1"'
+        assert handler.document_version(URL, '"v1"') == '"v1"'
+    assert sent == [{}, {"If-None-Match": '"v1"'}]
+    
+    with patch("requests.get", lambda *args, **kwargs: FakeResponse(200, {}, DATA)):
+        assert handler.document_version(URL) == f"sha256:{hashlib.sha256(DATA).hexdigest()}"
+        
+        # Downloads hash what they stream instead of requesting the document again
+        _, _, version = handler.download_document(URL, doc_type="pdf")
+        assert version == f"sha256:{hashlib.sha256(DATA).hexdigest()}"
+        buffer, _, version = handler.download_to_buffer(URL, doc_type="pdf")
+        buffer.close()
+        assert version == f"sha256:{hashlib.sha256(DATA).hexdigest()}"
@@ -0,0 +1,96 @@
+"""Tests for the storage lifecycle manager."""
+
+import os
+import time
+
+from app.core.storage import StorageManager
+
+
+def _write(path, size):
+    """Write a file of the given size."""
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    return str(path)
+
+
+def test_sweep_evicts_least_recently_used_over_budget(tmp_path):
+    """Test that the oldest artifacts are evicted first when over budget."""
+    manager = StorageManager(str(tmp_path), max_bytes=250, ttl_seconds=0)
+    paths = [_write(tmp_path / f"doc{i}.pdf", 100) for i in range(3)]
+    for path in paths:
+        manager.register(path)
+        time.sleep(0.01)
+    manager.touch(paths[0])
+    
+    evicted = manager.sweep()
+    
+    assert evicted == [os.path.abspath(paths[1])]
+    assert not os.path.exists(paths[1])
+    assert os.path.exists(paths[0]) and os.path.exists(paths[2])
+    assert manager.total_bytes == 200
+
+
+def test_sweep_evicts_expired_artifacts(tmp_path):
+    """Test that artifacts idle longer than the TTL are evicted."""
+    manager = StorageManager(str(tmp_path), max_bytes=0, ttl_seconds=60)
+    index_dir = tmp_path / "vector_stores" / "hackrx_abc"
+    index_dir.mkdir(parents=True)
+    _write(index_dir / "index.faiss", 10)
+    manager.register(str(index_dir))
+    manager._artifacts[os.path.abspath(index_dir)].last_access -= 120
+    # Accesses by other processes are read from the modification time
+    os.utime(index_dir, (time.time() - 120,) * 2)
+    
+    assert manager.sweep() == [os.path.abspath(index_dir)]
+    assert not index_dir.exists()
+
+
+def test_pinned_and_retained_artifacts_are_protected(tmp_path):
+    """Test that pinned and retained artifacts survive a sweep."""
+    manager = StorageManager(str(tmp_path), max_bytes=1, ttl_seconds=1)
+    pinned = _write(tmp_path / "pinned.pdf", 100)
+    retained = _write(tmp_path / "retained.pdf", 100)
+    manager.register(pinned)
+    manager.register(retained)
+    manager.retain(retained)
+    
+    with manager.pin(pinned):
+        assert manager.sweep() == []
+    
+    manager.release(retained)
+    assert sorted(manager.sweep()) == sorted(os.path.abspath(p) for p in (pinned, retained))
+
+
+def test_adopt_existing_tracks_downloads_and_indexes(tmp_path):
+    """Test that artifacts left by previous runs are adopted."""
+    _write(tmp_path / "old.pdf", 50)
+    index_dir = tmp_path / "vector_stores" / "hackrx_old"
+    index_dir.mkdir(parents=True)
+    _write(index_dir / "index.pkl", 30)
+    manager = StorageManager(str(tmp_path), max_bytes=0, ttl_seconds=0)
+    
+    manager.adopt_existing()
+    
+    assert manager.total_bytes == 80
+
+
+def test_other_processes_see_pins_retains_and_artifacts(tmp_path):
+    """Test that one sweeping process honours the pins and retains of another and enforces one budget."""
+    worker = StorageManager(str(tmp_path), max_bytes=150, ttl_seconds=0)
+    sweeper = StorageManager(str(tmp_path), max_bytes=150, ttl_seconds=0)
+    pinned = _write(tmp_path / "pinned.pdf", 100)
+    retained = _write(tmp_path / "retained.pdf", 100)
+    for path in (pinned, retained):
+        os.utime(path, (time.time() - 60,) * 2)
+        worker.register(path)
+    worker.retain(retained)
+    
+    assert sweeper.acquire_sweeper_lock()
+    assert not worker.acquire_sweeper_lock()
+    with worker.pin(pinned):
+        assert sweeper.sweep() == []
+    assert sweeper.total_bytes == 200
+    
+    worker.release(retained)
+    assert sweeper.sweep() == [os.path.abspath(retained)]
+    assert os.path.exists(pinned)